@@ -0,0 +1,118 @@
+import sys
+import glob
+import json
+import time
+import argparse
+
+import cv2
+
+from inspection.backends import BACKENDS
+from inspection.model_registry import get_model, DEFAULT_MODEL_PATH
+from inspection.tracking import iou
+from inspection.verdict import verdict
+
+# Parity of the exported backends with PyTorch and their CPU latency on the demo images:
+#
+#   python -m benchmarks.backend_benchmark --backend torch onnx openvino
+#
+# Every box of the reference (first) backend must be found by the others with the same class,
+# an IoU of at least --min-iou and a confidence within --max-conf-diff, and every image must get
+# the same OK / NOT OK verdict. Exits with status 1 when a backend fails the check.
+
+# Batch size of the throughput run, as used by the bulk and video pages
+THROUGHPUT_BATCH = 8
+
+
+# Function to turn a result into [(class id, confidence, xyxy box)]
+def detections(result):
+    return list(zip(map(int, result.boxes.cls.tolist()), result.boxes.conf.tolist(), result.boxes.xyxy.tolist()))
+
+
+# Function to compare one image's detections with the reference; returns a list of mismatches
+def compare(reference, candidate, names, min_iou, max_conf_diff):
+    problems = []
+    unmatched = list(candidate)
+    for cls, conf, box in reference:
+        matches = [(iou(box, other[2]), other) for other in unmatched if other[0] == cls]
+        best_iou, best = max(matches, key=lambda match: match[0], default=(0.0, None))
+        if best is None or best_iou < min_iou:
+            problems.append(f"missing {names[cls]} ({conf:.2f}), best IoU {best_iou:.2f}")
+            continue
+        unmatched.remove(best)
+        if abs(best[1] - conf) > max_conf_diff:
+            problems.append(f"{names[cls]} confidence {conf:.3f} vs {best[1]:.3f}")
+    problems.extend(f"extra {names[cls]} ({conf:.2f})" for cls, conf, _ in unmatched)
+    if verdict({names[cls] for cls, _, _ in reference}) != verdict({names[cls] for cls, _, _ in candidate}):
+        problems.append("different verdict")
+    return problems
+
+
+# Function to time single-image calls (as the image and live pages make them) and batched calls
+def measure(model, images, conf, repeats):
+    latencies = []
+    for _ in range(repeats):
+        for image in images:
+            start = time.perf_counter()
+            model.predict(image, conf=conf, verbose=False)
+            latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    batch = (images * THROUGHPUT_BATCH)[:THROUGHPUT_BATCH]
+    start = time.perf_counter()
+    for _ in range(repeats):
+        model.predict(batch, conf=conf, verbose=False)
+    batch_seconds = time.perf_counter() - start
+    return {"median_ms": latencies[len(latencies) // 2] * 1000,
+            "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+            "images_per_second": repeats * len(batch) / batch_seconds if batch_seconds else 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check parity and CPU latency of the inference backends")
+    parser.add_argument("--backend", nargs="+", default=["torch", "onnx"], choices=BACKENDS,
+                        help="the first backend is the reference for the parity check")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--images", default="images/demo*.*")
+    parser.add_argument("--conf", type=float, default=0.4)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--min-iou", type=float, default=0.9)
+    parser.add_argument("--max-conf-diff", type=float, default=0.02)
+    parser.add_argument("--out", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(args.images))
+    images = [cv2.imread(path) for path in paths]
+    reference = None
+    results = []
+    failed = False
+    for backend in args.backend:
+        # Everything on the CPU so the latencies compare the runtimes, not the hardware
+        model = get_model(args.model, device="cpu", backend=backend)
+        found = [detections(result) for result in model.predict(images, conf=args.conf, verbose=False)]
+        problems = {}
+        if reference is None:
+            reference = found
+        else:
+            for path, expected, actual in zip(paths, reference, found):
+                mismatches = compare(expected, actual, model.names, args.min_iou, args.max_conf_diff)
+                if mismatches:
+                    problems[path] = mismatches
+        failed = failed or bool(problems)
+
+        result = {"backend": backend, "boxes": sum(map(len, found)), "parity_problems": problems,
+                  **measure(model, images, args.conf, args.repeats)}
+        result["speedup"] = results[0]["median_ms"] / result["median_ms"] if results else 1.0
+        results.append(result)
+        print(f"{backend:<9} median {result['median_ms']:7.1f} ms, p95 {result['p95_ms']:7.1f} ms, "
+              f"{result['images_per_second']:6.1f} images/s batched, {result['speedup']:4.2f}x, "
+              f"{result['boxes']} boxes, parity {'FAILED' if problems else 'ok'}")
+        for path, mismatches in problems.items():
+            print(f"    {path}: {'; '.join(mismatches)}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
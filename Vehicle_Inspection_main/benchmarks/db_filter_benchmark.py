@@ -0,0 +1,126 @@
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+from inspection import database, migrations
+
+# Filtered-query latency of the historical data queries before and after the filter indexes.
+# Builds a local SQLite database per size at schema version 1 (tables only), times the queries
+# the Data Collection page runs, migrates to the latest version and times them again:
+#
+#   python -m benchmarks.db_filter_benchmark --rows 10000 100000 1000000
+
+TABLE = "data_image"
+TYPES = ["Sedan", "Hatchback", "SUV", "MPV", "Pickup"]
+COLOURS = ["White", "Black", "Silver", "Grey", "Red", "Blue", "Brown", "Green"]
+INSERT_BATCH = 10000
+
+
+# Function to fill the benchmark table with rows shaped like the inspection records
+def fill_table(pool, rows, seed=0):
+    rng = random.Random(seed)
+    start = datetime(2023, 1, 1)
+    statement = f"INSERT INTO {TABLE} ({database.INSERT_COLUMNS}) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        for offset in range(0, rows, INSERT_BATCH):
+            batch = []
+            for i in range(offset, min(offset + INSERT_BATCH, rows)):
+                # Every vehicle is inspected a few times, the sequence number is unique per inspection
+                vin = f"PM2{i // 3:014d}"
+                ok = rng.random() < 0.8
+                batch.append((rng.choice(TYPES), vin, f"{i:08d}", rng.choice(COLOURS),
+                              "Straight" if ok else "Crooked", "No Friction" if ok else "Friction",
+                              "OK" if ok else "NOT OK",
+                              (start + timedelta(minutes=i * 720 * 24 * 60 // rows)).strftime("%Y-%m-%d %H:%M:%S")))
+            cursor.executemany(pool.sql(statement), batch)
+        conn.commit()
+
+
+# The page queries of one filter set: row count for the pager, first page and the monthly chart
+def page_queries(vin, sequence_number, colour, type):
+    return [
+        lambda: database.count_rows(TABLE, vin, sequence_number, colour, type),
+        lambda: database.fetch_page(TABLE, vin, sequence_number, colour, type),
+        lambda: database.status_counts_by_month(TABLE, vin, sequence_number, colour, type),
+    ]
+
+
+def benchmark_cases(rows, rng):
+    return {
+        "vin": page_queries(f"PM2{rng.randrange(rows // 3):014d}", "", "All", ""),
+        "seq_no": page_queries("", f"{rng.randrange(rows):08d}", "All", ""),
+        "type_colour": page_queries("", "", rng.choice(COLOURS), rng.choice(TYPES)),
+        "colour": page_queries("", "", rng.choice(COLOURS), ""),
+    }
+
+
+# Function to time every case, returns {case: median ms of the three queries together}
+def time_cases(cases, repeat):
+    results = {}
+    for name, queries in cases.items():
+        samples = []
+        for _ in range(repeat):
+            # Always measure the database, never the query cache
+            database.cache.clear()
+            started = time.perf_counter()
+            for query in queries:
+                query()
+            samples.append((time.perf_counter() - started) * 1000)
+        results[name] = statistics.median(samples)
+    return results
+
+
+def run(rows, repeat, directory):
+    path = os.path.join(directory, f"bench_{rows}.db")
+    if os.path.exists(path):
+        os.remove(path)
+    pool = database.sqlite_pool(path, size=1)
+    database.set_pool(pool)
+    migrations.migrate(pool, target=1)
+
+    started = time.perf_counter()
+    fill_table(pool, rows)
+    fill_s = time.perf_counter() - started
+
+    cases = benchmark_cases(rows, random.Random(rows))
+    before = time_cases(cases, repeat)
+    started = time.perf_counter()
+    migrations.migrate(pool)
+    index_s = time.perf_counter() - started
+    after = time_cases(cases, repeat)
+
+    database.set_pool(None)
+    os.remove(path)
+    return {"rows": rows, "fill_s": fill_s, "index_s": index_s, "before_ms": before, "after_ms": after}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark filtered queries with and without the filter indexes")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--dir", default=tempfile.gettempdir(), help="where the SQLite files are created")
+    parser.add_argument("--out", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = []
+    for rows in args.rows:
+        result = run(rows, args.repeat, args.dir)
+        results.append(result)
+        print(f"{rows} rows (filled in {result['fill_s']:.1f}s, indexed in {result['index_s']:.1f}s)")
+        for name, before in result["before_ms"].items():
+            after = result["after_ms"][name]
+            print(f"  {name:<12} {before:9.2f} ms -> {after:8.2f} ms  ({before / max(after, 1e-6):.0f}x)")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+import os
+import sys
+import glob
+import json
+import math
+import time
+import platform
+import argparse
+import itertools
+import subprocess
+from datetime import datetime
+
+import cv2
+
+from inspection.backends import BACKENDS
+from inspection.batch_inference import make_batches
+from inspection.model_registry import DEFAULT_MODEL_PATH
+
+# CPU inference throughput of the production model over the demo images and frames of the demo
+# videos, for every combination of image size, batch size, thread count and backend:
+#
+#   python -m benchmarks.inference_benchmark --imgsz 320 640 --batch 1 8 --threads 1 4 --backend torch onnx
+#   python -m benchmarks.inference_benchmark --compare inference_benchmark_20240101_120000.json
+#
+# Every (backend, imgsz, threads, batch) runs in a fresh worker process so its peak RSS is its own.
+# Results go to a JSON file (one entry per combination) that --compare diffs against a later run.
+# The thread count binds torch; the ONNX Runtime / OpenVINO sessions ultralytics creates only see
+# it through OMP_NUM_THREADS, so for them it is recorded as not enforced.
+
+DEFAULT_IMAGES = "images/demo*.jpg"
+DEFAULT_VIDEOS = "videos/*.mp4"
+VIDEO_FRAMES = 32           # Frames taken from every video
+VIDEO_FRAME_STEP = 5        # Take every n-th frame so the sample is not 32 near-identical frames
+PERCENTILES = (50, 95, 99)
+
+
+# Function to read the images and a sample of the video frames the benchmark runs over
+def load_workload(images, videos, video_frames=VIDEO_FRAMES):
+    frames = [image for image in map(cv2.imread, sorted(glob.glob(images))) if image is not None]
+    for video in sorted(glob.glob(videos)):
+        capture = cv2.VideoCapture(video)
+        index = 0
+        taken = 0
+        while taken < video_frames:
+            ret, frame = capture.read()
+            if not ret:
+                break
+            if index % VIDEO_FRAME_STEP == 0:
+                frames.append(frame)
+                taken += 1
+            index += 1
+        capture.release()
+    return frames
+
+
+# Function to pick the nearest-rank percentile q of sorted values
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(q / 100 * len(sorted_values)) - 1))]
+
+
+# Function to read the peak resident memory of this process in MB (None where it cannot be read)
+def peak_rss_mb():
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / 1024 ** 2
+    except (ImportError, AttributeError):
+        return None
+
+
+# Function to time repeated passes over the workload in batches of batch_size (one warm-up call first)
+def measure(model, frames, conf, imgsz, batch_size, repeats):
+    batches = list(make_batches(frames, batch_size))
+    model.predict(batches[0], conf=conf, imgsz=imgsz, verbose=False)
+    latencies = []
+    images = 0
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for batch in batches:
+            call_start = time.perf_counter()
+            model.predict(batch, conf=conf, imgsz=imgsz, verbose=False)
+            latencies.append(time.perf_counter() - call_start)
+            images += len(batch)
+    seconds = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "images": images,
+        "calls": len(latencies),
+        "seconds": seconds,
+        "images_per_second": images / seconds if seconds else 0.0,
+        **{f"p{q}_ms": percentile(latencies, q) * 1000 for q in PERCENTILES},
+        "per_image_p50_ms": percentile(latencies, 50) * 1000 / batch_size,
+    }
+
+
+# Function run inside the worker process: load the model on the CPU and measure one combination
+def run_worker(config):
+    import torch
+    from inspection.model_registry import get_model
+
+    torch.set_num_threads(config["threads"])
+    load_start = time.perf_counter()
+    model = get_model(config["model"], device="cpu", backend=config["backend"])
+    load_seconds = time.perf_counter() - load_start
+    frames = load_workload(config["images"], config["videos"], config["video_frames"])
+    result = measure(model, frames, config["conf"], config["imgsz"], config["batch"], config["repeats"])
+    return {**config, **result, "load_seconds": load_seconds, "peak_rss_mb": peak_rss_mb(),
+            "threads_enforced": config["backend"] == "torch"}
+
+
+# Function to run one combination in a fresh CPU-only worker process and return its result
+def run_combination(config):
+    thread_count = str(config["threads"])
+    env = dict(os.environ, CUDA_VISIBLE_DEVICES="", OMP_NUM_THREADS=thread_count, MKL_NUM_THREADS=thread_count)
+    process = subprocess.run([sys.executable, "-m", "benchmarks.inference_benchmark", "--worker", json.dumps(config)],
+                             capture_output=True, text=True, env=env)
+    lines = process.stdout.strip().splitlines()
+    if process.returncode != 0 or not lines:
+        return {**config, "error": (process.stderr.strip().splitlines() or ["worker failed"])[-1]}
+    # Ultralytics may print to stdout too; the worker's result is always the last line
+    return json.loads(lines[-1])
+
+
+# Function to describe the machine and code a run was made on, so two result files can be compared
+def environment(model_path):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "commit": commit or None,
+        "model": os.path.abspath(model_path),
+        "model_mtime": os.path.getmtime(model_path) if os.path.exists(model_path) else None,
+    }
+
+
+# Function to print the throughput and p95 change of every combination present in both runs
+def compare(previous, current):
+    key = lambda result: (result["backend"], result["imgsz"], result["threads"], result["batch"])
+    before = {key(result): result for result in previous["results"] if "error" not in result}
+    for result in current["results"]:
+        old = before.get(key(result))
+        if old is None or "error" in result:
+            continue
+        change = result["images_per_second"] / old["images_per_second"] - 1 if old["images_per_second"] else 0.0
+        print(f"{'/'.join(map(str, key(result))):<28} {old['images_per_second']:7.1f} -> "
+              f"{result['images_per_second']:7.1f} images/s ({change:+.1%}), "
+              f"p95 {old['p95_ms']:7.1f} -> {result['p95_ms']:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CPU inference across image sizes, batch sizes, "
+                                                 "thread counts and backends")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--backend", nargs="+", default=["torch"], choices=BACKENDS)
+    parser.add_argument("--imgsz", nargs="+", type=int, default=[320, 480, 640])
+    parser.add_argument("--batch", nargs="+", type=int, default=[1, 4, 8])
+    parser.add_argument("--threads", nargs="+", type=int, default=[os.cpu_count() or 1])
+    parser.add_argument("--images", default=DEFAULT_IMAGES)
+    parser.add_argument("--videos", default=DEFAULT_VIDEOS)
+    parser.add_argument("--video-frames", type=int, default=VIDEO_FRAMES)
+    parser.add_argument("--repeats", type=int, default=3, help="passes over the workload per combination")
+    parser.add_argument("--conf", type=float, default=0.4)
+    parser.add_argument("--out", help="JSON results file (default: inference_benchmark_<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare this run against")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(json.loads(args.worker))))
+        return
+
+    run = {"environment": environment(args.model), "results": []}
+    for backend, imgsz, threads, batch in itertools.product(args.backend, args.imgsz, args.threads, args.batch):
+        config = {"model": args.model, "backend": backend, "imgsz": imgsz, "threads": threads, "batch": batch,
+                  "images": args.images, "videos": args.videos, "video_frames": args.video_frames,
+                  "repeats": args.repeats, "conf": args.conf}
+        result = run_combination(config)
+        run["results"].append(result)
+        label = f"{backend:<13} imgsz {imgsz:<4} threads {threads:<2} batch {batch:<2}"
+        if "error" in result:
+            print(f"{label} FAILED: {result['error']}")
+            continue
+        print(f"{label} {result['images_per_second']:7.1f} images/s, p50 {result['p50_ms']:7.1f} ms, "
+              f"p95 {result['p95_ms']:7.1f} ms, p99 {result['p99_ms']:7.1f} ms, "
+              f"peak RSS {result['peak_rss_mb'] or 0:.0f} MB")
+
+    out = args.out or f"inference_benchmark_{datetime.now():%Y%m%d_%H%M%S}.json"
+    with open(out, "w") as f:
+        json.dump(run, f, indent=2)
+    print(f"Results written to {out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import json
+import argparse
+
+import cv2
+
+from inspection.model_registry import get_model, DEFAULT_MODEL_PATH
+from inspection.video_pipeline import FrameSkipper, VideoStats, run_video, DEFAULT_MOTION_THRESHOLD
+
+# Fraction of frames skipped and speedup of frame skipping against detecting every frame:
+#
+#   python -m benchmarks.video_skip_benchmark --video videos/demo.mp4
+
+# (label, stride, adaptive, threshold)
+DEFAULT_MODES = [
+    ("every frame", 1, False, None),
+    ("stride 2", 2, False, None),
+    ("stride 3", 3, False, None),
+    ("stride 5", 5, False, None),
+    ("adaptive 2.0", 1, True, 2.0),
+    ("adaptive 4.0", 1, True, 4.0),
+    ("adaptive 8.0", 1, True, 8.0),
+    ("stride 2 + adaptive 4.0", 2, True, 4.0),
+]
+
+
+def run(model, video, conf, label, stride, adaptive, threshold):
+    skipper = FrameSkipper(stride, adaptive, threshold or DEFAULT_MOTION_THRESHOLD) if stride > 1 or adaptive else None
+    stats = VideoStats()
+    capture = cv2.VideoCapture(video)
+    # Plotting stays in the loop (the page draws every frame); only the display is left out
+    for _ in run_video(model, capture, conf, stats=stats, skipper=skipper):
+        pass
+    capture.release()
+    return {"mode": label, "frames": stats.frames, "skipped": stats.skipped,
+            "skipped_fraction": stats.skipped / stats.frames if stats.frames else 0.0,
+            "seconds": stats.wall_seconds, "fps": stats.fps}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark frame skipping on a video")
+    parser.add_argument("--video", default="videos/demo.mp4")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--device", help="e.g. cpu or 0 (default: GPU when available)")
+    parser.add_argument("--conf", type=float, default=0.4)
+    parser.add_argument("--out", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    model = get_model(args.model, device=args.device)
+    results = []
+    for mode in DEFAULT_MODES:
+        result = run(model, args.video, args.conf, *mode)
+        results.append(result)
+        speedup = result["fps"] / results[0]["fps"] if results[0]["fps"] else 0.0
+        result["speedup"] = speedup
+        print(f"{result['mode']:<24} {result['frames']} frames, {result['skipped_fraction']:5.1%} skipped, "
+              f"{result['fps']:6.1f} FPS, {speedup:4.2f}x")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import json
+import time
+import argparse
+
+from inspection.backends import BACKENDS, DEFAULT_BACKEND
+from inspection.batch_inference import DEFAULT_BATCH_SIZE, predict_in_batches
+from inspection.model_registry import DEFAULT_MODEL_PATH, get_model
+from inspection.worker_pool import WorkerPool
+from benchmarks.inference_benchmark import DEFAULT_IMAGES, DEFAULT_VIDEOS, load_workload
+
+# Throughput of the inference worker pool from 1 to N worker processes against one in-process
+# model, on the demo images and video frames (CPU only):
+#
+#   python -m benchmarks.worker_pool_benchmark --workers 1 2 4 8 --images-count 400
+#
+# Start-up (model loading in every worker) is left out; every pool gets one warm-up pass first.
+
+
+# Function to time one pass of the frames through an in-process model, batched like the pages
+def run_single(model, frames, conf, batch_size):
+    start = time.perf_counter()
+    for _ in predict_in_batches(model, frames, conf, batch_size):
+        pass
+    return time.perf_counter() - start
+
+
+# Function to time one pass of the frames through the pool, every frame submitted as its own job
+def run_pool(pool, frames, conf):
+    start = time.perf_counter()
+    futures = [pool.submit(frame, conf, plot=False) for frame in frames]
+    for future in futures:
+        future.result()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark throughput scaling of the inference worker pool")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--backend", default=DEFAULT_BACKEND, choices=BACKENDS)
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4])
+    parser.add_argument("--images", default=DEFAULT_IMAGES)
+    parser.add_argument("--videos", default=DEFAULT_VIDEOS)
+    parser.add_argument("--images-count", type=int, default=200, help="frames per pass (the workload repeated)")
+    parser.add_argument("--batch", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--conf", type=float, default=0.4)
+    parser.add_argument("--out", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    workload = load_workload(args.images, args.videos)
+    frames = (workload * (args.images_count // max(len(workload), 1) + 1))[:args.images_count]
+
+    model = get_model(args.model, device="cpu", backend=args.backend)
+    run_single(model, frames[:args.batch], args.conf, args.batch)
+    seconds = run_single(model, frames, args.conf, args.batch)
+    results = [{"workers": 0, "seconds": seconds, "images_per_second": len(frames) / seconds}]
+    print(f"in-process    {results[0]['images_per_second']:7.1f} images/s")
+
+    for workers in args.workers:
+        pool = WorkerPool(args.model, workers, args.backend, "cpu", batch_size=args.batch).start()
+        try:
+            run_pool(pool, frames[:workers * args.batch], args.conf)
+            seconds = run_pool(pool, frames, args.conf)
+        finally:
+            pool.close()
+        result = {"workers": workers, "threads_per_worker": pool.threads, "seconds": seconds,
+                  "images_per_second": len(frames) / seconds,
+                  "speedup": results[0]["seconds"] / seconds}
+        if results[1:]:
+            one_worker = results[1]
+            result["efficiency"] = one_worker["seconds"] / seconds / (workers / one_worker["workers"])
+        results.append(result)
+        print(f"{workers:>2} workers    {result['images_per_second']:7.1f} images/s, {result['speedup']:4.2f}x "
+              f"in-process, {pool.threads} threads each"
+              + (f", {result['efficiency']:.0%} scaling efficiency" if "efficiency" in result else ""))
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import os
+import argparse
+
+from inspection.batch_inference import DEFAULT_IMGSZ
+
+# Runtimes the trained weights can be served with. "torch" loads best.pt as trained; the others
+# load an export of it, which ultralytics wraps in the same predictor, so every page gets the same
+# Results objects (boxes, names, plot) whichever runtime a deployment picks:
+#
+#   python -m inspection.backends --backend onnx openvino      (export once per set of weights)
+#   INSPECTION_BACKEND=onnx streamlit run 1_🏠_Homepage.py
+#
+# The INT8 backends load a quantized export that passed the accuracy gate of inspection.quantization.
+BACKENDS = ("torch", "onnx", "openvino", "onnx-int8", "openvino-int8")
+DEFAULT_BACKEND = os.environ.get("INSPECTION_BACKEND", "torch")
+
+# Backends exported straight from the weights (the INT8 ones need calibration data)
+EXPORT_BACKENDS = ("onnx", "openvino")
+
+# Backends that only run on the CPU here (no CUDA execution provider / GPU plugin on the stations)
+CPU_BACKENDS = ("onnx", "openvino", "onnx-int8", "openvino-int8")
+
+
+# Function to check a backend name coming from the environment, a CLI or a caller
+def check_backend(backend):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend} (choose from {', '.join(BACKENDS)})")
+    return backend
+
+
+# Function to give the path ultralytics writes the export of model_path to (best.pt -> best.onnx
+# or the best_openvino_model/ directory), next to the original weights
+def exported_path(model_path, backend):
+    stem = os.path.splitext(model_path)[0]
+    if backend == "onnx":
+        return stem + ".onnx"
+    if backend == "openvino":
+        return stem + "_openvino_model"
+    if backend == "onnx-int8":
+        return stem + "_int8.onnx"
+    if backend == "openvino-int8":
+        return stem + "_int8_openvino_model"
+    return model_path
+
+
+# Function to export the weights for a backend. Exports use a dynamic batch dimension so the
+# batched pages (bulk, video, SiteCams) keep sending several images per call.
+def export_model(model_path, backend, imgsz=DEFAULT_IMGSZ):
+    check_backend(backend)
+    if backend == "torch":
+        return model_path
+    if backend not in EXPORT_BACKENDS:
+        raise ValueError(f"The {backend} model is built by: python -m inspection.quantization --backend "
+                         f"{backend.split('-')[0]}")
+    # Imported here so choosing the weights of a backend does not load torch and ultralytics
+    from ultralytics import YOLO
+
+    model = YOLO(model_path)
+    return model.export(format=backend, imgsz=imgsz, dynamic=True)
+
+
+# Function to return the weights to load for a backend, exporting them first when the export is
+# missing or older than the weights it was made from (e.g. after retraining)
+def resolve_weights(model_path, backend, imgsz=DEFAULT_IMGSZ):
+    check_backend(backend)
+    path = exported_path(model_path, backend)
+    if path == model_path:
+        return model_path
+    if backend not in EXPORT_BACKENDS:
+        # Quantized models are never built implicitly: they need calibration data and the accuracy gate
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No {backend} model at {path}; build it with: python -m inspection.quantization "
+                                    f"--backend {backend.split('-')[0]}")
+        return path
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(model_path):
+        path = export_model(model_path, backend, imgsz)
+    return path
+
+
+def main():
+    from inspection.model_registry import DEFAULT_MODEL_PATH
+
+    parser = argparse.ArgumentParser(description="Export the trained weights for the ONNX Runtime / OpenVINO backends")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--backend", nargs="+", default=["onnx"], choices=EXPORT_BACKENDS)
+    parser.add_argument("--imgsz", type=int, default=DEFAULT_IMGSZ)
+    args = parser.parse_args()
+
+    for backend in args.backend:
+        print(f"{backend}: {export_model(args.model, backend, args.imgsz)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import time
+
+# Default number of images sent to the model in one forward pass
+DEFAULT_BATCH_SIZE = 8
+
+# Common input size every image of a batch is letterboxed (resized + padded) to.
+# Ultralytics pads mixed-size images of one batch to imgsz x imgsz itself, so the
+# originals are passed in unchanged and the boxes stay in original pixel coordinates.
+DEFAULT_IMGSZ = 640
+
+
+# Throughput counters for one batched detection run
+class BatchStats:
+    def __init__(self):
+        self.images = 0
+        self.batches = 0
+        self.seconds = 0.0
+
+    def add(self, images, seconds):
+        self.images += images
+        self.batches += 1
+        self.seconds += seconds
+
+    @property
+    def images_per_second(self):
+        return self.images / self.seconds if self.seconds else 0.0
+
+    def describe(self):
+        return f"{self.images} images in {self.batches} batches, " \
+               f"{self.seconds:.2f}s inference, {self.images_per_second:.1f} images/s"
+
+
+# Function to split a list of images into batches of batch_size
+def make_batches(items, batch_size):
+    batch_size = max(1, int(batch_size))
+    for start in range(0, len(items), batch_size):
+        yield items[start:start + batch_size]
+
+
+# Function to run the model one batch at a time and yield (index, result) for every image
+# as soon as its batch is finished, so the page can display results while the rest run
+def predict_in_batches(model, images, conf, batch_size=DEFAULT_BATCH_SIZE, imgsz=DEFAULT_IMGSZ, stats=None):
+    stats = stats if stats is not None else BatchStats()
+    index = 0
+    for batch in make_batches(list(images), batch_size):
+        start = time.perf_counter()
+        results = model.predict(batch, conf=conf, imgsz=imgsz, verbose=False)
+        stats.add(len(batch), time.perf_counter() - start)
+        for result in results:
+            yield index, result
+            index += 1
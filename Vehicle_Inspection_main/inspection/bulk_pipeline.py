@@ -0,0 +1,175 @@
+import io
+import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from PIL import Image
+
+from inspection.batch_inference import BatchStats, DEFAULT_BATCH_SIZE, DEFAULT_IMGSZ
+
+# Default pipeline sizes: worker threads for decoding / encoding and the bound of each queue
+DEFAULT_DECODE_WORKERS = 2
+DEFAULT_ENCODE_WORKERS = 2
+DEFAULT_QUEUE_SIZE = 16
+
+# JPEG quality of the annotated results
+JPEG_QUALITY = 90
+
+# Marker put on the decode queue after the last image
+_END = object()
+
+
+# Latency counters for one pipeline stage
+class StageStats:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self.count += 1
+            self.seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+
+    @property
+    def mean_ms(self):
+        return self.seconds / self.count * 1000 if self.count else 0.0
+
+
+# Observability for one decode -> infer -> encode run
+class PipelineStats:
+    def __init__(self, queue_size=DEFAULT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.decode = StageStats()
+        self.infer = BatchStats()
+        self.encode = StageStats()
+        self.decode_queue_max = 0      # Deepest the decoded-image queue got
+        self.encode_queue_max = 0      # Most results waiting on the encoder at once
+        self.decode_stalls = 0         # Decoder blocked because inference was behind (queue full)
+        self.infer_starved = 0         # Inference waited on an empty decode queue
+        self.infer_starved_s = 0.0
+        self.encode_stalls = 0         # Inference blocked because the encoder was behind
+
+    def describe(self):
+        return f"{self.infer.describe()} | " \
+               f"decode {self.decode.mean_ms:.1f} ms/img, " \
+               f"infer {self.infer.seconds / max(self.infer.batches, 1) * 1000:.1f} ms/batch, " \
+               f"encode {self.encode.mean_ms:.1f} ms/img | " \
+               f"queue depth max decode {self.decode_queue_max}/{self.queue_size}, " \
+               f"encode {self.encode_queue_max}/{self.queue_size} | " \
+               f"stalls: decoder {self.decode_stalls}, " \
+               f"inference starved {self.infer_starved} ({self.infer_starved_s:.2f}s), " \
+               f"encoder back-pressure {self.encode_stalls}"
+
+
+# Function to decode an uploaded file or image path into an RGB PIL image
+def decode_image(source):
+    # convert() forces the full decode here instead of lazily inside the model
+    return Image.open(source).convert("RGB")
+
+
+# Function to draw the detections and encode the annotated image as JPEG bytes
+def encode_result(result, quality=JPEG_QUALITY):
+    res_plotted = result.plot()[:, :, ::-1]
+    buffer = io.BytesIO()
+    Image.fromarray(res_plotted).save(buffer, format="JPEG", quality=quality)
+    return res_plotted, buffer.getvalue()
+
+
+def _timed(stage, function, *args):
+    start = time.perf_counter()
+    try:
+        return function(*args)
+    finally:
+        stage.add(time.perf_counter() - start)
+
+
+# Function to run bulk detection as a three-stage pipeline. Decoding and encoding run in
+# thread pools feeding/draining bounded queues, so the model only waits when the decoders
+# genuinely cannot keep up. Yields (index, result, res_plotted, jpeg_bytes) in input order.
+def run_pipeline(model, sources, conf, batch_size=DEFAULT_BATCH_SIZE, imgsz=DEFAULT_IMGSZ,
+                 decode_workers=DEFAULT_DECODE_WORKERS, encode_workers=DEFAULT_ENCODE_WORKERS,
+                 queue_size=DEFAULT_QUEUE_SIZE, stats=None):
+    stats = stats if stats is not None else PipelineStats(queue_size)
+    batch_size = max(1, int(batch_size))
+    decoded = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    decode_pool = ThreadPoolExecutor(max_workers=decode_workers, thread_name_prefix="decode")
+    encode_pool = ThreadPoolExecutor(max_workers=encode_workers, thread_name_prefix="encode")
+
+    # Stage 1: submit decodes in order and hand the futures to inference through the bounded queue
+    def put(item):
+        while not stop.is_set():
+            try:
+                decoded.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def feed():
+        try:
+            for source in sources:
+                future = decode_pool.submit(_timed, stats.decode, decode_image, source)
+                if decoded.full():
+                    stats.decode_stalls += 1
+                if not put(future):
+                    return
+        except Exception as e:
+            # Reading the sources failed: inference re-raises it from result() instead of waiting forever
+            failed = Future()
+            failed.set_exception(e)
+            put(failed)
+        finally:
+            put(_END)
+
+    feeder = threading.Thread(target=feed, name="decode-feeder", daemon=True)
+    feeder.start()
+
+    pending = deque()
+    index = 0
+    try:
+        finished = False
+        while not finished:
+            # Stage 2: gather one batch of decoded images
+            batch = []
+            while len(batch) < batch_size:
+                stats.decode_queue_max = max(stats.decode_queue_max, decoded.qsize())
+                if decoded.empty():
+                    stats.infer_starved += 1
+                    wait_start = time.perf_counter()
+                    item = decoded.get()
+                    stats.infer_starved_s += time.perf_counter() - wait_start
+                else:
+                    item = decoded.get()
+                if item is _END:
+                    finished = True
+                    break
+                batch.append(item.result())
+
+            if batch:
+                start = time.perf_counter()
+                results = model.predict(batch, conf=conf, imgsz=imgsz, verbose=False)
+                stats.infer.add(len(batch), time.perf_counter() - start)
+
+                # Stage 3: plot + JPEG encode off the inference thread
+                for result in results:
+                    pending.append((index, result, encode_pool.submit(_timed, stats.encode, encode_result, result)))
+                    index += 1
+                stats.encode_queue_max = max(stats.encode_queue_max, len(pending))
+
+            # Hand finished results back in order; block only when the encoder is a full queue behind
+            while pending and (pending[0][2].done() or len(pending) > queue_size or finished):
+                if not pending[0][2].done() and not finished:
+                    stats.encode_stalls += 1
+                item_index, result, future = pending.popleft()
+                res_plotted, jpeg_bytes = future.result()
+                yield item_index, result, res_plotted, jpeg_bytes
+    finally:
+        stop.set()
+        decode_pool.shutdown(wait=False, cancel_futures=True)
+        encode_pool.shutdown(wait=False, cancel_futures=True)
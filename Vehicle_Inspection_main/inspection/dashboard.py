@@ -0,0 +1,168 @@
+import os
+import pandas as pd
+import streamlit as st
+import matplotlib.pyplot as plt
+from matplotlib.ticker import MaxNLocator
+
+from inspection import database
+from inspection.database import DatabaseError
+from inspection.result_writer import get_result_writer
+from inspection.worker_pool import get_worker_pool
+
+# Page size options of the historical data tables
+PAGE_SIZES = [25, 50, 100, 250, 500]
+
+# Colour options of the vehicle recorded with automatically saved detections
+VEHICLE_COLOURS = ['Red', 'Blue', 'Silver', 'White', 'Black']
+
+
+# Function to give the page a table is on: (page size, `after_no` cursor of the page).
+# st.session_state keeps a stack with the `after_no` cursor of every page visited so far,
+# so Previous/Next only ever run a keyset query for one page.
+def page_position(vin, sequence_number, colour, type, key):
+    page_size = st.session_state.get(f"{key}_page_size", database.DEFAULT_PAGE_SIZE)
+    cursors_key = f"{key}_cursors"
+    query_key = (vin, sequence_number, colour, type, page_size)
+
+    # Go back to the first page whenever the filters or the page size change
+    if st.session_state.get(f"{key}_query") != query_key:
+        st.session_state[f"{key}_query"] = query_key
+        st.session_state[cursors_key] = [None]
+    return page_size, st.session_state[cursors_key][-1]
+
+
+# Function to load the row count and current page of several tables concurrently (the tables are
+# shown with their table name as key). Returns {table name: (total, page) or its DatabaseError}.
+def load_pages(table_names, vin, sequence_number, colour, type):
+    positions = {table_name: page_position(vin, sequence_number, colour, type, table_name)
+                 for table_name in table_names}
+
+    def fetch_page(table_name, *filters):
+        page_size, after_no = positions[table_name]
+        return database.count_rows(table_name, *filters), \
+            database.fetch_page(table_name, *filters, page_size, after_no)
+
+    return database.fetch_tables(table_names, vin, sequence_number, colour, type, fetch_function=fetch_page)
+
+
+# Function to display the queried data of one table a page at a time. loaded is the
+# (total, page) of the table from load_pages; without it the table is queried here.
+def show_paginated_table(table_name, vin, sequence_number, colour, type, key, loaded=None):
+    st.selectbox("Rows per page", PAGE_SIZES, index=PAGE_SIZES.index(database.DEFAULT_PAGE_SIZE),
+                 key=f"{key}_page_size")
+    page_size, after_no = page_position(vin, sequence_number, colour, type, key)
+    cursors_key = f"{key}_cursors"
+    cursors = st.session_state[cursors_key]
+
+    if loaded is None:
+        try:
+            loaded = (database.count_rows(table_name, vin, sequence_number, colour, type),
+                      database.fetch_page(table_name, vin, sequence_number, colour, type, page_size, after_no))
+        except DatabaseError as e:
+            loaded = e
+    if isinstance(loaded, DatabaseError):
+        st.error(f"Error connecting to the database: {loaded}")
+        return pd.DataFrame()
+    total, page = loaded
+
+    if page.empty:
+        st.write("No data available based on the input parameters.")
+        return page
+
+    st.dataframe(page)
+
+    first_row = (len(cursors) - 1) * page_size
+    last_no = int(page['No'].iloc[-1])
+    has_next = first_row + len(page) < total
+
+    def next_page():
+        st.session_state[cursors_key].append(last_no)
+
+    def previous_page():
+        st.session_state[cursors_key].pop()
+
+    prev_col, info_col, next_col = st.columns([0.2, 0.6, 0.2])
+    with prev_col:
+        st.button("Previous", key=f"{key}_previous", on_click=previous_page, disabled=len(cursors) == 1)
+    with info_col:
+        st.caption(f"Rows {first_row + 1}-{first_row + len(page)} of {total} (newest first)")
+    with next_col:
+        st.button("Next", key=f"{key}_next", on_click=next_page, disabled=not has_next)
+    return page
+
+
+# Function to load the monthly status counts of the given tables (queried concurrently)
+def load_status_counts(table_names, vin, sequence_number, colour, type):
+    status_counts = {}
+    results = database.fetch_tables(table_names, vin, sequence_number, colour, type,
+                                    fetch_function=database.status_counts_by_month)
+    for table_name, result in results.items():
+        if isinstance(result, DatabaseError):
+            st.error(f"Error connecting to the database: {result}")
+            result = pd.DataFrame()
+        status_counts[table_name] = result
+    return status_counts
+
+
+# Function to add up the monthly status counts of several tables
+def combine_status_counts(status_counts):
+    frames = [counts for counts in status_counts if not counts.empty]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames).fillna(0).groupby(level=0).sum().astype(int)
+
+
+# Function to plot the Month x Status counts as a bar chart
+def show_status_chart(status_counts_by_month, title='Status Distribution by Month'):
+    if status_counts_by_month.empty:
+        st.write("Data is empty or required columns are missing for the bar chart.")
+        return
+
+    # Plot the data as a bar chart
+    fig, ax = plt.subplots()
+    status_counts_by_month.plot(kind='bar', ax=ax)
+    ax.set_ylabel('Count')
+    ax.set_xlabel('Month')
+    ax.set_title(title)
+    ax.legend(title='Status')
+
+    # Set yaxis whole number
+    ax.yaxis.set_major_locator(MaxNLocator(integer=True))
+
+    st.subheader('Status Distribution by Month')
+    st.pyplot(fig)
+    plt.close(fig)
+
+
+# Function to show the sidebar inputs of automatic saving. Returns (enabled, vehicle) where vehicle
+# is the (type, vin, seq no., colour) recorded with every saved detection. Saving is opt-in and
+# only enabled once a VIN is entered, so demo runs never end up in the production tables.
+def auto_save_inputs():
+    st.subheader("Save Detections Automatically")
+    requested = st.checkbox("Save detection results to the database", value=False)
+    with st.expander("Vehicle of the saved detections", expanded=requested):
+        type = st.text_input('Type (Detections)')
+        vin = st.text_input('Vehicle Identification Number (Detections)').strip()
+        seq_no = st.text_input('Sequence Number (Detections)')
+        colour = st.selectbox('Vehicle Colour (Detections)', [""] + VEHICLE_COLOURS,
+                              format_func=lambda option: option or "Not set")
+    enabled = requested and bool(vin)
+    if requested and not vin:
+        st.warning("Enter the Vehicle Identification Number to save detections")
+    st.caption(get_result_writer().describe())
+    return enabled, (type, vin, seq_no, colour)
+
+
+# Function to show the sidebar choice of where detection runs. Returns the model itself (0 workers)
+# or the shared worker pool, which takes the same predict() calls and returns the same results.
+def detector_input(model, model_path):
+    workers = st.select_slider("Inference Worker Processes", list(range(0, (os.cpu_count() or 1) + 1)), 0)
+    if not workers:
+        return model
+    try:
+        pool = get_worker_pool(model_path, workers)
+    except RuntimeError as e:
+        st.error(f"Unable to start the inference workers, detecting in this process: {e}")
+        return model
+    st.caption(pool.describe())
+    return pool
@@ -0,0 +1,420 @@
+import os
+import time
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import mysql.connector
+
+from inspection.query_cache import QueryCache
+
+# MySQL connection settings shared by every page
+DB_CONFIG = {
+    'host': 'localhost',    # dont change
+    'user': 'root',         # change user
+    'password': '',         # put password
+    'database': 'data1'     # database name
+}
+
+# Set this to a file path to use a local SQLite database instead of MySQL (offline stations, testing)
+SQLITE_PATH = os.environ.get("INSPECTION_SQLITE_PATH")
+
+POOL_SIZE = 5                   # Connections kept open per process
+POOL_TIMEOUT = 10               # Seconds to wait for a free connection before giving up
+CONNECT_TIMEOUT = 5             # Seconds to wait for MySQL to accept a new connection
+HEALTH_CHECK_INTERVAL = 30      # Idle seconds after which a connection is pinged before reuse
+FETCH_CHUNK_SIZE = 500          # Rows pulled from the server per fetchmany call
+PREPARED_PER_CONNECTION = 64    # Prepared statements kept open on each MySQL connection
+
+DEFAULT_PAGE_SIZE = 100         # Rows per page of the historical data tables
+
+# Tables holding the results of each detection page
+TABLES = ("data_image", "data_bulk_image", "data_video", "data_capture", "data_live")
+
+# Fixed statement shapes, so each connection prepares a statement once and then only executes it
+SELECT_COLUMNS = "No, Date, Type, `Vin No.`, `Seq No.`, Colour, TIME, `Straight Bracket`, `No Washer`, Status"
+INSERT_COLUMNS = "Type, `Vin No.`, `Seq No.`, Colour, `Straight Bracket`, `No Washer`, Status, `Date`"
+# Rows saved automatically from detections also record where they came from (schema version 3)
+DETECTION_COLUMNS = INSERT_COLUMNS + ", Source, `Crooked Bracket`, `Washer Friction`, Confidence"
+
+
+class DatabaseError(Exception):
+    pass
+
+
+# Latency counters for pool waits and queries
+class LatencyStats:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self.count += 1
+            self.seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+
+    @property
+    def mean_ms(self):
+        return self.seconds / self.count * 1000 if self.count else 0.0
+
+
+# Fixed-size pool of open database connections shared by all sessions of this process
+class ConnectionPool:
+    def __init__(self, connect, dialect, size=POOL_SIZE, timeout=POOL_TIMEOUT,
+                 health_check_interval=HEALTH_CHECK_INTERVAL):
+        self._connect = connect
+        self.dialect = dialect              # "mysql" or "sqlite"
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._idle = queue.LifoQueue()      # (connection, last used) ready for reuse
+        self._slots = threading.BoundedSemaphore(size)
+        self._in_use = 0
+        self._lock = threading.Lock()
+        self.wait_stats = LatencyStats()
+        self.query_stats = LatencyStats()
+        self.reconnects = 0
+        self._prepared = {}                 # id(connection) -> {statement: prepared cursor}, LRU order
+
+    # Function to borrow a connection; it goes back to the pool when the block ends
+    @contextmanager
+    def connection(self):
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            raise DatabaseError(f"Timed out after {self.timeout}s waiting for a free database connection")
+        self.wait_stats.add(time.perf_counter() - start)
+        try:
+            conn = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._in_use += 1
+        healthy = True
+        try:
+            yield conn
+        except Exception:
+            healthy = False
+            raise
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            if healthy:
+                self._idle.put((conn, time.monotonic()))
+            else:
+                self._close(conn)
+            self._slots.release()
+
+    def _checkout(self):
+        try:
+            conn, last_used = self._idle.get_nowait()
+        except queue.Empty:
+            return self._open()
+        if time.monotonic() - last_used > self.health_check_interval and not self._is_healthy(conn):
+            self._close(conn)
+            self.reconnects += 1
+            return self._open()
+        return conn
+
+    def _open(self):
+        try:
+            return self._connect()
+        except (mysql.connector.Error, sqlite3.Error) as e:
+            raise DatabaseError(e) from e
+
+    def _is_healthy(self, conn):
+        try:
+            if self.dialect == "mysql":
+                conn.ping(reconnect=False)
+            else:
+                conn.execute("SELECT 1")
+            return True
+        except (mysql.connector.Error, sqlite3.Error):
+            return False
+
+    def _close(self, conn):
+        self._prepared.pop(id(conn), None)
+        try:
+            conn.close()
+        except (mysql.connector.Error, sqlite3.Error):
+            pass
+
+    # Function to convert a %s-style statement to the placeholder style of this database
+    def sql(self, statement):
+        return statement.replace("%s", "?") if self.dialect == "sqlite" else statement
+
+    # Function to return the cursor to run statement on. On MySQL every connection keeps one
+    # prepared cursor per statement, so running the same statement again only sends the new
+    # parameters instead of preparing it on the server again.
+    def cursor(self, conn, statement):
+        if self.dialect != "mysql":
+            # sqlite3 keeps its own cache of prepared statements per connection
+            return conn.cursor()
+        cursors = self._prepared.setdefault(id(conn), OrderedDict())
+        cursor = cursors.get(statement)
+        if cursor is None:
+            cursor = cursors[statement] = conn.cursor(prepared=True)
+            while len(cursors) > PREPARED_PER_CONNECTION:
+                cursors.popitem(last=False)[1].close()
+        cursors.move_to_end(statement)
+        return cursor
+
+    # Function to put a cursor down after a statement; prepared MySQL cursors stay open for reuse
+    def release_cursor(self, cursor):
+        if self.dialect != "mysql":
+            cursor.close()
+
+    # Function to run one statement and return (column names, rows).
+    # Rows are pulled with fetchmany, chunk_size rows per round trip, and returned as one list.
+    def query(self, statement, params=(), chunk_size=FETCH_CHUNK_SIZE):
+        statement = self.sql(statement)
+        with self.connection() as conn:
+            cursor = self.cursor(conn, statement)
+            start = time.perf_counter()
+            try:
+                cursor.execute(statement, tuple(params))
+                columns = [column[0] for column in cursor.description]
+                rows = []
+                while True:
+                    chunk = cursor.fetchmany(chunk_size)
+                    if not chunk:
+                        break
+                    rows.extend(chunk)
+            except (mysql.connector.Error, sqlite3.Error) as e:
+                raise DatabaseError(e) from e
+            finally:
+                self.query_stats.add(time.perf_counter() - start)
+                self.release_cursor(cursor)
+        return columns, rows
+
+    # Function to run one write statement and commit it
+    def execute(self, statement, params=()):
+        statement = self.sql(statement)
+        with self.connection() as conn:
+            cursor = self.cursor(conn, statement)
+            start = time.perf_counter()
+            try:
+                cursor.execute(statement, tuple(params))
+                conn.commit()
+            except (mysql.connector.Error, sqlite3.Error) as e:
+                raise DatabaseError(e) from e
+            finally:
+                self.query_stats.add(time.perf_counter() - start)
+                self.release_cursor(cursor)
+
+    # Function to write many rows with one commit. The plain (not prepared) MySQL cursor turns an
+    # INSERT ... VALUES executemany into one multi-row statement, i.e. one round trip per batch.
+    def execute_many(self, statement, rows):
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            start = time.perf_counter()
+            try:
+                cursor.executemany(self.sql(statement), [tuple(row) for row in rows])
+                conn.commit()
+            except (mysql.connector.Error, sqlite3.Error) as e:
+                raise DatabaseError(e) from e
+            finally:
+                self.query_stats.add(time.perf_counter() - start)
+                cursor.close()
+
+    # Function to close every idle connection
+    def close_all(self):
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(conn)
+
+    # Function to summarise the pool metrics for display on the pages
+    def describe(self):
+        return f"DB pool ({self.dialect}) {self._in_use}/{self.size} in use, " \
+               f"wait avg {self.wait_stats.mean_ms:.1f} ms (max {self.wait_stats.max_seconds * 1000:.0f} ms), " \
+               f"{self.query_stats.count} queries avg {self.query_stats.mean_ms:.1f} ms " \
+               f"(max {self.query_stats.max_seconds * 1000:.0f} ms), {self.reconnects} reconnects"
+
+
+def _mysql_connect():
+    # autocommit so a pooled connection never keeps reading from an old transaction snapshot
+    return mysql.connector.connect(connection_timeout=CONNECT_TIMEOUT, autocommit=True, **DB_CONFIG)
+
+
+def _sqlite_connect(path):
+    # The pool hands each connection to one thread at a time, so cross-thread use is safe
+    return sqlite3.connect(path, timeout=POOL_TIMEOUT, check_same_thread=False)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# Function to create a pool over a local SQLite file
+def sqlite_pool(path, size=POOL_SIZE):
+    return ConnectionPool(lambda: _sqlite_connect(path), "sqlite", size=size)
+
+
+# Function to return the process-wide pool, creating it on first use
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                if SQLITE_PATH:
+                    _pool = sqlite_pool(SQLITE_PATH)
+                else:
+                    _pool = ConnectionPool(_mysql_connect, "mysql")
+    return _pool
+
+
+# Function to replace the process-wide pool (e.g. with a SQLite pool for local runs)
+def set_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+        _pool = pool
+
+
+def _check_table(table_name):
+    if table_name not in TABLES:
+        raise DatabaseError(f"Unknown table: {table_name}")
+
+
+# Function to build the WHERE clause shared by every query on the filter inputs
+def build_filters(vin, sequence_number, colour, type):
+    conditions = []
+    params = []
+    if type:
+        conditions.append("Type = %s")
+        params.append(type)
+    if vin:
+        conditions.append("`Vin No.` = %s")
+        params.append(vin)
+    if sequence_number:
+        conditions.append("`Seq No.` = %s")
+        params.append(sequence_number)
+    if colour and colour != 'All':
+        conditions.append("Colour = %s")
+        params.append(colour)
+    where = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+    return where, params
+
+
+# Results of recent queries, shared by every session of this process
+cache = QueryCache()
+
+
+# Function to fetch data from the database (served from the cache while it is fresh)
+def fetch_data(table_name, vin, sequence_number, colour, type):
+    _check_table(table_name)
+    key = (table_name, "rows", (vin, sequence_number, colour, type))
+    found, df = cache.get(key)
+    if not found:
+        # Read before the query, so a write that lands while it runs keeps the result out of the cache
+        generation = cache.generation(table_name)
+        where, params = build_filters(vin, sequence_number, colour, type)
+        columns, rows = get_pool().query(f"SELECT {SELECT_COLUMNS} FROM {table_name}{where}", params)
+        df = pd.DataFrame(rows, columns=columns)
+        cache.put(key, df, generation)
+    # Pages add columns such as 'Month' to the frame, so they get their own copy
+    return df.copy()
+
+
+# Function to count the rows matching the filters, for the page counter of the tables
+def count_rows(table_name, vin, sequence_number, colour, type):
+    _check_table(table_name)
+    key = (table_name, "count", (vin, sequence_number, colour, type))
+    found, total = cache.get(key)
+    if not found:
+        generation = cache.generation(table_name)
+        where, params = build_filters(vin, sequence_number, colour, type)
+        _, rows = get_pool().query(f"SELECT COUNT(*) FROM {table_name}{where}", params)
+        total = rows[0][0]
+        cache.put(key, total, generation)
+    return total
+
+
+# Function to fetch one page of rows, newest first. Keyset pagination: instead of OFFSET the
+# next page starts below the smallest `No` of the previous one (after_no), so every page is an
+# index range scan on the primary key no matter how deep the operator scrolls.
+def fetch_page(table_name, vin, sequence_number, colour, type, page_size=DEFAULT_PAGE_SIZE, after_no=None):
+    _check_table(table_name)
+    key = (table_name, "page", (vin, sequence_number, colour, type), page_size, after_no)
+    found, df = cache.get(key)
+    if not found:
+        generation = cache.generation(table_name)
+        where, params = build_filters(vin, sequence_number, colour, type)
+        if after_no is not None:
+            where += (' AND ' if where else ' WHERE ') + 'No < %s'
+            params.append(after_no)
+        columns, rows = get_pool().query(
+            f"SELECT {SELECT_COLUMNS} FROM {table_name}{where} ORDER BY No DESC LIMIT %s",
+            params + [int(page_size)]
+        )
+        df = pd.DataFrame(rows, columns=columns)
+        cache.put(key, df, generation)
+    return df.copy()
+
+
+# Function to count inspections per month and status inside the database, so a chart costs one
+# small GROUP BY query instead of transferring the whole table. Returns Month x Status counts.
+def status_counts_by_month(table_name, vin, sequence_number, colour, type):
+    _check_table(table_name)
+    key = (table_name, "status_by_month", (vin, sequence_number, colour, type))
+    found, counts = cache.get(key)
+    if not found:
+        generation = cache.generation(table_name)
+        where, params = build_filters(vin, sequence_number, colour, type)
+        # SUBSTR of the DATETIME text gives 'YYYY-MM' on both MySQL and SQLite
+        _, rows = get_pool().query(
+            f"SELECT SUBSTR(`Date`, 1, 7) AS Month, Status, COUNT(*) FROM {table_name}{where} "
+            f"GROUP BY Month, Status ORDER BY Month",
+            params
+        )
+        counts = pd.DataFrame(rows, columns=['Month', 'Status', 'Count'])
+        if not counts.empty:
+            counts = counts.pivot_table(index='Month', columns='Status', values='Count', aggfunc='sum', fill_value=0)
+        cache.put(key, counts, generation)
+    return counts.copy()
+
+
+# Function to fetch several tables concurrently, so the caller waits for the slowest query
+# instead of the sum of them. Returns {table name: result or the DatabaseError it raised}.
+def fetch_tables(table_names, vin, sequence_number, colour, type, fetch_function=fetch_data):
+    def fetch(table_name):
+        try:
+            return fetch_function(table_name, vin, sequence_number, colour, type)
+        except DatabaseError as e:
+            return e
+
+    table_names = list(table_names)
+    if len(table_names) <= 1:
+        return {table_name: fetch(table_name) for table_name in table_names}
+    with ThreadPoolExecutor(max_workers=min(len(table_names), get_pool().size)) as executor:
+        return dict(zip(table_names, executor.map(fetch, table_names)))
+
+
+# Function to insert data to the database
+def insert_data(table_name, type, vin, seq_no, colour, bracket, washer, status):
+    _check_table(table_name)
+    get_pool().execute(
+        f"INSERT INTO {table_name} ({INSERT_COLUMNS}) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+        (type, vin, seq_no, colour, bracket, washer, status, datetime.now())
+    )
+    cache.invalidate_table(table_name)
+
+
+# Function to insert a batch of detection rows (in DETECTION_COLUMNS order) in one statement
+def insert_detections(table_name, rows):
+    _check_table(table_name)
+    placeholders = ", ".join(["%s"] * len(DETECTION_COLUMNS.split(", ")))
+    get_pool().execute_many(f"INSERT INTO {table_name} ({DETECTION_COLUMNS}) VALUES ({placeholders})", rows)
+    cache.invalidate_table(table_name)
@@ -0,0 +1,275 @@
+import time
+import threading
+
+import cv2
+
+from inspection.batch_inference import DEFAULT_IMGSZ
+from inspection.bulk_pipeline import StageStats
+
+RECONNECT_DELAY = 0.5       # First wait before reopening a stream that failed, doubled on every failure
+MAX_RECONNECT_DELAY = 30.0  # Longest wait between two reconnect attempts
+OPEN_TIMEOUT_MS = 5000      # How long OpenCV may take to open or read a network stream
+IDLE_TIMEOUT = 60.0         # Seconds without any reader after which a shared stream is released
+IDLE_WAIT = 0.005           # Seconds the scheduler sleeps when no camera has a new frame
+RATE_WINDOW = 2.0           # Seconds over which the per-camera FPS figures are measured
+
+
+# Frames per second over a sliding window of RATE_WINDOW seconds
+class RateMeter:
+    def __init__(self, window=RATE_WINDOW):
+        self.window = window
+        self._times = []
+        self._lock = threading.Lock()
+
+    def tick(self):
+        now = time.monotonic()
+        with self._lock:
+            self._times.append(now)
+            while self._times and now - self._times[0] > self.window:
+                self._times.pop(0)
+
+    @property
+    def rate(self):
+        with self._lock:
+            if len(self._times) < 2:
+                return 0.0
+            return (len(self._times) - 1) / (self._times[-1] - self._times[0])
+
+
+# Observability for one camera: capture and inference FPS, frames dropped as stale and the
+# latency from a frame being captured to its detections being ready
+class CameraStats:
+    def __init__(self):
+        self.capture = RateMeter()
+        self.inference = RateMeter()
+        self.latency = StageStats()
+        self.captured = 0
+        self.dropped = 0            # Frames overwritten before any reader picked them up
+        self.read_failures = 0
+        self.connects = 0
+
+    def describe(self):
+        return f"capture {self.capture.rate:.1f} FPS, inference {self.inference.rate:.1f} FPS, " \
+               f"latency {self.latency.mean_ms:.0f} ms (max {self.latency.max_seconds * 1000:.0f} ms), " \
+               f"{self.dropped}/{self.captured} stale frames dropped, {self.read_failures} read failures, " \
+               f"{self.connects} connects"
+
+
+# Function to open a capture; network streams get a bounded open/read timeout where OpenCV has one
+def open_capture(source):
+    if isinstance(source, str) and hasattr(cv2, "CAP_PROP_OPEN_TIMEOUT_MSEC"):
+        return cv2.VideoCapture(source, cv2.CAP_ANY, [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, OPEN_TIMEOUT_MS,
+                                                      cv2.CAP_PROP_READ_TIMEOUT_MSEC, OPEN_TIMEOUT_MS])
+    return cv2.VideoCapture(source)
+
+
+# One camera read on its own thread. Only the latest frame is kept: a new frame replaces one no
+# reader has picked up yet, so a slow reader always sees the present instead of a backlog, and
+# a slow stream never holds up the other cameras. Any number of readers can share one stream,
+# each remembering the sequence number of the last frame it took.
+class CameraStream:
+    def __init__(self, name, source):
+        self.name = name
+        self.source = source
+        self.stats = CameraStats()
+        self.state = "starting"
+        self.last_used = time.monotonic()
+        self._capture = None
+        self._frame = None
+        self._sequence = 0
+        self._captured_at = 0.0
+        self._taken = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"camera-{name}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    # Function to stop reading; without wait the thread releases the stream once its read returns
+    def stop(self, wait=True):
+        self._stop.set()
+        if wait:
+            self._thread.join(timeout=2)
+
+    @property
+    def stopped(self):
+        return self._stop.is_set()
+
+    @property
+    def connected(self):
+        return self._capture is not None and self._capture.isOpened()
+
+    # Function to drop the capture and wait before the next attempt, returns the next delay
+    def _back_off(self, delay):
+        if self._capture is not None:
+            self._capture.release()
+            self._capture = None
+        self.state = f"reconnecting in {delay:.1f}s"
+        self._stop.wait(delay)
+        return min(delay * 2, MAX_RECONNECT_DELAY)
+
+    def _run(self):
+        delay = RECONNECT_DELAY
+        try:
+            while not self._stop.is_set():
+                if not self.connected:
+                    self.state = "connecting"
+                    self._capture = open_capture(self.source)
+                    if not self._capture.isOpened():
+                        delay = self._back_off(delay)
+                        continue
+                    self.stats.connects += 1
+                ret, frame = self._capture.read()
+                if not ret or frame is None:
+                    # The stream dropped: reopen it with exponential backoff
+                    self.stats.read_failures += 1
+                    delay = self._back_off(delay)
+                    continue
+                delay = RECONNECT_DELAY
+                self.state = "streaming"
+                with self._lock:
+                    if self._sequence > self._taken:
+                        self.stats.dropped += 1
+                    self._frame = frame
+                    self._sequence += 1
+                    self._captured_at = time.perf_counter()
+                self.stats.captured += 1
+                self.stats.capture.tick()
+        finally:
+            self.state = "stopped"
+            if self._capture is not None:
+                self._capture.release()
+
+    # Function to take the latest frame if it is newer than the reader's last one (after).
+    # Returns (sequence, frame, captured at) or None.
+    def latest(self, after=0):
+        self.last_used = time.monotonic()
+        with self._lock:
+            if self._sequence <= after:
+                return None
+            self._taken = max(self._taken, self._sequence)
+            return self._sequence, self._frame, self._captured_at
+
+    def describe(self):
+        return f"{self.name} ({self.state}): {self.stats.describe()}"
+
+
+# Process-wide registry of open camera streams. A stream is opened the first time any page or
+# browser session asks for its source and then shared by all of them across reruns; streams
+# nobody has read from for idle_timeout seconds are stopped and their device released.
+class CameraManager:
+    def __init__(self, idle_timeout=IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self._streams = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+
+    # Function to return the shared stream of a source, opening it on first use
+    def get(self, source, name=None):
+        with self._lock:
+            stream = self._streams.get(source)
+            if stream is None or stream.stopped:
+                stream = CameraStream(name or str(source), source).start()
+                self._streams[source] = stream
+            stream.last_used = time.monotonic()
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=self._reap, name="camera-reaper", daemon=True)
+                self._reaper.start()
+            return stream
+
+    def _reap(self):
+        while True:
+            time.sleep(max(self.idle_timeout / 4, 0.05))
+            self.release_idle()
+
+    # Function to stop the streams nobody has read from for idle_timeout seconds
+    def release_idle(self):
+        now = time.monotonic()
+        with self._lock:
+            idle = [source for source, stream in self._streams.items()
+                    if now - stream.last_used > self.idle_timeout]
+            for source in idle:
+                self._streams.pop(source).stop(wait=False)
+        return idle
+
+    def close_all(self):
+        with self._lock:
+            for stream in self._streams.values():
+                stream.stop(wait=False)
+            self._streams.clear()
+
+    def streams(self):
+        with self._lock:
+            return list(self._streams.values())
+
+    def describe(self):
+        return "\n".join(stream.describe() for stream in self.streams()) or "No open camera streams"
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+# Function to return the process-wide camera manager
+def get_camera_manager():
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = CameraManager()
+    return _manager
+
+
+# Runs one model call over the latest frames of N cameras. Cameras without a new frame are left
+# out of the batch instead of waiting for them, so every camera runs at min(its own FPS, the
+# model's batch rate). Yields (camera, frame, result) for every camera in the batch.
+class MultiCameraScheduler:
+    def __init__(self, model, cameras, conf, imgsz=DEFAULT_IMGSZ):
+        self.model = model
+        self.cameras = list(cameras)
+        self.conf = conf
+        self.imgsz = imgsz
+        self.batches = StageStats()
+        self._last = {}     # camera -> sequence of the last frame this scheduler took
+
+    def step(self):
+        taken = []
+        for camera in self.cameras:
+            item = camera.latest(self._last.get(camera, 0))
+            if item is not None:
+                sequence, frame, captured_at = item
+                self._last[camera] = sequence
+                taken.append((camera, frame, captured_at))
+        if not taken:
+            time.sleep(IDLE_WAIT)
+            return []
+
+        start = time.perf_counter()
+        results = self.model.predict([frame for _, frame, _ in taken], conf=self.conf, imgsz=self.imgsz,
+                                     verbose=False)
+        finished = time.perf_counter()
+        self.batches.add(finished - start)
+        for camera, _, captured_at in taken:
+            camera.stats.latency.add(finished - captured_at)
+            camera.stats.inference.tick()
+        return [(camera, frame, result) for (camera, frame, _), result in zip(taken, results)]
+
+    def __iter__(self):
+        while True:
+            yield from self.step()
+
+    def describe(self):
+        return f"{self.batches.count} batches over {len(self.cameras)} cameras, " \
+               f"{self.batches.mean_ms:.1f} ms per batch"
+
+
+# Function to turn the camera list of the sidebar (one URL or device number per line) into sources
+def parse_sources(text):
+    sources = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line:
+            sources.append(int(line) if line.isdigit() else line)
+    return sources
@@ -0,0 +1,158 @@
+import argparse
+from datetime import datetime
+
+from inspection import database
+
+# Versioned schema of the inspection database. Every migration runs once, in order, and is
+# recorded in schema_version, so running this module again only applies what is missing:
+#
+#   python -m inspection.migrations            (MySQL from database.DB_CONFIG)
+#   python -m inspection.migrations --sqlite local.db
+
+
+# Function to create the five detection tables (kept as-is when they already exist)
+def create_tables(pool):
+    if pool.dialect == "sqlite":
+        primary_key = "No INTEGER PRIMARY KEY AUTOINCREMENT"
+    else:
+        primary_key = "No INT NOT NULL AUTO_INCREMENT PRIMARY KEY"
+    statements = []
+    for table_name in database.TABLES:
+        statements.append(f"""
+            CREATE TABLE IF NOT EXISTS {table_name} (
+                {primary_key},
+                `Date` DATETIME NOT NULL,
+                Type VARCHAR(50),
+                `Vin No.` VARCHAR(32),
+                `Seq No.` VARCHAR(32),
+                Colour VARCHAR(20),
+                TIME TIME NULL,
+                `Straight Bracket` VARCHAR(20),
+                `No Washer` VARCHAR(20),
+                Status VARCHAR(20)
+            )
+        """)
+    return statements
+
+
+# Indexes for the filter columns of fetch_data/fetch_page and the monthly status chart.
+# InnoDB and SQLite both append the primary key to secondary indexes, so equality filters on
+# these columns also return their rows already ordered by No for the keyset pagination.
+INDEXES = [
+    ("idx_vin", "`Vin No.`"),
+    ("idx_seq", "`Seq No.`"),
+    ("idx_type_colour", "Type, Colour"),
+    ("idx_colour", "Colour"),
+    ("idx_date_status", "`Date`, Status"),
+]
+
+
+# Function to add the filter indexes to every detection table. Indexes that already exist are
+# skipped, so the migration can run again after failing part way through.
+def create_indexes(pool):
+    statements = []
+    if pool.dialect == "sqlite":
+        for table_name in database.TABLES:
+            for index_name, columns in INDEXES:
+                # SQLite index names are global to the database, MySQL ones are per table
+                statements.append(f"CREATE INDEX IF NOT EXISTS {table_name}_{index_name} ON {table_name} ({columns})")
+        return statements
+    # MySQL has no CREATE INDEX IF NOT EXISTS, so look the existing ones up
+    _, rows = pool.query("SELECT DISTINCT TABLE_NAME, INDEX_NAME FROM information_schema.statistics "
+                         "WHERE TABLE_SCHEMA = DATABASE()")
+    existing = {(table_name.lower(), index_name.lower()) for table_name, index_name in rows}
+    for table_name in database.TABLES:
+        for index_name, columns in INDEXES:
+            if (table_name, index_name) not in existing:
+                statements.append(f"CREATE INDEX {index_name} ON {table_name} ({columns})")
+    return statements
+
+
+# Columns of the rows saved automatically from detections
+DETECTION_COLUMNS = [
+    ("Source", "VARCHAR(100) NULL"),
+    ("`Crooked Bracket`", "INT NULL"),
+    ("`Washer Friction`", "INT NULL"),
+    ("Confidence", "FLOAT NULL"),
+]
+
+
+# Function to add the detection columns to every table (one column per statement for SQLite).
+# Columns that already exist are skipped, so the migration can run again after failing part way through.
+def add_detection_columns(pool):
+    if pool.dialect == "sqlite":
+        existing = set()
+        for table_name in database.TABLES:
+            _, rows = pool.query(f"PRAGMA table_info({table_name})")
+            existing.update((table_name, row[1].lower()) for row in rows)
+    else:
+        _, rows = pool.query("SELECT TABLE_NAME, COLUMN_NAME FROM information_schema.columns "
+                             "WHERE TABLE_SCHEMA = DATABASE()")
+        existing = {(table_name.lower(), column_name.lower()) for table_name, column_name in rows}
+    statements = []
+    for table_name in database.TABLES:
+        for column, definition in DETECTION_COLUMNS:
+            if (table_name, column.strip("`").lower()) not in existing:
+                statements.append(f"ALTER TABLE {table_name} ADD COLUMN {column} {definition}")
+    return statements
+
+
+# (version, description, function returning the statements to run on a pool)
+MIGRATIONS = [
+    (1, "create detection tables", create_tables),
+    (2, "indexes for filter columns", create_indexes),
+    (3, "columns for automatically saved detections", add_detection_columns),
+]
+
+
+def _ensure_version_table(pool):
+    pool.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INT NOT NULL PRIMARY KEY,
+            description VARCHAR(100) NOT NULL,
+            applied_at DATETIME NOT NULL
+        )
+    """)
+
+
+# Function to read the version the database is currently at (0 for an empty database)
+def current_version(pool=None):
+    pool = pool or database.get_pool()
+    _ensure_version_table(pool)
+    _, rows = pool.query("SELECT MAX(version) FROM schema_version")
+    return rows[0][0] or 0
+
+
+# Function to apply every migration above the current version, up to target (default: latest)
+def migrate(pool=None, target=None):
+    pool = pool or database.get_pool()
+    version = current_version(pool)
+    applied = []
+    for migration_version, description, statements in MIGRATIONS:
+        if migration_version <= version or (target is not None and migration_version > target):
+            continue
+        for statement in statements(pool):
+            pool.execute(statement)
+        pool.execute("INSERT INTO schema_version (version, description, applied_at) VALUES (%s, %s, %s)",
+                     (migration_version, description, datetime.now()))
+        applied.append(migration_version)
+    return applied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create or upgrade the inspection database schema")
+    parser.add_argument("--sqlite", help="migrate this SQLite file instead of the MySQL database")
+    parser.add_argument("--target", type=int, help="stop at this schema version")
+    parser.add_argument("--status", action="store_true", help="only print the current schema version")
+    args = parser.parse_args()
+
+    pool = database.sqlite_pool(args.sqlite) if args.sqlite else database.get_pool()
+    if args.status:
+        print(f"Schema version: {current_version(pool)} (latest {MIGRATIONS[-1][0]})")
+        return
+    applied = migrate(pool, args.target)
+    print(f"Applied migrations: {applied or 'none'}; schema version {current_version(pool)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import os
+import time
+import threading
+
+import numpy as np
+import torch
+from ultralytics import YOLO
+
+from inspection.backends import DEFAULT_BACKEND, CPU_BACKENDS, check_backend, resolve_weights
+
+# Specified Model Path used by every detection page
+DEFAULT_MODEL_PATH = "weights/best.pt"
+
+# Size of the blank image used to warm up a freshly loaded model
+WARMUP_SHAPE = (640, 640, 3)
+
+# Models loaded in this process, keyed by (weights path, device, precision, backend)
+_models = {}
+_registry_lock = threading.Lock()
+
+
+# Function to read the resident memory of this process in MB (None when it cannot be read)
+def process_memory_mb():
+    try:
+        import psutil
+        return psutil.Process(os.getpid()).memory_info().rss / 1024 ** 2
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+# Function to read the GPU memory allocated by torch in MB (None on CPU)
+def gpu_memory_mb(device):
+    if str(device).startswith("cuda") and torch.cuda.is_available():
+        return torch.cuda.memory_allocated(device) / 1024 ** 2
+    return None
+
+
+# Function to pick the device when the caller does not specify one
+def default_device():
+    return "cuda:0" if torch.cuda.is_available() else "cpu"
+
+
+# Wrapper around one loaded YOLO model shared by all pages and browser sessions.
+# Streamlit runs every session in its own thread, so predictions are serialised on
+# a lock because the ultralytics predictor keeps per-call state.
+class SharedModel:
+    def __init__(self, model, key, stats):
+        self.model = model
+        self.key = key
+        self.stats = stats
+        self.lock = threading.Lock()
+
+    def __call__(self, source=None, **kwargs):
+        return self.predict(source, **kwargs)
+
+    def predict(self, source=None, **kwargs):
+        with self.lock:
+            return self.model.predict(source, **kwargs)
+
+    def __getattr__(self, name):
+        # Everything else (names, task, export, ...) comes from the YOLO model
+        if name == "model":
+            raise AttributeError(name)
+        return getattr(self.model, name)
+
+    # Function to summarise load time and memory for display on the pages
+    def describe(self):
+        weights, device, precision, backend = self.key
+        text = f"Model {os.path.basename(weights)} on {device} ({backend}, {precision}) " \
+               f"loaded in {self.stats['load_s']:.2f}s, warm-up {self.stats['warmup_s']:.2f}s"
+        if self.stats["ram_mb"] is not None:
+            text += f", RAM +{self.stats['ram_mb']:.0f} MB"
+        if self.stats["gpu_mb"] is not None:
+            text += f", GPU {self.stats['gpu_mb']:.0f} MB"
+        return text
+
+
+# Function to load the model once per process and reuse it afterwards. The backend (default from
+# INSPECTION_BACKEND) picks the runtime; ONNX Runtime and OpenVINO load an export of the weights
+# on the CPU, exported on first use.
+def get_model(model_path=DEFAULT_MODEL_PATH, device=None, half=False, backend=None):
+    backend = check_backend(backend or DEFAULT_BACKEND)
+    if backend in CPU_BACKENDS:
+        device, half = "cpu", False
+    device = device or default_device()
+    precision = "fp16" if half else "fp32"
+    key = (os.path.abspath(model_path), device, precision, backend)
+
+    shared = _models.get(key)
+    if shared is not None:
+        return shared
+
+    with _registry_lock:
+        # Another session may have loaded it while we were waiting for the lock
+        shared = _models.get(key)
+        if shared is not None:
+            return shared
+
+        ram_before = process_memory_mb()
+        start = time.perf_counter()
+        model = YOLO(resolve_weights(model_path, backend), task="detect")
+        # Every predict call on this instance runs with the registry device and precision
+        model.overrides["device"] = device
+        model.overrides["half"] = half
+        load_s = time.perf_counter() - start
+
+        # Dummy inference so the first real request does not pay for CUDA/kernel setup
+        start = time.perf_counter()
+        model.predict(np.zeros(WARMUP_SHAPE, dtype=np.uint8), verbose=False)
+        warmup_s = time.perf_counter() - start
+
+        ram_after = process_memory_mb()
+        stats = {
+            "load_s": load_s,
+            "warmup_s": warmup_s,
+            "ram_mb": ram_after - ram_before if ram_before is not None and ram_after is not None else None,
+            "gpu_mb": gpu_memory_mb(device),
+        }
+        shared = SharedModel(model, key, stats)
+        _models[key] = shared
+    return shared
+
+
+# Function to list every model currently held by the registry with its statistics
+def loaded_models():
+    return {key: shared.stats for key, shared in _models.items()}
@@ -0,0 +1,282 @@
+import os
+import re
+import sys
+import glob
+import json
+import random
+import shutil
+import argparse
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+import yaml
+from ultralytics import YOLO
+
+from inspection.backends import EXPORT_BACKENDS, exported_path, export_model
+from inspection.batch_inference import DEFAULT_IMGSZ
+from inspection.model_registry import DEFAULT_MODEL_PATH, WARMUP_SHAPE, process_memory_mb
+
+# INT8 post-training quantization of the exported model for the CPU-only stations. The model is
+# calibrated on a random sample of the training split, both the float export and the INT8
+# candidate are validated on the validation split, and the candidate is only installed (where the
+# onnx-int8 / openvino-int8 backends load it from) when no class loses more mAP than allowed:
+#
+#   python -m inspection.quantization --backend onnx --data ../Vehicle_Yolov9/config.yaml
+#   python -m inspection.quantization --backend openvino --tolerance 0.02 --dataset-root D:/data
+#
+# A rejected candidate is kept next to the weights as <model>.rejected for inspection and the
+# previously installed INT8 model, if any, stays in place. Exits with status 1 on rejection.
+
+DEFAULT_DATA = "../Vehicle_Yolov9/config.yaml"
+CALIBRATION_IMAGES = 300        # Training images the activation ranges are calibrated on
+DEFAULT_TOLERANCE = 0.01        # Largest mAP50-95 drop allowed on any single class (absolute)
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+LETTERBOX_COLOUR = 114          # Padding grey of the ultralytics letterbox
+
+
+# Function to read the dataset config of the training run. The root in config.yaml is the
+# training machine's path, so it can be overridden; a relative root is taken from the config.
+def load_dataset(data_path, root=None):
+    with open(data_path) as f:
+        dataset = yaml.safe_load(f)
+    root = root or dataset.get("path") or "."
+    if not os.path.isabs(root):
+        root = os.path.join(os.path.dirname(os.path.abspath(data_path)), root)
+    dataset["path"] = os.path.abspath(root)
+    return dataset
+
+
+# Function to list the images of one split (train, val, test) of the dataset
+def split_images(dataset, split):
+    directory = os.path.join(dataset["path"], dataset[split])
+    return sorted(path for path in glob.glob(os.path.join(directory, "*"))
+                  if path.lower().endswith(IMAGE_EXTENSIONS))
+
+
+# Function to write a copy of the dataset config with some entries replaced (ultralytics reads
+# the calibration and validation splits from a yaml file)
+def write_dataset_yaml(dataset, path, **overrides):
+    with open(path, "w") as f:
+        yaml.safe_dump({**dataset, **overrides}, f)
+    return path
+
+
+# Function to resize and pad an image the way the ultralytics predictor does and return the
+# (1, 3, imgsz, imgsz) RGB float tensor the exported model takes
+def letterbox(image, imgsz=DEFAULT_IMGSZ):
+    height, width = image.shape[:2]
+    scale = min(imgsz / height, imgsz / width)
+    resized = cv2.resize(image, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_LINEAR)
+    canvas = np.full((imgsz, imgsz, 3), LETTERBOX_COLOUR, dtype=np.uint8)
+    top = (imgsz - resized.shape[0]) // 2
+    left = (imgsz - resized.shape[1]) // 2
+    canvas[top:top + resized.shape[0], left:left + resized.shape[1]] = resized
+    return np.ascontiguousarray(canvas[:, :, ::-1].transpose(2, 0, 1)[None], dtype=np.float32) / 255
+
+
+# Calibration batches for ONNX Runtime: one letterboxed training image at a time
+class ImageCalibrationReader:
+    def __init__(self, input_name, paths, imgsz=DEFAULT_IMGSZ):
+        self.input_name = input_name
+        self.paths = paths
+        self.imgsz = imgsz
+        self._next = iter(paths)
+
+    def get_next(self):
+        for path in self._next:
+            image = cv2.imread(path)
+            if image is not None:
+                return {self.input_name: letterbox(image, self.imgsz)}
+        return None
+
+    def rewind(self):
+        self._next = iter(self.paths)
+
+
+# Function to list the nodes of the detect head in an ultralytics ONNX export. Node names start
+# with /model.<layer index>/ and the head is the last layer; its box decoding (DFL, anchor grid,
+# the concatenated box and class outputs) loses the most accuracy when quantized.
+def detect_head_nodes(onnx_path):
+    import onnx
+
+    names = [node.name for node in onnx.load(onnx_path).graph.node]
+    layers = [int(match.group(1)) for match in map(re.compile(r"^/model\.(\d+)/").match, names) if match]
+    if not layers:
+        return []
+    head = f"/model.{max(layers)}/"
+    return [name for name in names if name.startswith(head)]
+
+
+# Function to quantize the ONNX export statically (QDQ, per-channel INT8 weights, UINT8 activations),
+# keeping the detect head in float
+def quantize_onnx(model_path, calibration_paths, output, imgsz=DEFAULT_IMGSZ):
+    import onnxruntime
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+
+    float_model = export_model(model_path, "onnx", imgsz)
+    input_name = onnxruntime.InferenceSession(float_model, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+    quantize_static(float_model, output, ImageCalibrationReader(input_name, calibration_paths, imgsz),
+                    quant_format=QuantFormat.QDQ, per_channel=True, activation_type=QuantType.QUInt8,
+                    weight_type=QuantType.QInt8, calibrate_method=CalibrationMethod.MinMax,
+                    nodes_to_exclude=detect_head_nodes(float_model))
+    return float_model, output
+
+
+# Function to quantize through the OpenVINO exporter of ultralytics (NNCF), calibrated on the
+# split given as "val" in calibration_yaml
+def quantize_openvino(model_path, calibration_yaml, imgsz=DEFAULT_IMGSZ):
+    float_model = export_model(model_path, "openvino", imgsz)
+    output = YOLO(model_path).export(format="openvino", int8=True, data=calibration_yaml, imgsz=imgsz,
+                                     dynamic=True)
+    return float_model, os.path.normpath(output)
+
+
+# Function to give the size of a model file or directory in MB
+def model_size_mb(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(folder, name))
+                   for folder, _, names in os.walk(path) for name in names) / 1024 ** 2
+    return os.path.getsize(path) / 1024 ** 2
+
+
+# Function run in a fresh process: the memory one model adds to it once loaded and warmed up
+def _loaded_model_mb(weights, imgsz):
+    before = process_memory_mb()
+    model = YOLO(weights, task="detect")
+    model.predict(np.zeros(WARMUP_SHAPE, dtype=np.uint8), imgsz=imgsz, device="cpu", verbose=False)
+    after = process_memory_mb()
+    return after - before if before is not None and after is not None else None
+
+
+# Function to measure the memory of a model in its own spawned process. Measured in this process,
+# the second model would reuse the allocator pools and runtime libraries the first one brought in.
+def loaded_model_mb(weights, imgsz=DEFAULT_IMGSZ):
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(_loaded_model_mb, weights, imgsz).result()
+
+
+# Function to validate an exported model on the CPU. Returns per-class mAP50-95, overall mAP,
+# inference latency per image and the memory the loaded model takes.
+def evaluate(weights, data_yaml, imgsz=DEFAULT_IMGSZ, batch=1):
+    model = YOLO(weights, task="detect")
+    metrics = model.val(data=data_yaml, split="val", imgsz=imgsz, batch=batch, device="cpu", plots=False,
+                        verbose=False)
+    return {
+        "weights": weights,
+        "per_class_map": {metrics.names[index]: float(value) for index, value in enumerate(metrics.box.maps)},
+        "map50": float(metrics.box.map50),
+        "map": float(metrics.box.map),
+        "inference_ms": float(metrics.speed["inference"]),
+        "size_mb": model_size_mb(weights),
+        "ram_mb": loaded_model_mb(weights, imgsz),
+    }
+
+
+# Function to list the classes whose mAP dropped by more than tolerance: [(class, float, int8)]
+def accuracy_gate(reference, candidate, tolerance=DEFAULT_TOLERANCE):
+    return [(name, value, candidate["per_class_map"][name]) for name, value in reference["per_class_map"].items()
+            if value - candidate["per_class_map"][name] > tolerance]
+
+
+def _remove(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantize the exported model to INT8 behind a per-class mAP gate")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--backend", default="onnx", choices=EXPORT_BACKENDS)
+    parser.add_argument("--data", default=DEFAULT_DATA, help="dataset config of the training run")
+    parser.add_argument("--dataset-root", help="dataset root on this machine (overrides path: in the config)")
+    parser.add_argument("--calibration-images", type=int, default=CALIBRATION_IMAGES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="largest mAP50-95 drop allowed on any class")
+    parser.add_argument("--imgsz", type=int, default=DEFAULT_IMGSZ)
+    parser.add_argument("--batch", type=int, default=1, help="validation batch size")
+    parser.add_argument("--report", help="JSON report path (default: next to the model)")
+    args = parser.parse_args()
+
+    dataset = load_dataset(args.data, args.dataset_root)
+    train_images = split_images(dataset, "train")
+    if not train_images:
+        sys.exit(f"No training images under {os.path.join(dataset['path'], dataset['train'])}")
+    calibration_paths = random.Random(args.seed).sample(train_images, min(args.calibration_images, len(train_images)))
+
+    installed = exported_path(args.model, f"{args.backend}-int8")
+    previous = installed + ".previous"
+    rejected = installed + ".rejected"
+    _remove(previous)
+    if os.path.exists(installed):
+        os.replace(installed, previous)
+
+    try:
+        with tempfile.TemporaryDirectory(prefix="quantization_") as work_dir:
+            calibration_list = os.path.join(work_dir, "calibration.txt")
+            with open(calibration_list, "w") as f:
+                f.write("\n".join(calibration_paths))
+            validation_yaml = write_dataset_yaml(dataset, os.path.join(work_dir, "validation.yaml"))
+            if args.backend == "onnx":
+                float_model, candidate = quantize_onnx(args.model, calibration_paths, installed, args.imgsz)
+            else:
+                calibration_yaml = write_dataset_yaml(dataset, os.path.join(work_dir, "calibration.yaml"),
+                                                      val=calibration_list)
+                float_model, candidate = quantize_openvino(args.model, calibration_yaml, args.imgsz)
+
+            reference = evaluate(float_model, validation_yaml, args.imgsz, args.batch)
+            quantized = evaluate(candidate, validation_yaml, args.imgsz, args.batch)
+    except Exception:
+        # Leave the previously installed model in place when calibration or validation fails
+        _remove(installed)
+        if os.path.exists(previous):
+            os.replace(previous, installed)
+        raise
+
+    failures = accuracy_gate(reference, quantized, args.tolerance)
+    if failures:
+        _remove(rejected)
+        os.replace(candidate, rejected)
+        if os.path.exists(previous):
+            os.replace(previous, installed)
+    else:
+        _remove(previous)
+
+    report = {
+        "backend": args.backend,
+        "calibration_images": len(calibration_paths),
+        "tolerance": args.tolerance,
+        "accepted": not failures,
+        "installed": None if failures else installed,
+        "float": reference,
+        "int8": quantized,
+        "failures": [{"class": name, "float_map": value, "int8_map": int8_value}
+                     for name, value, int8_value in failures],
+        "speedup": reference["inference_ms"] / quantized["inference_ms"] if quantized["inference_ms"] else None,
+        "size_reduction": 1 - quantized["size_mb"] / reference["size_mb"] if reference["size_mb"] else None,
+    }
+    report_path = args.report or os.path.splitext(args.model)[0] + f"_{args.backend}_int8_report.json"
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for name, value in reference["per_class_map"].items():
+        print(f"{name:<20} mAP50-95 {value:.3f} -> {quantized['per_class_map'][name]:.3f}")
+    print(f"Latency {reference['inference_ms']:.1f} -> {quantized['inference_ms']:.1f} ms/image "
+          f"({report['speedup'] or 0:.2f}x), size {reference['size_mb']:.1f} -> {quantized['size_mb']:.1f} MB")
+    if reference["ram_mb"] is not None and quantized["ram_mb"] is not None:
+        print(f"Memory {reference['ram_mb']:.0f} -> {quantized['ram_mb']:.0f} MB")
+    if failures:
+        print(f"REJECTED: {', '.join(name for name, _, _ in failures)} dropped more than {args.tolerance}; "
+              f"candidate kept at {rejected}")
+        sys.exit(1)
+    print(f"ACCEPTED: installed {installed} (INSPECTION_BACKEND={args.backend}-int8); report {report_path}")
+
+
+if __name__ == "__main__":
+    main()
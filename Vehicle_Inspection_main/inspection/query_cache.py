@@ -0,0 +1,77 @@
+import time
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 256   # Least recently used results are dropped beyond this
+DEFAULT_TTL = 30            # Seconds a result is served before the database is asked again
+
+
+# TTL + LRU cache of query results keyed by (table, filter tuple, ...).
+# Entries of a table are dropped as soon as this process writes to that table; the TTL
+# bounds how stale a result can get when another process or station writes instead.
+# Every invalidation also bumps the table's generation: a result is only stored when the
+# generation read before its query is still current, so a query that raced a write (and may
+# have read the old rows) is never cached after the write invalidated the table.
+class QueryCache:
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()   # key -> (expires at, value)
+        self._generations = {}          # table -> number of invalidations so far
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    # Function to look up a key, returns (found, value)
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    # Function to give the current generation of a table, read before running its query
+    def generation(self, table_name):
+        with self._lock:
+            return self._generations.get(table_name, 0)
+
+    # Function to store a value queried at generation, evicting the least recently used entries
+    # when full; nothing is stored when the table was invalidated since
+    def put(self, key, value, generation):
+        with self._lock:
+            if self._generations.get(key[0], 0) != generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # Function to drop every cached result of one table (keys start with the table name)
+    def invalidate_table(self, table_name):
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == table_name]
+            for key in stale:
+                del self._entries[key]
+            self._generations[table_name] = self._generations.get(table_name, 0) + 1
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    # Function to summarise the counters for display on the pages
+    def describe(self):
+        return f"Query cache {len(self._entries)}/{self.max_entries} entries, " \
+               f"{self.hits} hits, {self.misses} misses ({self.hit_rate:.0%} hit rate), " \
+               f"{self.invalidations} invalidations, TTL {self.ttl}s"
@@ -0,0 +1,257 @@
+import os
+import json
+import time
+import queue
+import atexit
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from inspection import database
+from inspection.database import DatabaseError
+from inspection.verdict import (CROOKED_BRACKET, NO_WASHER_FRICTION, STRAIGHT_BRACKET, WASHER_FRICTION, PARTS,
+                                class_counts, batch_verdicts, part_status, status_value)
+
+# Detections are saved without the pages ever waiting on the database: rows go into a bounded
+# in-memory buffer that a background thread writes with executemany, a batch at a time. While
+# the database is unreachable (or the buffer is full) rows are appended to a local JSONL spool
+# instead, which is written back once the database answers again. Every table is written (and
+# spooled) on its own, so a table that failed never takes the rows of one that committed with it.
+SPOOL_DIR = os.environ.get("INSPECTION_SPOOL_DIR",
+                           os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "spool"))
+WRITE_BATCH_SIZE = 200          # Rows per executemany
+FLUSH_INTERVAL = 2.0            # Seconds a row may wait for its batch to fill up
+MAX_BUFFER = 10000              # Rows held in memory before new rows go straight to the spool
+RETRY_DELAY = 1.0               # First wait before retrying the database after a failure, doubled up to
+MAX_RETRY_DELAY = 60.0
+LIVE_SAVE_INTERVAL = 1.0        # Seconds between two saved rows of the same live camera
+
+_END = object()
+
+
+# Function to write (table, row) items as JSON lines and fsync them
+def _write_jsonl(path, items, mode):
+    with open(path, mode) as f:
+        for table_name, row in items:
+            f.write(json.dumps({"table": table_name, "row": list(row)}) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+# Function to group (table, row) items into {table: [rows]}, keeping the order of the rows
+def _group_by_table(items):
+    by_table = {}
+    for table_name, row in items:
+        by_table.setdefault(table_name, []).append(row)
+    return by_table
+
+
+# Function to build one database row (DETECTION_COLUMNS order); count_of is {class name: detections}
+def detection_row(source, count_of, verdict_value, confidence, vehicle):
+    type, vin, seq_no, colour = vehicle
+    timestamp = datetime.now().isoformat(sep=" ", timespec="seconds")
+    return (type, vin, seq_no, colour,
+            str(count_of.get(STRAIGHT_BRACKET, 0)), str(count_of.get(NO_WASHER_FRICTION, 0)),
+            status_value(verdict_value), timestamp, str(source)[:100],
+            count_of.get(CROOKED_BRACKET, 0), count_of.get(WASHER_FRICTION, 0), confidence)
+
+
+# Background writer of detection rows, shared by every page and session of the process
+class ResultWriter:
+    def __init__(self, spool_dir=SPOOL_DIR, batch_size=WRITE_BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 max_buffer=MAX_BUFFER):
+        self.spool_path = os.path.join(spool_dir, "detections.jsonl")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.submitted = 0
+        self.written = 0
+        self.batches = 0
+        self.spooled = 0            # Rows that went to the spool (database down or buffer full)
+        self.replayed = 0           # Spooled rows written back to the database
+        self.failures = 0
+        self.last_error = None
+        self._buffer = queue.Queue(maxsize=max_buffer)
+        self._spool_lock = threading.Lock()
+        self._retry_at = 0.0
+        self._retry_delay = RETRY_DELAY
+        self._thread = threading.Thread(target=self._run, name="result-writer", daemon=True)
+        self._thread.start()
+
+    # Function to queue one row for table_name; never blocks on the database
+    def submit(self, table_name, row):
+        if table_name not in database.TABLES:
+            raise DatabaseError(f"Unknown table: {table_name}")
+        self.submitted += 1
+        try:
+            self._buffer.put_nowait((table_name, row))
+        except queue.Full:
+            self._spool([(table_name, row)])
+
+    def _run(self):
+        while True:
+            batch = []
+            stop = False
+            try:
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    try:
+                        item = self._buffer.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if item is _END:
+                        stop = True
+                        break
+                    batch.append(item)
+                if batch:
+                    self._write(batch)
+                spooled = os.path.exists(self.spool_path) or os.path.exists(self.spool_path + ".replay")
+                if spooled and time.monotonic() >= self._retry_at:
+                    self._replay()
+            except Exception as e:
+                # Anything unexpected (a full disk, a corrupt spool line, ...) is recorded in last_error;
+                # the thread keeps running, so later rows are still written and flush() still returns
+                self.failures += 1
+                self.last_error = f"{e.__class__.__name__}: {e}"
+            finally:
+                for _ in batch:
+                    self._buffer.task_done()
+                if stop:
+                    self._buffer.task_done()
+            if stop:
+                return
+
+    # Function to write the rows of one table in one transaction; returns False (and backs off) when
+    # the database failed, in which case none of the rows were written
+    def _insert(self, table_name, rows):
+        try:
+            database.insert_detections(table_name, rows)
+            self.batches += 1
+        except DatabaseError as e:
+            self.failures += 1
+            self.last_error = str(e)
+            self._retry_at = time.monotonic() + self._retry_delay
+            self._retry_delay = min(self._retry_delay * 2, MAX_RETRY_DELAY)
+            return False
+        self._retry_delay = RETRY_DELAY
+        return True
+
+    def _write(self, batch):
+        for table_name, rows in _group_by_table(batch).items():
+            # While backing off, rows go straight to the spool rather than waiting on a dead database
+            if time.monotonic() >= self._retry_at and self._insert(table_name, rows):
+                self.written += len(rows)
+            else:
+                self._spool([(table_name, row) for row in rows])
+
+    # Function to append rows durably (fsync) to the local spool
+    def _spool(self, items):
+        with self._spool_lock:
+            os.makedirs(os.path.dirname(self.spool_path) or ".", exist_ok=True)
+            _write_jsonl(self.spool_path, items, "a")
+            self.spooled += len(items)
+
+    # Function to write the spool back to the database, table by table a batch at a time. The spool
+    # is first moved aside, so new rows can keep being spooled meanwhile; rows that could not be
+    # written stay in the moved file for the next attempt, so nothing is lost or written twice.
+    def _replay(self):
+        replay_path = self.spool_path + ".replay"
+        with self._spool_lock:
+            if not os.path.exists(replay_path):
+                os.replace(self.spool_path, replay_path)
+        with open(replay_path) as f:
+            items = [(entry["table"], entry["row"]) for entry in map(json.loads, filter(str.strip, f))]
+        remaining = []
+        for table_name, rows in _group_by_table(items).items():
+            done = 0
+            while not remaining and done < len(rows):
+                chunk = rows[done:done + self.batch_size]
+                if not self._insert(table_name, chunk):
+                    break
+                done += len(chunk)
+            self.replayed += done
+            self.written += done
+            remaining.extend((table_name, row) for row in rows[done:])
+        if not remaining:
+            os.remove(replay_path)
+        elif len(remaining) < len(items):
+            _write_jsonl(replay_path + ".tmp", remaining, "w")
+            os.replace(replay_path + ".tmp", replay_path)
+
+    # Function to wait until every submitted row is written or spooled
+    def flush(self):
+        self._buffer.join()
+
+    # Function to write what is buffered and stop the writer thread (at interpreter exit)
+    def close(self):
+        if self._thread.is_alive():
+            self._buffer.put(_END)
+            self._thread.join(timeout=30)
+
+    @property
+    def pending(self):
+        return self._buffer.qsize()
+
+    # Function to summarise the counters for display on the pages
+    def describe(self):
+        state = f"database unreachable, retrying ({self.last_error})" if time.monotonic() < self._retry_at \
+            else "writing"
+        return f"Detection writer {state}: {self.written} rows written in {self.batches} batches, " \
+               f"{self.pending} buffered, {self.spooled} spooled, {self.replayed} replayed from spool"
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+# Function to return the process-wide detection writer, starting it on first use
+def get_result_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = ResultWriter()
+                atexit.register(_writer.close)
+    return _writer
+
+
+# Function to save the detections of a batch of images, one row per image.
+# sources: one name per result (camera, file name, ...); vehicle: (type, vin, seq no., colour).
+def save_results(table_name, sources, results, names, vehicle):
+    if not results:
+        return []
+    counts = class_counts(results, len(names))
+    verdicts = batch_verdicts(counts, names)
+    writer = get_result_writer()
+    for source, result, image_counts, verdict_value in zip(sources, results, counts, verdicts):
+        confidences = result.boxes.conf.cpu().numpy()
+        confidence = round(float(np.mean(confidences)), 4) if len(confidences) else None
+        count_of = {name: int(image_counts[class_id]) for class_id, name in names.items()}
+        writer.submit(table_name, detection_row(source, count_of, verdict_value, confidence, vehicle))
+    return verdicts
+
+
+# Function to save tracked parts, one row per physical bracket/washer counting its one class
+def save_parts(table_name, source, parts, vehicle):
+    writer = get_result_writer()
+    for part in parts:
+        counts = {name: int(part["class_name"] == name) for name in PARTS}
+        writer.submit(table_name, detection_row(f"{source} #{part['id']}", counts, part_status(part["class_name"]),
+                                                part["confidence"], vehicle))
+
+
+# Saves at most one row per live camera every interval seconds, so a 30 FPS stream records the
+# state of the line without writing thirty near-identical rows a second
+class LiveSaver:
+    def __init__(self, table_name, interval=LIVE_SAVE_INTERVAL):
+        self.table_name = table_name
+        self.interval = interval
+        self.vehicle = ("", "", "", "")
+        self._last_saved = {}
+
+    def offer(self, source, result, names):
+        now = time.monotonic()
+        if now - self._last_saved.get(source, 0.0) < self.interval:
+            return
+        self._last_saved[source] = now
+        save_results(self.table_name, [source], [result], names, self.vehicle)
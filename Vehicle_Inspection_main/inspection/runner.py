@@ -0,0 +1,281 @@
+import os
+import sys
+import glob
+import json
+import time
+import hashlib
+import argparse
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from inspection.backends import BACKENDS, DEFAULT_BACKEND
+from inspection.batch_inference import DEFAULT_BATCH_SIZE, DEFAULT_IMGSZ, make_batches
+from inspection.model_registry import DEFAULT_MODEL_PATH, get_model
+from inspection.result_writer import LIVE_SAVE_INTERVAL, detection_row, get_result_writer, save_parts
+from inspection.verdict import OK, NOT_OK, UNKNOWN, verdict, class_counts, batch_verdicts
+
+# Headless inspection without a browser session. Images, videos and cameras are inspected with the
+# same verdict rules as the pages; every result is appended to results.jsonl in the output
+# directory and saved to the database through the background writer (under --vin, or skipped with
+# --no-db), where the pages show it:
+#
+#   python -m inspection.runner images/ "uploads/*.jpg" videos/demo.mp4 --workers 4 --no-db
+#   python -m inspection.runner http://192.168.1.158:8081 http://192.168.1.152:8081 --serve --vin PM2...
+#
+# Image chunks and videos are spread over worker processes that each load the model once.
+# Cameras run in this process as a daemon (all cameras batched into one model call, one result per
+# camera every --interval seconds) until Ctrl+C or --duration; --serve publishes their annotated
+# streams on the stream server so the Live page can view them without running detection itself
+# (with INSPECTION_STREAM_HOST=0.0.0.0 when the browsers are on other machines).
+# (Not called "inspect": a module of that name would shadow the standard library's.)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".asf", ".m4v")
+CAMERA_PREFIXES = ("http://", "https://", "rtsp://", "rtmp://")
+CHUNK_SIZE = 64             # Images per worker job
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+
+# Table each kind of source is saved to (the page that shows it)
+TABLES = {"image": "data_bulk_image", "video": "data_video", "camera": "data_live"}
+
+# Model and settings of a worker process, set once by _init_worker
+_worker_model = None
+_worker_settings = None
+
+
+# Function to sort the command-line sources into image files, video files and cameras.
+# A source is a directory (its images and videos), a glob, a file, a stream URL or a device number.
+def expand_sources(specs):
+    images, videos, cameras = [], [], []
+    for spec in specs:
+        if spec.isdigit() or spec.startswith(CAMERA_PREFIXES):
+            cameras.append(int(spec) if spec.isdigit() else spec)
+            continue
+        if os.path.isdir(spec):
+            paths = sorted(glob.glob(os.path.join(spec, "*")))
+        else:
+            paths = sorted(glob.glob(spec))
+            if not paths:
+                raise FileNotFoundError(f"No such file, directory or camera: {spec}")
+        for path in paths:
+            extension = os.path.splitext(path)[1].lower()
+            if extension in IMAGE_EXTENSIONS:
+                images.append(path)
+            elif extension in VIDEO_EXTENSIONS:
+                videos.append(path)
+    return images, videos, cameras
+
+
+# Function to turn one detection result into the record written to disk and to the database
+def result_record(source, result, names, kind="image"):
+    counts = class_counts([result], len(names))
+    confidences = result.boxes.conf.tolist()
+    return {
+        "source": str(source),
+        "kind": kind,
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "verdict": batch_verdicts(counts, names)[0],
+        "counts": {name: int(counts[0][class_id]) for class_id, name in names.items()},
+        "confidence": round(sum(confidences) / len(confidences), 4) if confidences else None,
+        "detections": [{"class": names[int(cls)], "confidence": round(conf, 4), "box": [round(v, 1) for v in box]}
+                       for cls, conf, box in zip(result.boxes.cls.tolist(), confidences, result.boxes.xyxy.tolist())],
+    }
+
+
+def _init_worker(model_path, backend, settings):
+    global _worker_model, _worker_settings
+    import torch
+    # Split the cores between the workers instead of every process starting one thread per core
+    torch.set_num_threads(settings["threads"])
+    _worker_model = get_model(model_path, device="cpu" if settings["cpu"] else None, backend=backend)
+    _worker_settings = settings
+
+
+# Function (run in a worker) to inspect a chunk of images through the decode -> infer -> encode
+# pipeline, writing the annotated JPEGs into annotated_dir when given
+def inspect_images(paths, annotated_dir=None):
+    from inspection.bulk_pipeline import run_pipeline
+
+    settings = _worker_settings
+    records = []
+    for index, result, _, jpeg_bytes in run_pipeline(_worker_model, paths, settings["conf"], settings["batch_size"],
+                                                     settings["imgsz"]):
+        record = result_record(paths[index], result, _worker_model.names)
+        if annotated_dir:
+            # The path hash keeps files with the same name from different folders apart
+            name = os.path.splitext(os.path.basename(paths[index]))[0]
+            digest = hashlib.sha1(os.path.abspath(paths[index]).encode()).hexdigest()[:8]
+            record["annotated"] = os.path.join(annotated_dir, f"{name}_{digest}.jpg")
+            with open(record["annotated"], "wb") as f:
+                f.write(jpeg_bytes)
+        records.append(record)
+    return records
+
+
+# Function (run in a worker) to inspect a video into an annotated MP4 plus detections, tracking the
+# parts so the video gets one verdict per physical bracket/washer
+def inspect_video(path, output_dir):
+    from inspection.tracking import IoUTracker
+    from inspection.video_pipeline import process_video
+
+    settings = _worker_settings
+    tracker = IoUTracker()
+    outputs = process_video(_worker_model, path, output_dir, settings["conf"], settings["batch_size"],
+                            settings["imgsz"], tracker=tracker)
+    parts = tracker.parts()
+    return [{
+        "source": path,
+        "kind": "video",
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "verdict": verdict({part["class_name"] for part in parts}),
+        "parts": parts,
+        "outputs": outputs,
+    }]
+
+
+# Writes every record to results.jsonl and (unless disabled) to the database, and keeps the tally
+class RecordSink:
+    def __init__(self, output_dir, vehicle, save_to_database=True, table=None):
+        self.path = os.path.join(output_dir, "results.jsonl")
+        self.vehicle = vehicle
+        self.save_to_database = save_to_database
+        self.table = table
+        self.verdicts = {OK: 0, NOT_OK: 0, UNKNOWN: 0}
+        self._file = open(self.path, "a")
+
+    def emit(self, record):
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        self.verdicts[record["verdict"]] += 1
+        if not self.save_to_database:
+            return
+        table = self.table or TABLES[record["kind"]]
+        if "parts" in record:
+            save_parts(table, record["source"], record["parts"], self.vehicle)
+        else:
+            get_result_writer().submit(table, detection_row(record["source"], record["counts"], record["verdict"],
+                                                            record["confidence"], self.vehicle))
+
+    def close(self):
+        self._file.close()
+
+    def describe(self):
+        return f"{sum(self.verdicts.values())} results ({self.verdicts[OK]} OK, {self.verdicts[NOT_OK]} NOT OK, " \
+               f"{self.verdicts[UNKNOWN]} unknown) in {self.path}"
+
+
+# Function to inspect image files and videos on a pool of worker processes, emitting each
+# record as soon as its job finishes
+def run_files(images, videos, sink, output_dir, model_path, backend, settings, workers, save_images=True):
+    annotated_dir = os.path.join(output_dir, "annotated") if save_images else None
+    if annotated_dir:
+        os.makedirs(annotated_dir, exist_ok=True)
+    videos_dir = os.path.join(output_dir, "videos")
+    if videos:
+        # cv2.VideoWriter cannot create the directory and only reports that it did not open
+        os.makedirs(videos_dir, exist_ok=True)
+    # spawn: forked copies of a process that already imported torch can deadlock in its thread pools
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                             initargs=(model_path, backend, settings)) as pool:
+        futures = {pool.submit(inspect_images, chunk, annotated_dir): chunk
+                   for chunk in make_batches(images, CHUNK_SIZE)}
+        futures.update({pool.submit(inspect_video, video, videos_dir): [video]
+                        for video in videos})
+        for future in as_completed(futures):
+            try:
+                records = future.result()
+            except Exception as e:
+                print(f"Failed to inspect {', '.join(futures[future])}: {e}", file=sys.stderr)
+                continue
+            for record in records:
+                sink.emit(record)
+
+
+# Function to watch cameras until interrupted (or for duration seconds): the latest frames of all
+# cameras go through one model call, and every camera emits one record per interval
+def run_cameras(sources, sink, model, settings, interval=LIVE_SAVE_INTERVAL, duration=None, serve=False):
+    from inspection.live_cameras import MultiCameraScheduler, get_camera_manager
+
+    manager = get_camera_manager()
+    cameras = [manager.get(source, f"camera{number + 1}") for number, source in enumerate(sources)]
+    scheduler = MultiCameraScheduler(model, cameras, settings["conf"], settings["imgsz"])
+    publisher = None
+    if serve:
+        from inspection.stream_server import get_stream_server
+        server = get_stream_server()
+        publisher = server.publisher
+        for camera in cameras:
+            print(f"{camera.name} ({camera.source}): {server.url('localhost', camera.name)}")
+    last_emitted = {}
+    deadline = time.monotonic() + duration if duration else None
+    while deadline is None or time.monotonic() < deadline:
+        for camera, _, result in scheduler.step():
+            # Only encode frames somebody is watching
+            if publisher is not None and publisher.viewers(camera.name):
+                publisher.publish(camera.name, result.plot())
+            now = time.monotonic()
+            if now - last_emitted.get(camera, 0.0) >= interval:
+                last_emitted[camera] = now
+                sink.emit(result_record(camera.name, result, model.names, kind="camera"))
+    manager.close_all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect images, videos and cameras without the Streamlit app")
+    parser.add_argument("sources", nargs="+", help="directories, globs, image/video files, stream URLs or "
+                                                   "camera device numbers")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--backend", default=DEFAULT_BACKEND, choices=BACKENDS)
+    parser.add_argument("--cpu", action="store_true", help="run on the CPU even when a GPU is available")
+    parser.add_argument("--conf", type=float, default=0.4)
+    parser.add_argument("--imgsz", type=int, default=DEFAULT_IMGSZ)
+    parser.add_argument("--batch", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="worker processes for files")
+    parser.add_argument("--output", help="output directory (default: inspection_output/<timestamp>)")
+    parser.add_argument("--no-images", action="store_true", help="do not write annotated images")
+    parser.add_argument("--no-db", action="store_true", help="only write results to disk")
+    parser.add_argument("--table", help="save every result to this table instead of the one of its page")
+    parser.add_argument("--type", default="")
+    parser.add_argument("--vin", default="", help="VIN recorded with the results (required unless --no-db)")
+    parser.add_argument("--seq", default="")
+    parser.add_argument("--colour", default="")
+    parser.add_argument("--interval", type=float, default=LIVE_SAVE_INTERVAL,
+                        help="seconds between two results of one camera")
+    parser.add_argument("--duration", type=float, help="stop watching the cameras after this many seconds")
+    parser.add_argument("--serve", action="store_true", help="publish the annotated camera streams")
+    args = parser.parse_args()
+    # Like the pages, results are only saved to the database for a known vehicle
+    if not args.no_db and not args.vin.strip():
+        parser.error("--vin is required to save results to the database (or pass --no-db)")
+
+    images, videos, cameras = expand_sources(args.sources)
+    output_dir = args.output or os.path.join("inspection_output", f"{datetime.now():%Y%m%d_%H%M%S}")
+    os.makedirs(output_dir, exist_ok=True)
+    workers = max(1, args.workers)
+    settings = {"conf": args.conf, "imgsz": args.imgsz, "batch_size": args.batch, "cpu": args.cpu,
+                "threads": max(1, (os.cpu_count() or 1) // workers)}
+    sink = RecordSink(output_dir, (args.type, args.vin, args.seq, args.colour), not args.no_db, args.table)
+    start = time.perf_counter()
+    try:
+        if images or videos:
+            print(f"Inspecting {len(images)} images and {len(videos)} videos on {workers} workers")
+            run_files(images, videos, sink, output_dir, args.model, args.backend, settings, workers,
+                      not args.no_images)
+        if cameras:
+            model = get_model(args.model, device="cpu" if args.cpu else None, backend=args.backend)
+            print(f"Watching {len(cameras)} cameras (Ctrl+C to stop)")
+            run_cameras(cameras, sink, model, settings, args.interval, args.duration, args.serve)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sink.close()
+        if not args.no_db:
+            get_result_writer().close()
+            print(get_result_writer().describe())
+    print(f"{sink.describe()} after {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import time
+import threading
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from PIL import Image
+
+# motionEye serves the current picture of its first camera here
+SNAPSHOT_PATH = "/picture/1/current/"
+FETCH_TIMEOUT = 5           # Seconds to wait for a camera before reporting it as timed out
+HTTP_POOL_SIZE = 8          # Keep-alive connections kept per camera host
+
+
+# Outcome of fetching one camera: the decoded image or an error message, plus the latency
+class Snapshot:
+    def __init__(self, url, image=None, error=None, seconds=0.0):
+        self.url = url
+        self.image = image
+        self.error = error
+        self.seconds = seconds
+
+    @property
+    def ok(self):
+        return self.image is not None
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+# Function to return the process-wide HTTP session; its pooled keep-alive connections save a
+# TCP handshake to every camera on every capture
+def get_http_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+# Function to build the snapshot URL of a camera from its IP address (optionally with :port)
+def snapshot_url(ip_address):
+    return f"http://{ip_address}{SNAPSHOT_PATH}"
+
+
+# Function to fetch and decode the image of one camera
+def fetch_snapshot(url, timeout=FETCH_TIMEOUT):
+    start = time.perf_counter()
+    try:
+        response = get_http_session().get(url, timeout=timeout)
+        response.raise_for_status()  # Raise an HTTPError for bad responses
+        image = Image.open(BytesIO(response.content))
+        image.load()  # Decode here, on the fetching thread
+        return Snapshot(url, image=image, seconds=time.perf_counter() - start)
+    except requests.exceptions.Timeout:
+        error = f"Request to {url} timed out."
+    except requests.exceptions.ConnectionError:
+        error = f"Failed to connect to {url}. Please check the IP address format."
+    except requests.exceptions.HTTPError as e:
+        error = f"HTTP error occurred: {e}. Make sure Raspberry is Turned On and Check IP Address Number"
+    except requests.exceptions.RequestException as e:
+        error = f"An error occurred: {e}"
+    except OSError as e:
+        error = f"{url} did not return a readable image: {e}"
+    return Snapshot(url, error=error, seconds=time.perf_counter() - start)
+
+
+# Function to fetch every camera concurrently, so a capture takes as long as the slowest camera
+# instead of the sum of them. Returns one Snapshot per URL, in order.
+def fetch_snapshots(urls, timeout=FETCH_TIMEOUT):
+    urls = list(urls)
+    if len(urls) <= 1:
+        return [fetch_snapshot(url, timeout) for url in urls]
+    with ThreadPoolExecutor(max_workers=min(len(urls), HTTP_POOL_SIZE)) as executor:
+        return list(executor.map(lambda url: fetch_snapshot(url, timeout), urls))
@@ -0,0 +1,253 @@
+import os
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import cv2
+
+from inspection.batch_inference import DEFAULT_IMGSZ
+from inspection.live_cameras import MultiCameraScheduler
+
+# Annotated frames are pushed to the browser from this server instead of through st.image, so
+# the Streamlit script is not blocked and every extra viewer only costs a socket write: each
+# frame is detected and JPEG-encoded once, then shared by everyone watching its channel.
+#
+#   http://<host>:8502/stream/<channel>      MJPEG stream (use as <img src=...>)
+#   http://<host>:8502/snapshot/<channel>    latest annotated JPEG
+#
+# The server only listens on this machine by default; set INSPECTION_STREAM_HOST=0.0.0.0 to let
+# browsers on other machines (e.g. viewers of a headless runner) watch the camera streams.
+STREAM_HOST = os.environ.get("INSPECTION_STREAM_HOST", "127.0.0.1")
+STREAM_PORT = int(os.environ.get("INSPECTION_STREAM_PORT", "8502"))
+
+MAX_FPS = 10                # Frames per second published per channel
+MAX_WIDTH = 960             # Published frames wider than this are downscaled before encoding
+JPEG_QUALITY = 80
+DETECTOR_IDLE_TIMEOUT = 30  # Seconds a detector keeps running without any viewer
+BOUNDARY = "frame"
+
+
+# Latest encoded frame of every channel; viewers block on the condition until a newer one arrives
+class FramePublisher:
+    def __init__(self):
+        self._frames = {}           # channel -> (sequence, jpeg bytes)
+        self._viewers = {}          # channel -> number of open streams
+        self._last_viewed = {}      # channel -> monotonic time a viewer was last attached
+        self._condition = threading.Condition()
+
+    # Function to encode a BGR frame once (capped to MAX_WIDTH) and hand it to every viewer
+    def publish(self, channel, frame):
+        if frame.shape[1] > MAX_WIDTH:
+            frame = cv2.resize(frame, (MAX_WIDTH, frame.shape[0] * MAX_WIDTH // frame.shape[1]),
+                               interpolation=cv2.INTER_AREA)
+        jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])[1].tobytes()
+        with self._condition:
+            sequence = self._frames.get(channel, (0, None))[0] + 1
+            self._frames[channel] = (sequence, jpeg)
+            self._condition.notify_all()
+
+    # Function to wait for a frame newer than after, returns (sequence, jpeg) or None on timeout
+    def wait(self, channel, after=0, timeout=5.0):
+        with self._condition:
+            self._condition.wait_for(lambda: self._frames.get(channel, (0, None))[0] > after, timeout)
+            frame = self._frames.get(channel)
+            return frame if frame and frame[0] > after else None
+
+    def attach(self, channel):
+        with self._condition:
+            self._viewers[channel] = self._viewers.get(channel, 0) + 1
+            self._last_viewed[channel] = time.monotonic()
+
+    def detach(self, channel):
+        with self._condition:
+            self._viewers[channel] -= 1
+            self._last_viewed[channel] = time.monotonic()
+
+    def viewers(self, channel):
+        with self._condition:
+            return self._viewers.get(channel, 0)
+
+    # Seconds since the channel last had a viewer (0 while someone is watching)
+    def idle_seconds(self, channel, since):
+        with self._condition:
+            if self._viewers.get(channel, 0):
+                return 0.0
+            return time.monotonic() - max(self._last_viewed.get(channel, since), since)
+
+    def channels(self):
+        with self._condition:
+            return sorted(self._frames)
+
+    # Function to forget the last frame of a channel nobody publishes on any more
+    def drop(self, channel):
+        with self._condition:
+            self._frames.pop(channel, None)
+            if not self._viewers.get(channel):
+                self._viewers.pop(channel, None)
+                self._last_viewed.pop(channel, None)
+
+
+# Background thread detecting the latest frames of its cameras (batched through the
+# multi-camera scheduler) and publishing each annotated frame to the camera's channel at up
+# to MAX_FPS. Results are offered to the saver, if any, for automatic saving.
+# Stops by itself once nobody has watched any of its channels for a while.
+class LiveDetector:
+    def __init__(self, publisher, model, cameras, conf, saver=None, imgsz=DEFAULT_IMGSZ, suffix=""):
+        self.publisher = publisher
+        self.scheduler = MultiCameraScheduler(model, cameras, conf, imgsz)
+        self._channel_of = {camera.name: camera.name + suffix for camera in cameras}
+        self.channels = list(self._channel_of.values())
+        self.saver = saver
+        self.started = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="live-detector", daemon=True)
+
+    @property
+    def running(self):
+        return self._thread.is_alive() and not self._stop.is_set()
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    # Function to give the channel the camera's annotated frames are published on
+    def channel(self, camera):
+        return self._channel_of[camera.name]
+
+    def _idle(self):
+        return all(self.publisher.idle_seconds(channel, self.started) > DETECTOR_IDLE_TIMEOUT
+                   for channel in self.channels)
+
+    def _run(self):
+        interval = 1 / MAX_FPS
+        while not self._stop.is_set() and not self._idle():
+            started = time.monotonic()
+            for camera, frame, result in self.scheduler.step():
+                self.publisher.publish(self._channel_of[camera.name], result.plot())
+                if self.saver is not None:
+                    self.saver.offer(camera.name, result, self.scheduler.model.names)
+            # Cap the rate: no point detecting frames faster than they are published
+            self._stop.wait(max(0.0, interval - (time.monotonic() - started)))
+        self._stop.set()
+
+
+def make_handler(publisher):
+    class StreamHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            parts = self.path.strip("/").split("/")
+            if len(parts) == 2 and parts[0] == "stream":
+                self.send_stream(parts[1])
+            elif len(parts) == 2 and parts[0] == "snapshot":
+                self.send_snapshot(parts[1])
+            elif parts == [""]:
+                body = "\n".join(publisher.channels()).encode()
+                self.send_body(body, "text/plain")
+            else:
+                self.send_error(404)
+
+        def send_body(self, body, content_type):
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def send_snapshot(self, channel):
+            frame = publisher.wait(channel, timeout=0)
+            if frame is None:
+                self.send_error(404, f"No frames on channel {channel}")
+            else:
+                self.send_body(frame[1], "image/jpeg")
+
+        def send_stream(self, channel):
+            self.send_response(200)
+            self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            publisher.attach(channel)
+            sequence = 0
+            try:
+                while True:
+                    frame = publisher.wait(channel, sequence)
+                    if frame is None:
+                        continue
+                    sequence, jpeg = frame
+                    self.wfile.write(f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                                     f"Content-Length: {len(jpeg)}\r\n\r\n".encode() + jpeg + b"\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                publisher.detach(channel)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StreamHandler
+
+
+# Function to build the URL of a channel on a stream server running on host (this process or
+# another one, e.g. the headless runner started with --serve)
+def stream_url(host, channel, kind="stream", port=STREAM_PORT):
+    return f"http://{host}:{port}/{kind}/{channel}"
+
+
+# HTTP server of the annotated streams plus the detectors feeding them, one per process
+class StreamServer:
+    def __init__(self, host=STREAM_HOST, port=STREAM_PORT):
+        self.publisher = FramePublisher()
+        self.server = ThreadingHTTPServer((host, port), make_handler(self.publisher))
+        self.server.daemon_threads = True
+        self.port = self.server.server_port
+        self._detectors = {}
+        self._detector_count = 0
+        self._lock = threading.Lock()
+        threading.Thread(target=self.server.serve_forever, name="stream-server", daemon=True).start()
+
+    # Function to make sure a detector is publishing the given cameras with these settings. Sessions
+    # asking for the same cameras, confidence and saving share one detector (and one inference);
+    # other settings get a detector of their own, publishing on channels of its own (see channel()),
+    # so one session never changes what another one sees or saves.
+    def ensure_detector(self, model, cameras, conf, saver=None):
+        saving = None if saver is None else (saver.table_name, tuple(saver.vehicle), saver.interval)
+        key = (tuple(camera.name for camera in cameras), conf, saving)
+        with self._lock:
+            detector = self._detectors.get(key)
+            if detector is None or not detector.running:
+                self._detector_count += 1
+                detector = LiveDetector(self.publisher, model, cameras, conf, saver,
+                                        suffix=f"-{self._detector_count}").start()
+                self._detectors[key] = detector
+            # Forget the detectors that stopped for lack of viewers, and their last frames
+            for stale in [stale for stale, other in self._detectors.items() if not other.running]:
+                for channel in self._detectors.pop(stale).channels:
+                    self.publisher.drop(channel)
+            return detector
+
+    # Function to build the URL a browser on host uses for a channel
+    def url(self, host, channel, kind="stream"):
+        return stream_url(host, channel, kind, self.port)
+
+    def describe(self):
+        with self._lock:
+            detectors = [detector for detector in self._detectors.values() if detector.running]
+        channels = self.publisher.channels()
+        return f"Stream server on port {self.port}: {len(detectors)} detectors, " + \
+               ", ".join(f"{channel} ({self.publisher.viewers(channel)} viewers)" for channel in channels)
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+# Function to return the process-wide stream server, starting it on first use
+def get_stream_server():
+    global _server
+    if _server is None:
+        with _server_lock:
+            if _server is None:
+                _server = StreamServer()
+    return _server
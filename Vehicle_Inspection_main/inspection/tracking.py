@@ -0,0 +1,175 @@
+import cv2
+
+from inspection.verdict import DEFECT_CLASSES, PARTS, NOT_OK, part_status
+
+# Matching and lifetime of tracks, in frames
+DEFAULT_IOU_THRESHOLD = 0.3     # Overlap a detection needs with a track's predicted box to continue it
+DEFAULT_MAX_AGE = 15            # Frames a track survives without a matching detection
+DEFAULT_MIN_HITS = 3            # Detections before a track counts as a real part (drops one-frame flickers)
+VELOCITY_SMOOTHING = 0.5        # Weight of the newest motion in the constant-velocity estimate
+DEFECT_MIN_FRAMES = 3           # Frames a defect class must be detected in to make the part defective
+DEFECT_MIN_CONFIDENCE = 0.5     # Confidence a defect detection needs to count towards DEFECT_MIN_FRAMES
+
+# Box colours (BGR) of the drawn tracks
+OK_COLOUR = (0, 170, 0)
+NOT_OK_COLOUR = (0, 0, 220)
+
+
+# Function to compute the intersection over union of two xyxy boxes
+def iou(a, b):
+    width = min(a[2], b[2]) - max(a[0], b[0])
+    height = min(a[3], b[3]) - max(a[1], b[1])
+    if width <= 0 or height <= 0:
+        return 0.0
+    intersection = width * height
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+# One physical bracket or washer followed across frames. The box moves with a smoothed
+# constant velocity (a Kalman filter without the covariance bookkeeping), which is what
+# carries it through frames that were not detected. Every detection votes for its class
+# with its confidence, and the part's class is the one with the most votes, except that a
+# defect outweighs any number of OK frames: once a defect class has been detected with at
+# least DEFECT_MIN_CONFIDENCE in DEFECT_MIN_FRAMES frames, the part is that defect. A bracket
+# that only shows its bend from some angles is still reported crooked.
+class Track:
+    def __init__(self, track_id, frame_index, box, class_name, confidence):
+        self.id = track_id
+        self.part = PARTS.get(class_name, class_name)
+        self.box = list(box)
+        self.velocity = [0.0, 0.0, 0.0, 0.0]
+        self.first_frame = frame_index
+        self.last_frame = frame_index
+        self.hits = 1
+        self.votes = {class_name: confidence}
+        self.detections = {class_name: 1}   # class -> frames it was detected in
+        self.defect_frames = {}     # defect class -> frames it was detected in with enough confidence
+        self._count_defect(class_name, confidence)
+
+    # Function to predict the box at a later (or skipped) frame
+    def predict(self, frame_index):
+        frames = frame_index - self.last_frame
+        return [coordinate + speed * frames for coordinate, speed in zip(self.box, self.velocity)]
+
+    def update(self, frame_index, box, class_name, confidence):
+        frames = max(1, frame_index - self.last_frame)
+        self.velocity = [VELOCITY_SMOOTHING * (new - old) / frames + (1 - VELOCITY_SMOOTHING) * speed
+                         for new, old, speed in zip(box, self.box, self.velocity)]
+        self.box = list(box)
+        self.last_frame = frame_index
+        self.hits += 1
+        self.votes[class_name] = self.votes.get(class_name, 0.0) + confidence
+        self.detections[class_name] = self.detections.get(class_name, 0) + 1
+        self._count_defect(class_name, confidence)
+
+    def _count_defect(self, class_name, confidence):
+        if class_name in DEFECT_CLASSES and confidence >= DEFECT_MIN_CONFIDENCE:
+            self.defect_frames[class_name] = self.defect_frames.get(class_name, 0) + 1
+
+    @property
+    def class_name(self):
+        defects = [name for name, frames in self.defect_frames.items() if frames >= DEFECT_MIN_FRAMES]
+        if defects:
+            return max(defects, key=self.votes.get)
+        return max(self.votes, key=self.votes.get)
+
+    @property
+    def status(self):
+        return part_status(self.class_name)
+
+    def summary(self):
+        return {
+            "id": self.id,
+            "part": self.part,
+            "class_name": self.class_name,
+            "status": self.status,
+            # Mean confidence of the detections of the reported class
+            "confidence": round(self.votes[self.class_name] / self.detections[self.class_name], 4),
+            "first_frame": self.first_frame,
+            "last_frame": self.last_frame,
+            "detections": self.hits,
+        }
+
+
+# Greedy IoU tracker over the detections of a video or stream. Detections only continue
+# tracks of the same part, so a bracket flickering between straight and crooked stays one
+# track and ends up with one consolidated verdict.
+class IoUTracker:
+    def __init__(self, iou_threshold=DEFAULT_IOU_THRESHOLD, max_age=DEFAULT_MAX_AGE, min_hits=DEFAULT_MIN_HITS):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.tracks = []
+        self.finished = []
+        self._next_id = 1
+
+    # Function to add the detections [(xyxy box, class name, confidence)] of one frame
+    def update(self, frame_index, detections):
+        candidates = []
+        for track_number, track in enumerate(self.tracks):
+            predicted = track.predict(frame_index)
+            for detection_number, (box, class_name, _) in enumerate(detections):
+                if PARTS.get(class_name, class_name) != track.part:
+                    continue
+                overlap = iou(predicted, box)
+                if overlap >= self.iou_threshold:
+                    candidates.append((overlap, track_number, detection_number))
+
+        # Best overlaps first, every track and detection used at most once
+        matched_tracks = set()
+        matched_detections = set()
+        for _, track_number, detection_number in sorted(candidates, reverse=True):
+            if track_number in matched_tracks or detection_number in matched_detections:
+                continue
+            self.tracks[track_number].update(frame_index, *detections[detection_number])
+            matched_tracks.add(track_number)
+            matched_detections.add(detection_number)
+
+        for detection_number, (box, class_name, confidence) in enumerate(detections):
+            if detection_number not in matched_detections:
+                self.tracks.append(Track(self._next_id, frame_index, box, class_name, confidence))
+                self._next_id += 1
+
+        self._retire(lambda track: frame_index - track.last_frame > self.max_age)
+
+    # Function to add the detections of an ultralytics result
+    def update_from_result(self, frame_index, result):
+        boxes = result.boxes
+        detections = [(box, result.names[int(class_id)], confidence) for class_id, confidence, box
+                      in zip(boxes.cls.tolist(), boxes.conf.tolist(), boxes.xyxy.tolist())]
+        self.update(frame_index, detections)
+
+    # Function to return [(track, box)] of the confirmed tracks at a frame, predicted for frames
+    # that were not detected
+    def boxes_at(self, frame_index):
+        return [(track, track.predict(frame_index)) for track in self.tracks if track.hits >= self.min_hits]
+
+    def _retire(self, condition):
+        active = []
+        for track in self.tracks:
+            if not condition(track):
+                active.append(track)
+            elif track.hits >= self.min_hits:
+                self.finished.append(track)
+        self.tracks = active
+
+    # Function to close every track at the end of a video and return one summary per part
+    def finish(self):
+        self._retire(lambda track: True)
+        return self.parts()
+
+    # Function to return one summary per part seen so far (finished tracks only)
+    def parts(self):
+        return [track.summary() for track in sorted(self.finished, key=lambda track: track.id)]
+
+
+# Function to draw the tracked boxes with their ID and consolidated class onto a BGR frame
+def draw_tracks(frame, tracked):
+    for track, box in tracked:
+        colour = NOT_OK_COLOUR if track.status == NOT_OK else OK_COLOUR
+        x1, y1, x2, y2 = (int(round(coordinate)) for coordinate in box)
+        cv2.rectangle(frame, (x1, y1), (x2, y2), colour, 2)
+        cv2.putText(frame, f"#{track.id} {track.class_name}", (x1, max(y1 - 6, 12)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, colour, 1, cv2.LINE_AA)
+    return frame
@@ -0,0 +1,72 @@
+import numpy as np
+
+# Classes of the trained model (Vehicle_Yolov9/config.yaml)
+CROOKED_BRACKET = "crooked bracket"
+NO_WASHER_FRICTION = "no washer friction"
+STRAIGHT_BRACKET = "straight bracket"
+WASHER_FRICTION = "washer friction"
+
+# Any of these makes the inspection NOT OK; exactly these two together make it OK
+DEFECT_CLASSES = {CROOKED_BRACKET, WASHER_FRICTION}
+OK_CLASSES = {STRAIGHT_BRACKET, NO_WASHER_FRICTION}
+
+# Physical part each class describes, a bracket and a washer can show either class over time
+PARTS = {
+    CROOKED_BRACKET: "bracket",
+    STRAIGHT_BRACKET: "bracket",
+    WASHER_FRICTION: "washer",
+    NO_WASHER_FRICTION: "washer",
+}
+
+OK = "OK"
+NOT_OK = "NOT OK"
+UNKNOWN = "Unknown"
+
+
+# Function to decide OK / NOT OK / Unknown from the set of class names detected in one view
+def verdict(detected_classes):
+    detected_classes = set(detected_classes)
+    if detected_classes & DEFECT_CLASSES:
+        return NOT_OK
+    if detected_classes == OK_CLASSES:
+        return OK
+    return UNKNOWN
+
+
+# Function to count the detections of every class per image of a batched prediction: one bincount
+# over the concatenated class tensors instead of a Python loop over every box.
+# Returns an (images, classes) array of counts.
+def class_counts(results, num_classes):
+    class_ids = [result.boxes.cls.cpu().numpy().astype(np.int64) for result in results]
+    if not class_ids:
+        return np.zeros((0, num_classes), dtype=np.int64)
+    image_ids = np.repeat(np.arange(len(class_ids)), [len(ids) for ids in class_ids])
+    flat = image_ids * num_classes + np.concatenate(class_ids)
+    return np.bincount(flat, minlength=len(class_ids) * num_classes).reshape(len(class_ids), num_classes)
+
+
+# Function to apply the verdict rule to every row of class_counts at once; names is the model's
+# {class id: class name}. Returns one OK / NOT OK / Unknown per image.
+def batch_verdicts(counts, names):
+    present = counts > 0
+    ids = {name: class_id for class_id, name in names.items()}
+    defect_ids = [ids[name] for name in DEFECT_CLASSES if name in ids]
+    ok_ids = [ids[name] for name in OK_CLASSES if name in ids]
+    other_ids = [class_id for class_id in range(counts.shape[1]) if class_id not in ok_ids]
+
+    not_ok = present[:, defect_ids].any(axis=1)
+    ok = present[:, ok_ids].all(axis=1) & ~present[:, other_ids].any(axis=1)
+    if len(ok_ids) != len(OK_CLASSES):
+        ok[:] = False   # A model without both OK classes can never confirm an OK
+    return np.where(not_ok, NOT_OK, np.where(ok, OK, UNKNOWN)).tolist()
+
+
+# Function to decide the status of one physical part from the class it was detected as
+def part_status(class_name):
+    return NOT_OK if class_name in DEFECT_CLASSES else OK
+
+
+# Function to turn a verdict into the lower-case Status value stored in the database
+def status_value(verdict_value):
+    return verdict_value.lower()
+
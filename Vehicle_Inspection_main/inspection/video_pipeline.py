@@ -0,0 +1,363 @@
+import os
+import csv
+import json
+import time
+import queue
+import threading
+
+import cv2
+
+from inspection.batch_inference import BatchStats, DEFAULT_BATCH_SIZE, DEFAULT_IMGSZ
+from inspection.bulk_pipeline import StageStats
+from inspection.tracking import draw_tracks
+
+# Decoded frames the grabber may run ahead of inference
+DEFAULT_FRAME_QUEUE_SIZE = 8
+
+# Codecs tried in order for the annotated MP4: H.264 plays in the browser, but OpenCV builds
+# without an H.264 encoder only have mp4v, which is still fine for downloading
+OUTPUT_CODECS = ("avc1", "mp4v")
+
+# Columns of the per-frame detections CSV
+DETECTION_COLUMNS = ["frame", "time_s", "reused", "class_id", "class_name", "confidence", "x1", "y1", "x2", "y2"]
+
+# Adaptive frame skipping: frames are compared as small greyscale thumbnails, detection re-runs
+# when the mean absolute pixel difference to the last detected frame exceeds the threshold
+# (in grey levels, 0-255), and at least every DEFAULT_MAX_SKIP frames so boxes never go stale
+DEFAULT_MOTION_THRESHOLD = 4.0
+DEFAULT_MAX_SKIP = 30
+THUMBNAIL_SIZE = (64, 36)
+
+# Marker put on the frame queue after the last frame (or a read error)
+_END = object()
+
+
+# Observability for one grab -> infer -> plot -> display run
+class VideoStats:
+    def __init__(self, queue_size=DEFAULT_FRAME_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.decode = StageStats()
+        self.infer = BatchStats()
+        self.plot = StageStats()
+        self.display = StageStats()    # Time the caller spent on each frame before asking for the next
+        self.write = StageStats()      # Offline mode: writing the annotated frame to the output video
+        self.frames = 0
+        self.skipped = 0               # Frames that reused the previous detections
+        self.queue_max = 0             # Deepest the frame queue got
+        self.grabber_stalls = 0        # Grabber blocked because inference was behind (queue full)
+        self.infer_starved = 0         # Inference waited on an empty frame queue
+        self.infer_starved_s = 0.0
+        self.started = None
+        self.finished = None
+
+    @property
+    def wall_seconds(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def fps(self):
+        return self.frames / self.wall_seconds if self.wall_seconds else 0.0
+
+    def describe(self):
+        infer_ms = self.infer.seconds / self.infer.images * 1000 if self.infer.images else 0.0
+        last_stage = f"write {self.write.mean_ms:.1f} ms" if self.write.count else \
+            f"display {self.display.mean_ms:.1f} ms"
+        skipped = self.skipped / self.frames if self.frames else 0.0
+        return f"{self.frames} frames in {self.wall_seconds:.2f}s, {self.fps:.1f} FPS end-to-end, " \
+               f"{self.skipped} skipped ({skipped:.0%}) | " \
+               f"decode {self.decode.mean_ms:.1f} ms, infer {infer_ms:.1f} ms " \
+               f"({self.infer.batches} batches), plot {self.plot.mean_ms:.1f} ms, {last_stage} per frame | " \
+               f"frame queue max {self.queue_max}/{self.queue_size} | " \
+               f"stalls: grabber {self.grabber_stalls}, " \
+               f"inference starved {self.infer_starved} ({self.infer_starved_s:.2f}s)"
+
+
+# Decides which frames go to the model. With stride N only every N-th frame is detected;
+# in adaptive mode a frame is detected only when it differs enough from the last detected one
+# (checked on every stride-th frame). Skipped frames reuse the previous detections.
+class FrameSkipper:
+    def __init__(self, stride=1, adaptive=False, threshold=DEFAULT_MOTION_THRESHOLD, max_skip=DEFAULT_MAX_SKIP):
+        self.stride = max(1, int(stride))
+        self.adaptive = adaptive
+        self.threshold = threshold
+        self.max_skip = max(self.stride, int(max_skip))
+        self._reference = None
+        self._last_detected = None
+
+    @staticmethod
+    def thumbnail(frame):
+        return cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+
+    # Function to decide whether the frame at index needs a fresh detection
+    def should_detect(self, index, frame):
+        if self._last_detected is None:
+            detect = True
+        elif (index - self._last_detected) % self.stride:
+            detect = False
+        elif not self.adaptive or index - self._last_detected >= self.max_skip:
+            detect = True
+        else:
+            detect = float(cv2.absdiff(self.thumbnail(frame), self._reference).mean()) > self.threshold
+        if detect:
+            self._last_detected = index
+            if self.adaptive:
+                self._reference = self.thumbnail(frame)
+        return detect
+
+
+# Reader thread that decodes frames from a cv2.VideoCapture into a bounded queue, so decoding
+# overlaps with inference and display. Puts _END after the last frame; stop() ends it early.
+class FrameGrabber:
+    def __init__(self, capture, queue_size=DEFAULT_FRAME_QUEUE_SIZE, stats=None):
+        self.capture = capture
+        self.stats = stats if stats is not None else VideoStats(queue_size)
+        self.frames = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="frame-grabber", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=1)
+
+    def _put(self, item):
+        if self.frames.full():
+            self.stats.grabber_stalls += 1
+        while not self._stop.is_set():
+            try:
+                self.frames.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self):
+        index = 0
+        try:
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                ret, frame = self.capture.read()
+                if not ret:
+                    break
+                self.stats.decode.add(time.perf_counter() - start)
+                if not self._put((index, frame)):
+                    return
+                index += 1
+        finally:
+            self._put(_END)
+
+    # Function to yield (index, frame) until the end of the video
+    def __iter__(self):
+        while True:
+            self.stats.queue_max = max(self.stats.queue_max, self.frames.qsize())
+            if self.frames.empty():
+                self.stats.infer_starved += 1
+                wait_start = time.perf_counter()
+                item = self.frames.get()
+                self.stats.infer_starved_s += time.perf_counter() - wait_start
+            else:
+                item = self.frames.get()
+            if item is _END:
+                return
+            yield item
+
+
+# Function to draw one frame. With a tracker the frame's detections update it first and the
+# tracked parts are drawn (predicted through skipped frames); without one the frame's own
+# detections are drawn, or the previous detections onto it when the frame was skipped.
+def annotate_frame(index, frame, result, reused, tracker=None):
+    if tracker is not None:
+        if not reused:
+            tracker.update_from_result(index, result)
+        return draw_tracks(frame.copy(), tracker.boxes_at(index))
+    return result.plot(img=frame) if reused else result.plot()
+
+
+# Function to run detection over a video with frame decoding on its own thread.
+# Yields (index, frame, result, res_plotted BGR) per frame and stops cleanly at the end of
+# the video; the time the caller takes per frame is recorded as the display stage.
+def run_video(model, capture, conf, imgsz=DEFAULT_IMGSZ, queue_size=DEFAULT_FRAME_QUEUE_SIZE, stats=None,
+              skipper=None, tracker=None):
+    stats = stats if stats is not None else VideoStats(queue_size)
+    grabber = FrameGrabber(capture, queue_size, stats)
+    stats.started = time.perf_counter()
+    grabber.start()
+    result = None
+    try:
+        for index, frame in grabber:
+            if skipper is None or skipper.should_detect(index, frame):
+                start = time.perf_counter()
+                result = model.predict(frame, conf=conf, imgsz=imgsz, verbose=False)[0]
+                stats.infer.add(1, time.perf_counter() - start)
+                reused = False
+            else:
+                stats.skipped += 1
+                reused = True
+
+            start = time.perf_counter()
+            res_plotted = annotate_frame(index, frame, result, reused, tracker)
+            stats.plot.add(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            yield index, frame, result, res_plotted
+            stats.display.add(time.perf_counter() - start)
+            stats.frames += 1
+    finally:
+        stats.finished = time.perf_counter()
+        grabber.stop()
+
+
+# Function to open an MP4 writer with the first codec this OpenCV build supports
+def open_video_writer(path, fps, size):
+    for codec in OUTPUT_CODECS:
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), fps, size)
+        if writer.isOpened():
+            return writer
+        writer.release()
+    raise RuntimeError(f"No MP4 codec available to write {path}")
+
+
+# Function to turn the boxes of one result into detection rows of the CSV/JSON output
+def detection_rows(frame_index, fps, result, reused=False):
+    rows = []
+    boxes = result.boxes
+    for class_id, confidence, box in zip(boxes.cls.tolist(), boxes.conf.tolist(), boxes.xyxy.tolist()):
+        rows.append({
+            "frame": frame_index,
+            "time_s": round(frame_index / fps, 3),
+            "reused": reused,
+            "class_id": int(class_id),
+            "class_name": result.names[int(class_id)],
+            "confidence": round(confidence, 4),
+            "x1": round(box[0], 1), "y1": round(box[1], 1), "x2": round(box[2], 1), "y2": round(box[3], 1),
+        })
+    return rows
+
+
+# Function to process a whole video offline: frames are decoded on the grabber thread, sent to
+# the model batch_size at a time, and plotted + written to an annotated MP4 on a writer thread,
+# so the run goes at the speed of the model instead of the browser. Frames the skipper passes
+# over reuse the detections before them. With a tracker the JSON also lists one verdict per
+# tracked part. progress(done, total) is called after every batch.
+# Returns the paths of the annotated video, detections JSON and CSV.
+def process_video(model, video_path, output_dir, conf, batch_size=DEFAULT_BATCH_SIZE, imgsz=DEFAULT_IMGSZ,
+                  queue_size=DEFAULT_FRAME_QUEUE_SIZE, progress=None, stats=None, skipper=None,
+                  tracker=None):
+    stats = stats if stats is not None else VideoStats(queue_size)
+    batch_size = max(1, int(batch_size))
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        raise RuntimeError(f"Unable to open video: {video_path}")
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    total = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    size = (int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)), int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+
+    name = os.path.splitext(os.path.basename(video_path))[0]
+    paths = {
+        "video": os.path.join(output_dir, f"{name}_detected.mp4"),
+        "json": os.path.join(output_dir, f"{name}_detections.json"),
+        "csv": os.path.join(output_dir, f"{name}_detections.csv"),
+    }
+    writer = open_video_writer(paths["video"], fps, size)
+    to_write = queue.Queue(maxsize=queue_size)
+    frames = []
+    write_errors = []
+
+    # Writer thread: plot and write the results in frame order, collecting the detection rows
+    def write():
+        try:
+            while True:
+                item = to_write.get()
+                if item is _END:
+                    return
+                index, frame, result, reused = item
+                start = time.perf_counter()
+                res_plotted = annotate_frame(index, frame, result, reused, tracker)
+                stats.plot.add(time.perf_counter() - start)
+                start = time.perf_counter()
+                writer.write(res_plotted)
+                stats.write.add(time.perf_counter() - start)
+                frames.append({"frame": index, "time_s": round(index / fps, 3), "reused": reused,
+                               "detections": detection_rows(index, fps, result, reused)})
+                stats.frames += 1
+        except Exception as e:
+            write_errors.append(e)
+            # Keep draining so inference is never blocked on a dead writer
+            while to_write.get() is not _END:
+                pass
+
+    writer_thread = threading.Thread(target=write, name="video-writer", daemon=True)
+    grabber = FrameGrabber(capture, queue_size, stats)
+    stats.started = time.perf_counter()
+    writer_thread.start()
+    grabber.start()
+    try:
+        batch = []
+        to_detect = 0
+        last_result = None
+        for index, frame in grabber:
+            # The skipper always passes the first frame, so skipped frames always have detections to reuse
+            detect = skipper is None or skipper.should_detect(index, frame)
+            if not detect and not batch:
+                # No frame before it waits for the model, so it is written with the latest detections now
+                stats.skipped += 1
+                to_write.put((index, frame, last_result, True))
+                continue
+            batch.append((index, frame, detect))
+            to_detect += detect
+            # Skipped frames behind a frame still waiting for the model wait with it; cap how many pile up
+            if to_detect < batch_size and len(batch) < batch_size * queue_size:
+                continue
+            last_result = _infer_batch(model, batch, conf, imgsz, stats, to_write, last_result)
+            batch = []
+            to_detect = 0
+            if progress:
+                progress(index + 1, total)
+        if batch:
+            _infer_batch(model, batch, conf, imgsz, stats, to_write, last_result)
+            if progress:
+                progress(batch[-1][0] + 1, total)
+    finally:
+        grabber.stop()
+        to_write.put(_END)
+        writer_thread.join()
+        writer.release()
+        capture.release()
+        stats.finished = time.perf_counter()
+    if write_errors:
+        raise write_errors[0]
+
+    with open(paths["json"], "w") as f:
+        output = {"video": os.path.basename(video_path), "fps": fps, "frames": frames}
+        if tracker is not None:
+            output["parts"] = tracker.finish()
+        json.dump(output, f)
+    with open(paths["csv"], "w", newline="") as f:
+        csv_writer = csv.DictWriter(f, fieldnames=DETECTION_COLUMNS)
+        csv_writer.writeheader()
+        for frame in frames:
+            csv_writer.writerows(frame["detections"])
+    return paths
+
+
+# Function to detect the frames of a batch marked for detection in one forward pass and queue every
+# frame for writing, skipped ones with the latest detections before them. Returns the last result.
+def _infer_batch(model, batch, conf, imgsz, stats, to_write, last_result):
+    frames = [frame for _, frame, detect in batch if detect]
+    results = iter([])
+    if frames:
+        start = time.perf_counter()
+        results = iter(model.predict(frames, conf=conf, imgsz=imgsz, verbose=False))
+        stats.infer.add(len(frames), time.perf_counter() - start)
+    for index, frame, detect in batch:
+        if detect:
+            last_result = next(results)
+        else:
+            stats.skipped += 1
+        to_write.put((index, frame, last_result, not detect))
+    return last_result
@@ -0,0 +1,415 @@
+import os
+import time
+import queue
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import Future
+
+import cv2
+import numpy as np
+
+from inspection.backends import DEFAULT_BACKEND
+from inspection.batch_inference import DEFAULT_BATCH_SIZE, DEFAULT_IMGSZ
+from inspection.bulk_pipeline import StageStats
+from inspection.model_registry import DEFAULT_MODEL_PATH
+
+# Inference on N worker processes, each holding its own model instance, so a many-core server
+# is not held to one core's worth of GIL-bound pre/post-processing. Jobs go through one shared
+# queue that every idle worker pulls from (taking up to batch_size queued jobs per model call).
+# Frames travel in shared memory: the pool writes the frame into a block, the worker detects it
+# and writes the boxes and the annotated frame back into the same block, so only a few ids are
+# pickled per job. The pool's predict() takes the same arguments as the model's and returns
+# results with the same boxes / names / plot() the pages use, so it can stand in for the model.
+
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+MAX_BOXES = 300             # Boxes a result can hold (the ultralytics max_det default)
+BOX_FIELDS = 6              # x1, y1, x2, y2, confidence, class
+QUEUE_PER_WORKER = 4        # Jobs queued per worker before submit() blocks
+FREE_BLOCKS = 32            # Shared memory blocks kept for reuse once their job is done
+MAX_ATTACHED = 2 * FREE_BLOCKS  # Blocks a worker keeps mapped; older ones may have been freed by the pool
+START_TIMEOUT = 300         # Seconds the workers may take to load the model
+JOB_TIMEOUT = 120           # Seconds predict() waits for one image
+IDLE_TIMEOUT = 600          # Seconds a pool may go without jobs before its workers are stopped
+RETIRE_GRACE = 30           # Seconds a replaced pool must go without jobs before it is stopped
+REAP_INTERVAL = 5           # Seconds between two checks for idle and drained pools
+BOX_COLOURS = [(56, 56, 255), (151, 157, 255), (31, 112, 255), (29, 178, 255)]  # BGR, by class id
+
+
+# numpy array answering the torch tensor calls the pages make on result boxes (cpu(), numpy())
+class HostArray(np.ndarray):
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return np.asarray(self)
+
+
+# Boxes of one pooled result: the xyxy / conf / cls columns of ultralytics Boxes
+class PoolBoxes:
+    def __init__(self, data):
+        self.data = data.view(HostArray)
+        self.xyxy = self.data[:, :4]
+        self.conf = self.data[:, 4]
+        self.cls = self.data[:, 5]
+
+    def __len__(self):
+        return len(self.data)
+
+
+# Detection result of one pooled job. plot() returns the annotated BGR frame drawn by the worker;
+# like the ultralytics plot() it can instead draw the boxes onto another frame (img=) and hide
+# the confidences, labels or boxes, the other ultralytics options are accepted and ignored.
+class PoolResult:
+    def __init__(self, boxes, names, plotted, orig_shape):
+        self.boxes = PoolBoxes(boxes)
+        self.names = names
+        self.orig_shape = orig_shape
+        self._plotted = plotted
+
+    def plot(self, conf=True, labels=True, boxes=True, img=None, **kwargs):
+        if img is None and conf and labels and boxes and self._plotted is not None:
+            return self._plotted
+        if img is None:
+            raise ValueError("The job was submitted with plot=False, pass the frame to draw on as img=")
+        frame = np.ascontiguousarray(img)
+        if not boxes:
+            return frame
+        for x1, y1, x2, y2, confidence, class_id in self.boxes.data.numpy():
+            colour = BOX_COLOURS[int(class_id) % len(BOX_COLOURS)]
+            x1, y1, x2, y2 = (int(round(coordinate)) for coordinate in (x1, y1, x2, y2))
+            cv2.rectangle(frame, (x1, y1), (x2, y2), colour, 2)
+            if labels:
+                label = self.names.get(int(class_id), str(int(class_id)))
+                label = f"{label} {confidence:.2f}" if conf else label
+                cv2.putText(frame, label, (x1, max(y1 - 6, 12)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, colour, 1,
+                            cv2.LINE_AA)
+        return frame
+
+
+# Function to turn what the pages pass to the model (BGR array, PIL image, path or uploaded file)
+# into a contiguous BGR uint8 frame
+def to_frame(image):
+    if isinstance(image, np.ndarray):
+        return np.ascontiguousarray(image)
+    if hasattr(image, "convert"):
+        return np.ascontiguousarray(np.asarray(image.convert("RGB"))[:, :, ::-1])
+    if isinstance(image, (str, os.PathLike)):
+        frame = cv2.imread(str(image))
+        if frame is None:
+            raise ValueError(f"Unable to read image: {image}")
+        return frame
+    from PIL import Image
+    return to_frame(Image.open(image))
+
+
+# Function to give the bytes a block needs for a frame: the frame, then the box count and boxes
+def block_size(shape):
+    return int(np.prod(shape)) + 4 + MAX_BOXES * BOX_FIELDS * 4
+
+
+# Function to view a block as (frame, box count, boxes)
+def block_views(buffer, shape):
+    frame_bytes = int(np.prod(shape))
+    frame = np.ndarray(shape, dtype=np.uint8, buffer=buffer)
+    count = np.ndarray((1,), dtype=np.int32, buffer=buffer, offset=frame_bytes)
+    boxes = np.ndarray((MAX_BOXES, BOX_FIELDS), dtype=np.float32, buffer=buffer, offset=frame_bytes + 4)
+    return frame, count, boxes
+
+
+def _detect(model, jobs, attached, imgsz, results, done):
+    frames = []
+    for job_id, name, shape, conf, plot in jobs:
+        if name not in attached:
+            attached[name] = shared_memory.SharedMemory(name=name)
+        frames.append(block_views(attached[name].buf, shape))
+    # Jobs of one model call share its confidence, so split the batch where it changes
+    start = 0
+    while start < len(jobs):
+        end = start + 1
+        while end < len(jobs) and jobs[end][3] == jobs[start][3]:
+            end += 1
+        began = time.perf_counter()
+        predictions = model.predict([frame for frame, _, _ in frames[start:end]], conf=jobs[start][3], imgsz=imgsz,
+                                    verbose=False)
+        seconds = (time.perf_counter() - began) / (end - start)
+        for (job_id, _, _, _, plot), (frame, count, boxes), result in zip(jobs[start:end], frames[start:end],
+                                                                           predictions):
+            data = result.boxes.data.cpu().numpy()[:MAX_BOXES]
+            count[0] = len(data)
+            boxes[:len(data)] = data
+            if plot:
+                frame[:] = result.plot()
+            results.put(("done", job_id, seconds))
+            done.add(job_id)
+        start = end
+
+
+# Function run by every worker process: load the model, then detect jobs until the stop marker
+def _worker_main(worker_id, model_path, backend, device, threads, imgsz, batch_size, jobs, results):
+    import torch
+    from inspection.model_registry import get_model
+
+    torch.set_num_threads(threads)
+    try:
+        model = get_model(model_path, device=device, backend=backend)
+    except Exception as e:
+        results.put(("failed", worker_id, str(e)))
+        return
+    results.put(("ready", worker_id, dict(model.names)))
+    attached = {}       # Blocks this worker has mapped, reused when the pool reuses the block
+    stopping = False
+    while not stopping:
+        job = jobs.get()
+        if job is None:
+            break
+        batch = [job]
+        # Whatever else is already queued joins the same model call
+        while len(batch) < batch_size:
+            try:
+                job = jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                stopping = True
+                break
+            batch.append(job)
+        done = set()
+        try:
+            _detect(model, batch, attached, imgsz, results, done)
+        except Exception as e:
+            for job_id, *_ in batch:
+                if job_id not in done:
+                    results.put(("error", job_id, f"{type(e).__name__}: {e}"))
+        results.put(("idle", worker_id, len(batch)))
+        # Unmap the oldest blocks; one the pool has unlinked is only freed once nobody maps it
+        while len(attached) > MAX_ATTACHED:
+            attached.pop(next(iter(attached))).close()
+    for block in attached.values():
+        block.close()
+
+
+# N worker processes behind one shared job queue. submit() returns a Future per image;
+# predict() is the blocking, model-compatible form used by the pages and pipelines.
+class WorkerPool:
+    def __init__(self, model_path=DEFAULT_MODEL_PATH, workers=DEFAULT_WORKERS, backend=DEFAULT_BACKEND,
+                 device="cpu", imgsz=DEFAULT_IMGSZ, batch_size=DEFAULT_BATCH_SIZE, threads=None):
+        self.model_path = model_path
+        self.workers = max(1, int(workers))
+        self.backend = backend
+        self.device = device
+        self.imgsz = imgsz
+        self.batch_size = batch_size
+        self.threads = threads or max(1, (os.cpu_count() or 1) // self.workers)
+        self.names = {}
+        self.latency = StageStats()         # Submit to result, per image
+        self.jobs_per_worker = {}
+        self.completed = 0
+        self.failed = 0
+        self.last_used = time.monotonic()
+        context = multiprocessing.get_context("spawn")
+        self._jobs = context.Queue(maxsize=self.workers * QUEUE_PER_WORKER)
+        self._results = context.Queue()
+        self._processes = [context.Process(target=_worker_main, name=f"inference-worker-{number}", daemon=True,
+                                           args=(number, model_path, backend, device, self.threads, imgsz,
+                                                 batch_size, self._jobs, self._results))
+                           for number in range(self.workers)]
+        self._pending = {}                  # job id -> (future, block, shape, plot, submitted at)
+        self._free = []                     # Blocks of finished jobs, reused for the next frames
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._start_error = None
+        self._collector = threading.Thread(target=self._collect, name="worker-pool-results", daemon=True)
+        self.closed = False
+
+    # Function to start the workers and wait until every one of them has loaded the model
+    def start(self, timeout=START_TIMEOUT):
+        for process in self._processes:
+            process.start()
+        self._collector.start()
+        if not self._ready.wait(timeout):
+            self.close()
+            raise RuntimeError(f"Inference workers did not start within {timeout}s")
+        if self._start_error:
+            self.close()
+            raise RuntimeError(f"Inference worker failed to load the model: {self._start_error}")
+        return self
+
+    def _collect(self):
+        ready = 0
+        while True:
+            message = self._results.get()
+            if message is None:
+                return
+            kind, key, value = message
+            if kind == "ready":
+                self.names = value
+                self.jobs_per_worker[key] = 0
+                ready += 1
+                if ready == self.workers:
+                    self._ready.set()
+            elif kind == "failed":
+                self._start_error = value
+                self._ready.set()
+            elif kind == "idle":
+                self.jobs_per_worker[key] += value
+            else:
+                self._finish(kind, key, value)
+
+    def _finish(self, kind, job_id, value):
+        with self._lock:
+            pending = self._pending.pop(job_id, None)
+        if pending is None:
+            return              # Failed by close() already
+        future, block, shape, plot, submitted = pending
+        if kind == "error":
+            self.failed += 1
+            self._release(block)
+            future.set_exception(RuntimeError(value))
+            return
+        frame, count, boxes = block_views(block.buf, shape)
+        # Copy out of the block so it can take the next frame straight away
+        result = PoolResult(boxes[:count[0]].copy(), self.names, frame.copy() if plot else None, shape[:2])
+        del frame, count, boxes
+        self._release(block)
+        self.latency.add(time.perf_counter() - submitted)
+        self.completed += 1
+        future.set_result(result)
+
+    def _take_block(self, size):
+        with self._lock:
+            for index, block in enumerate(self._free):
+                if block.size >= size:
+                    return self._free.pop(index)
+        return shared_memory.SharedMemory(create=True, size=size)
+
+    def _release(self, block):
+        with self._lock:
+            if not self.closed and len(self._free) < FREE_BLOCKS:
+                self._free.append(block)
+                return
+        block.close()
+        block.unlink()
+
+    # Function to queue one image for detection; blocks while the job queue is full
+    def submit(self, image, conf, plot=True):
+        if self.closed:
+            raise RuntimeError("The worker pool is closed")
+        self.last_used = time.monotonic()
+        frame = to_frame(image)
+        block = self._take_block(block_size(frame.shape))
+        view, _, _ = block_views(block.buf, frame.shape)
+        view[:] = frame
+        del view
+        future = Future()
+        with self._lock:
+            job_id = self._next_id
+            self._next_id += 1
+            self._pending[job_id] = (future, block, frame.shape, plot, time.perf_counter())
+        self._jobs.put((job_id, block.name, frame.shape, conf, plot))
+        return future
+
+    # Function with the model's predict signature: detect a list of images (or one) on the workers.
+    # The workers were started with the pool's imgsz, so another input size is refused.
+    def predict(self, source=None, conf=0.25, imgsz=None, verbose=False, **kwargs):
+        if imgsz is not None and imgsz != self.imgsz:
+            raise ValueError(f"The worker pool detects at imgsz={self.imgsz}, not {imgsz}")
+        images = source if isinstance(source, (list, tuple)) else [source]
+        futures = [self.submit(image, conf) for image in images]
+        return [future.result(timeout=JOB_TIMEOUT) for future in futures]
+
+    def __call__(self, source=None, **kwargs):
+        return self.predict(source, **kwargs)
+
+    # Function to stop the workers. Jobs already queued are detected first; any job still without a
+    # result afterwards (a worker was terminated) fails its future instead of leaving it waiting.
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        for _ in self._processes:
+            self._jobs.put(None)
+        for process in self._processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+        self._results.put(None)
+        if self._collector.is_alive():
+            self._collector.join(timeout=10)
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending = {}
+            blocks = self._free + [block for _, block, _, _, _ in pending]
+            self._free = []
+        for future, *_ in pending:
+            future.set_exception(RuntimeError("The worker pool was closed before the image was detected"))
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    # Function to summarise the pool for display on the pages
+    def describe(self):
+        shares = ", ".join(f"{count}" for _, count in sorted(self.jobs_per_worker.items()))
+        return f"{self.workers} inference workers ({self.backend} on {self.device}, {self.threads} threads each): " \
+               f"{self.completed} images, {self.latency.mean_ms:.0f} ms per image, jobs per worker [{shares}]"
+
+
+_pools = {}
+_retired = []               # Pools replaced by a resized one, stopped once they have drained
+_pools_lock = threading.Lock()
+_reaper = None
+
+
+def _drained(pool, now, grace):
+    return not pool._pending and now - pool.last_used > grace
+
+
+# Function to stop the pools nobody has submitted to for idle_timeout seconds, and the replaced
+# pools whose sessions have moved on to the resized one
+def close_idle_pools(idle_timeout=IDLE_TIMEOUT, retire_grace=RETIRE_GRACE):
+    global _retired
+    now = time.monotonic()
+    with _pools_lock:
+        idle = [key for key, pool in _pools.items() if _drained(pool, now, idle_timeout)]
+        closing = [_pools.pop(key) for key in idle]
+        closing += [pool for pool in _retired if _drained(pool, now, retire_grace)]
+        _retired = [pool for pool in _retired if pool not in closing]
+    for pool in closing:
+        pool.close()
+
+
+def _reap_idle_pools():
+    while True:
+        time.sleep(REAP_INTERVAL)
+        close_idle_pools()
+
+
+# Function to return the process-wide pool of a model, starting it on first use. There is one pool
+# per model, backend and device: asking for another worker count starts a resized pool, and the
+# old one keeps serving the jobs other sessions are running on it until it has drained. The
+# workers are started outside the lock, so other pages are not held up by the model load.
+def get_worker_pool(model_path=DEFAULT_MODEL_PATH, workers=DEFAULT_WORKERS, backend=DEFAULT_BACKEND, device="cpu"):
+    global _reaper
+    key = (os.path.abspath(model_path), backend, device)
+    workers = max(1, int(workers))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is not None and not pool.closed and pool.workers == workers:
+            return pool
+    started = WorkerPool(model_path, workers, backend, device).start()
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is not None and not pool.closed and pool.workers == workers:
+            unused = started                # Another session started the same pool meanwhile
+        else:
+            unused = None
+            if pool is not None and not pool.closed:
+                _retired.append(pool)
+            _pools[key] = pool = started
+        if _reaper is None:
+            _reaper = threading.Thread(target=_reap_idle_pools, name="worker-pool-reaper", daemon=True)
+            _reaper.start()
+    if unused is not None:
+        unused.close()
+    return pool
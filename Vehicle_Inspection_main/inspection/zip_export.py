@@ -0,0 +1,44 @@
+import zipfile
+import tempfile
+
+# Archives up to this size are kept in memory, larger ones spill over to one temporary file
+DEFAULT_MAX_MEMORY = 64 * 1024 ** 2
+
+
+# ZIP archive that detection results are written into as they are produced.
+# The archive lives in a SpooledTemporaryFile, so small batches never touch the disk and
+# large batches keep memory bounded. JPEGs are already compressed, so store_only skips
+# deflate by default instead of spending CPU on a few percent of savings.
+class ResultZipWriter:
+    def __init__(self, store_only=True, max_memory=DEFAULT_MAX_MEMORY):
+        self.max_memory = max_memory
+        self.buffer = tempfile.SpooledTemporaryFile(max_size=max_memory)
+        compression = zipfile.ZIP_STORED if store_only else zipfile.ZIP_DEFLATED
+        self.archive = zipfile.ZipFile(self.buffer, "w", compression=compression)
+        self.count = 0
+        self.bytes_in = 0
+        self.size = 0
+        self.data = None
+
+    # Function to add one encoded result to the archive
+    def add(self, name, data):
+        self.archive.writestr(name, data)
+        self.count += 1
+        self.bytes_in += len(data)
+
+    # Function to finish the archive and return its bytes for st.download_button,
+    # which only accepts str, bytes or text/binary IO it can read itself
+    def finish(self):
+        if self.data is not None:
+            return self.data
+        self.archive.close()
+        self.size = self.buffer.tell()
+        self.buffer.seek(0)
+        self.data = self.buffer.read()
+        self.buffer.close()
+        return self.data
+
+    # Whether the finished archive grew past max_memory and was moved to disk while it was written
+    @property
+    def spilled_to_disk(self):
+        return self.size > self.max_memory
@@ -1,11 +1,8 @@
-import pandas as pd
 import streamlit as st
-from datetime import datetime
-import matplotlib.pyplot as plt
-from matplotlib.ticker import MaxNLocator
 
-import mysql.connector
-from mysql.connector import Error
+from inspection import database
+from inspection.dashboard import show_paginated_table, load_pages, load_status_counts, combine_status_counts, \
+    show_status_chart
 
 st.set_page_config(
     page_title = "Data Collection",
@@ -14,43 +11,6 @@ st.set_page_config(
     initial_sidebar_state = "expanded"
 )
 
-def fetch_data(table_name, vin, sequence_number, colour, type):
-    db_config = {
-        'host': 'localhost',    # dont change
-        'user': 'root',         # change user
-        'password': '',         # put password
-        'database': 'data1'     # database name
-    }
-    try:
-        db_conn = mysql.connector.connect(**db_config)
-        if db_conn.is_connected():
-            query = f"SELECT No, Date, Type, `Vin No.`, `Seq No.`, Colour, TIME, `Straight Bracket`, `No Washer`, Status FROM {table_name}"
-            conditions = []
-            params = []
-            if type:
-                conditions.append("Type = %s")
-                params.append(type)
-            if vin:
-                conditions.append("`Vin No.` = %s")
-                params.append(vin)
-            if sequence_number:
-                conditions.append("`Seq No.` = %s")
-                params.append(sequence_number)
-            if colour and colour != 'All':
-                conditions.append("Colour = %s")
-                params.append(colour)
-            if conditions:
-                query += ' WHERE ' + ' AND '.join(conditions)
-            cursor = db_conn.cursor()
-            cursor.execute(query, params)
-            df = pd.DataFrame(cursor.fetchall(), columns=[i[0] for i in cursor.description])
-            cursor.close()
-            db_conn.close()
-            return df
-    except Error as e:
-        st.error(f"Error connecting to the database: {e}")
-        return pd.DataFrame()
-
 with st.sidebar:
     # Sidebar for user inputs to query the database
     st.header("Data Parameters")
@@ -74,13 +34,19 @@ with clm1:
 
 data={}
 
-data_image = fetch_data("data_image", vehicle_identification_number, sequence_number, selected_colour, type)
-data_bulk_image = fetch_data("data_bulk_image", vehicle_identification_number, sequence_number, selected_colour, type)
-data_video = fetch_data("data_video", vehicle_identification_number, sequence_number, selected_colour, type)
-data_capture = fetch_data("data_capture", vehicle_identification_number, sequence_number, selected_colour, type)
-data_live = fetch_data("data_live", vehicle_identification_number, sequence_number, selected_colour, type)
+# Only query the tables of the selected detection method; "All" queries the five tables at once
+if selected_detection == "All":
+    table_names = list(database.TABLES)
+else:
+    table_names = [f"data_{selected_detection.lower().replace(' ', '_')}"]
+
+# The charts are aggregated in the database (GROUP BY month and status), the tables are paginated
+status_counts = load_status_counts(table_names, vehicle_identification_number, sequence_number, selected_colour, type)
 
 if selected_detection == "All":
+    # The count and page queries of the five tables also run at once
+    pages = load_pages(table_names, vehicle_identification_number, sequence_number, selected_colour, type)
+
     # Create column 1 for data and column 2 for pie chart
     st.header("Image Detection Data")
     c1, c2 = st.columns([0.7,0.35])
@@ -96,227 +62,76 @@ if selected_detection == "All":
     ##############################     Data Image Object Detection     ##############################
     with c1:
         st.subheader('Queried Data')
-        if not data_image.empty:
-            st.dataframe(data_image)
-        else:
-            st.write("No data available based on the input parameters.")
+        show_paginated_table("data_image", vehicle_identification_number, sequence_number, selected_colour, type,
+                             key="data_image", loaded=pages["data_image"])
 
     # Pie chart section for 'Status' distribution
     with c2:
-        if not data_image.empty and 'Status' in data_image.columns and 'Date' in data_image.columns:
-            # Parse the date column to extract months
-            data_image['Month'] = pd.to_datetime(data_image['Date']).dt.strftime('%Y-%m')
-            # Aggregate the data to count statuses by month
-            status_counts_by_month = data_image.groupby(['Month', 'Status']).size().unstack(fill_value=0)
-            # Plot the data as a bar chart
-            fig, ax = plt.subplots()
-            status_counts_by_month.plot(kind='bar', ax=ax)
-            ax.set_ylabel('Count')
-            ax.set_xlabel('Month')
-            ax.set_title('Status Distribution by Month')
-            ax.legend(title='Status')
-            # Set yaxis whole number
-            ax.yaxis.set_major_locator(MaxNLocator(integer=True))
-            st.subheader('Status Distribution by Month')
-            st.pyplot(fig)
-        else:
-            st.write("Data is empty or required columns are missing for the bar chart.")
+        show_status_chart(status_counts["data_image"])
     ##############################     (END) Data Image Object Detection (END)      ##############################
 
     ##############################     Data Bulk Image Object Detection     ##############################
     with co1:
         st.subheader('Queried Data')
-        if not data_bulk_image.empty:
-            st.dataframe(data_bulk_image)
-        else:
-            st.write("No data available based on the input parameters.")
+        show_paginated_table("data_bulk_image", vehicle_identification_number, sequence_number, selected_colour, type,
+                             key="data_bulk_image", loaded=pages["data_bulk_image"])
 
     # Pie chart section for 'Status' distribution
     with co2:
-        if not data_bulk_image.empty and 'Status' in data_bulk_image.columns and 'Date' in data_bulk_image.columns:
-            # Parse the date column to extract months
-            data_bulk_image['Month'] = pd.to_datetime(data_bulk_image['Date']).dt.strftime('%Y-%m')
-
-            # Aggregate the data to count statuses by month
-            status_counts_by_month = data_bulk_image.groupby(['Month', 'Status']).size().unstack(fill_value=0)
-
-            # Plot the data as a bar chart
-            fig, ax = plt.subplots()
-            status_counts_by_month.plot(kind='bar', ax=ax)
-            ax.set_ylabel('Count')
-            ax.set_xlabel('Month')
-            ax.set_title('Status Distribution by Month')
-            ax.legend(title='Status')
-
-            # Set yaxis whole number
-            ax.yaxis.set_major_locator(MaxNLocator(integer=True))
-
-            st.subheader('Status Distribution by Month')
-            st.pyplot(fig)
-        else:
-            st.write("Data is empty or required columns are missing for the bar chart.")
+        show_status_chart(status_counts["data_bulk_image"])
     ##############################     (END) Data Bulk Image Object Detection (END)      ##############################
 
     ##############################     Data Video Object Detection     ##############################
     with col1:
         st.subheader('Queried Data')
-        if not data_video.empty:
-            st.dataframe(data_video)
-        else:
-            st.write("No data available based on the input parameters.")
+        show_paginated_table("data_video", vehicle_identification_number, sequence_number, selected_colour, type,
+                             key="data_video", loaded=pages["data_video"])
 
     # Pie chart section for 'Status' distribution
     with col2:
-        if not data_video.empty and 'Status' in data_video.columns and 'Date' in data_video.columns:
-            # Parse the date column to extract months
-            data_video['Month'] = pd.to_datetime(data_video['Date']).dt.strftime('%Y-%m')
-
-            # Aggregate the data to count statuses by month
-            status_counts_by_month = data_video.groupby(['Month', 'Status']).size().unstack(fill_value=0)
-
-            # Plot the data as a bar chart
-            fig, ax = plt.subplots()
-            status_counts_by_month.plot(kind='bar', ax=ax)
-            ax.set_ylabel('Count')
-            ax.set_xlabel('Month')
-            ax.set_title('Status Distribution by Month')
-            ax.legend(title='Status')
-
-            # Set yaxis whole number
-            ax.yaxis.set_major_locator(MaxNLocator(integer=True))
-
-            st.subheader('Status Distribution by Month')
-            st.pyplot(fig)
-        else:
-            st.write("Data is empty or required columns are missing for the bar chart.")
+        show_status_chart(status_counts["data_video"])
     ##############################     (END) Data Video Object Detection (END)      ##############################
 
     ##############################     Data Capture Object Detection     ##############################
     with colum1:
         st.subheader('Queried Data')
-        if not data_capture.empty:
-            st.dataframe(data_capture)
-        else:
-            st.write("No data available based on the input parameters.")
+        show_paginated_table("data_capture", vehicle_identification_number, sequence_number, selected_colour, type,
+                             key="data_capture", loaded=pages["data_capture"])
 
     # Pie chart section for 'Status' distribution
     with colum2:
-        if not data_capture.empty and 'Status' in data_capture.columns and 'Date' in data_capture.columns:
-            # Parse the date column to extract months
-            data_capture['Month'] = pd.to_datetime(data_capture['Date']).dt.strftime('%Y-%m')
-
-            # Aggregate the data to count statuses by month
-            status_counts_by_month = data_capture.groupby(['Month', 'Status']).size().unstack(fill_value=0)
-
-            # Plot the data as a bar chart
-            fig, ax = plt.subplots()
-            status_counts_by_month.plot(kind='bar', ax=ax)
-            ax.set_ylabel('Count')
-            ax.set_xlabel('Month')
-            ax.set_title('Status Distribution by Month')
-            ax.legend(title='Status')
-
-            # Set yaxis whole number
-            ax.yaxis.set_major_locator(MaxNLocator(integer=True))
-
-            st.subheader('Status Distribution by Month')
-            st.pyplot(fig)
-        else:
-            st.write("Data is empty or required columns are missing for the bar chart.")
+        show_status_chart(status_counts["data_capture"])
     ##############################     (END) Data Capture Object Detection (END)      ##############################
 
     ##############################     Live Object Detection     ##############################
     with column1:
         st.subheader('Queried Data')
-        if not data_live.empty:
-            st.dataframe(data_live)
-        else:
-            st.write("No data available based on the input parameters.")
+        show_paginated_table("data_live", vehicle_identification_number, sequence_number, selected_colour, type,
+                             key="data_live", loaded=pages["data_live"])
 
     # Pie chart section for 'Status' distribution
     with column2:
-        if not data_live.empty and 'Status' in data_live.columns and 'Date' in data_live.columns:
-            # Parse the date column to extract months
-            data_live['Month'] = pd.to_datetime(data_live['Date']).dt.strftime('%Y-%m')
-
-            # Aggregate the data to count statuses by month
-            status_counts_by_month = data_live.groupby(['Month', 'Status']).size().unstack(fill_value=0)
-
-            # Plot the data as a bar chart
-            fig, ax = plt.subplots()
-            status_counts_by_month.plot(kind='bar', ax=ax)
-            ax.set_ylabel('Count')
-            ax.set_xlabel('Month')
-            ax.set_title('Status Distribution by Month')
-            ax.legend(title='Status')
-
-            # Set yaxis whole number
-            ax.yaxis.set_major_locator(MaxNLocator(integer=True))
-
-            st.subheader('Status Distribution by Month')
-            st.pyplot(fig)
-        else:
-            st.write("Data is empty or required columns are missing for the bar chart.")
+        show_status_chart(status_counts["data_live"])
     ##############################     (END) Live Object Detection (END)     ##############################
 
 else:
-    data[selected_detection] = fetch_data(f"data_{selected_detection.lower().replace(' ', '_')}",
-                                          vehicle_identification_number, sequence_number, selected_colour, type)
+    data[selected_detection] = status_counts[table_names[0]]
     for detection, df in data.items():
         st.header(f"{detection} Detection Data")
         c1, c2 = st.columns([0.7, 0.35])
 
         with c1:
             st.subheader('Queried Data')
-            if not df.empty:
-                st.dataframe(df)
-            else:
-                st.write("No data available based on the input parameters.")
+            show_paginated_table(table_names[0], vehicle_identification_number, sequence_number, selected_colour, type,
+                                 key=table_names[0])
 
         with c2:
-            if not df.empty and 'Status' in df.columns and 'Date' in df.columns:
-                # Parse the date column to extract months
-                df['Month'] = pd.to_datetime(df['Date']).dt.strftime('%Y-%m')
-
-                # Aggregate the data to count statuses by month
-                status_counts_by_month = df.groupby(['Month', 'Status']).size().unstack(fill_value=0)
-
-                # Plot the data as a bar chart
-                fig, ax = plt.subplots()
-                status_counts_by_month.plot(kind='bar', ax=ax)
-                ax.set_ylabel('Count')
-                ax.set_xlabel('Month')
-                ax.set_title('Status Distribution by Month')
-                ax.legend(title='Status')
-
-                # Set yaxis whole number
-                ax.yaxis.set_major_locator(MaxNLocator(integer=True))
-
-                st.subheader('Status Distribution by Month')
-                st.pyplot(fig)
-            else:
-                st.write("Data is empty or required columns are missing for the bar chart.")
-
-# First, combine the data from all tables into a single DataFrame
-combined_data = pd.concat([data_image, data_bulk_image, data_video, data_capture, data_live], ignore_index=True)
-
-# Parse the date column to extract months
-combined_data['Month'] = pd.to_datetime(combined_data['Date']).dt.strftime('%Y-%m')
-
-# Aggregate the data to count statuses by month
-status_counts_by_month = combined_data.groupby(['Month', 'Status']).size().unstack(fill_value=0)
+            show_status_chart(df)
 
+# Combine the monthly counts of the queried tables into one chart
 with clm2:
-    # Plot the data as a bar chart
-    fig, ax = plt.subplots()
-    status_counts_by_month.plot(kind='bar', ax=ax)
-    ax.set_ylabel('Count')
-    ax.set_xlabel('Month')
-    ax.set_title('Combination Status Distribution by Month')
-    ax.legend(title='Status')
-
-    # Set yaxis whole number
-    ax.yaxis.set_major_locator(MaxNLocator(integer=True))
+    show_status_chart(combine_status_counts(status_counts.values()), 'Combination Status Distribution by Month')
 
-    st.subheader('Status Distribution by Month')
-    st.pyplot(fig)
\ No newline at end of file
+# Database pool wait time, query latency and cache hit rate for this process
+st.sidebar.caption(database.get_pool().describe())
+st.sidebar.caption(database.cache.describe())
@@ -1,26 +1,25 @@
 import os
 import zipfile
 import tempfile
-import pandas as pd
 from PIL import Image
 import streamlit as st
-from ultralytics import YOLO
-from datetime import datetime
-import matplotlib.pyplot as plt
-from matplotlib.ticker import MaxNLocator
 
-import mysql.connector
-from mysql.connector import Error
+from inspection import database
+from inspection.database import DatabaseError
+from inspection.dashboard import show_paginated_table, load_status_counts, show_status_chart, auto_save_inputs
+from inspection.model_registry import get_model
+from inspection.result_writer import save_results
 
 # Specified Model Path
 model_path = "weights/best.pt"
 
-# Loading of Trained YOLOv9 Model
+# Loading of Trained YOLOv9 Model (shared by every page and session in this process)
 try:
-    model = YOLO(model_path)
+    model = get_model(model_path)
 except Exception as ex:
     st.error(f"Unable to load YOLO model. Check Model Path: {model_path}")
     st.error(ex)
+    st.stop()  # Nothing on the page works without the model
 
 # Page Layout Setting
 st.set_page_config(
@@ -30,74 +29,18 @@ st.set_page_config(
     initial_sidebar_state = "expanded"
 )
 
-# Function to fetch data from MySQL database
-def fetch_data(vin, sequence_number, colour, type):
-    db_config = {
-        'host': 'localhost',    # dont change
-        'user': 'root',         # change user
-        'password': '',         # put password
-        'database': 'data1'     # database name
-    }
-    try:
-        db_conn = mysql.connector.connect(**db_config)
-        if db_conn.is_connected():
-            # Change query "data_image" to your table name
-            query = "SELECT No, Date, Type, `Vin No.`, `Seq No.`, Colour, TIME, `Straight Bracket`, `No Washer`, Status FROM data_image"
-            conditions = []
-            params = []
-            if type:
-                conditions.append("Type = %s")
-                params.append(type)
-            if vin:
-                conditions.append("`Vin No.` = %s")
-                params.append(vin)
-            if sequence_number:
-                conditions.append("`Seq No.` = %s")
-                params.append(sequence_number)
-            if colour and colour != 'All':
-                conditions.append("Colour = %s")
-                params.append(colour)
-            if conditions:
-                query += ' WHERE ' + ' AND '.join(conditions)
-            cursor = db_conn.cursor()
-            cursor.execute(query, params)
-            df = pd.DataFrame(cursor.fetchall(), columns=[i[0] for i in cursor.description])
-            cursor.close()
-            db_conn.close()
-            return df
-    except Error as e:
-        st.error(f"Error connecting to the database: {e}")
-        return pd.DataFrame()
-
 # Function to insert data to MySQL database
 def insert_data(type, vin, seq_no, colour, bracket, washer, status):
-    db_config = {
-        'host': 'localhost',    # dont change
-        'user': 'root',         # change user
-        'password': '',         # put password
-        'database': 'data1'     # database name
-    }
     try:
-        # with mysql.connector.connect(**db_config) as db_conn:
-        db_conn = mysql.connector.connect(**db_config)
-        if db_conn.is_connected():
-            query = """
-                    INSERT INTO data_image (Type, `Vin No.`, `Seq No.`, Colour, `Straight Bracket`, `No Washer`, Status, `Date`)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                    """
-            values = (type, vin, seq_no, colour, bracket, washer, status, datetime.now())
-            cursor = db_conn.cursor()
-            cursor.execute(query, values)
-            db_conn.commit()
-            st.success("Data inserted successfully!")
-            cursor.close()
-            db_conn.close()
-    except Error as e:
+        database.insert_data("data_image", type, vin, seq_no, colour, bracket, washer, status)
+        st.success("Data inserted successfully!")
+    except DatabaseError as e:
         st.error(f"Error connecting to the database: {e}")
 
 # Create Side Bar
 with st.sidebar:
     st.header("Upload Your Image")
+    st.caption(model.describe())  # Model load time and memory from the shared registry
     source_img = st.file_uploader("Choose an Image...", type=("jpg", "jpeg", "png", 'bmp', 'webp'))
     DEMO_IMAGE = 'images/demo.jpg'
     confidence = float(st.slider("Set Confidence Level", 25, 100, 40)) / 100 # Model Confidence Option
@@ -113,6 +56,8 @@ with st.sidebar:
     colour = ['All', 'Red', 'Blue', 'Silver', 'White', 'Black']
     selected_colour = st.selectbox('Vehicle Colour', colour)
 
+    auto_save, vehicle = auto_save_inputs()
+
     st.subheader("Insert Data into Database")
     with st.form(key='insert form'):
         type_input = st.text_input('Type (Insert)')
@@ -131,9 +76,6 @@ with st.sidebar:
 st.title("Image Object Detection")
 st.write("Choose your image and set the confidence level. Finally, click detect image.")
 
-# Fetch data based on inputs
-data = fetch_data(vehicle_identification_number, sequence_number, selected_colour, type)
-
 # Create column 1 for data and column 2 for pie chart
 column1, column2 = st.columns([0.7,0.35])
 st.markdown("---")
@@ -144,35 +86,13 @@ col1, col2 = st.columns(2)
 # Display the fetched data
 with column1:
     st.subheader('Queried Data')
-    if not data.empty:
-        st.dataframe(data)
-    else:
-        st.write("No data available based on the input parameters.")
+    show_paginated_table("data_image", vehicle_identification_number, sequence_number, selected_colour, type,
+                         key="data_image")
 
 # Pie chart section for 'Status' distribution
 with column2:
-    if not data.empty and 'Status' in data.columns and 'Date' in data.columns:
-        # Parse the date column to extract months
-        data['Month'] = pd.to_datetime(data['Date']).dt.strftime('%Y-%m')
-
-        # Aggregate the data to count statuses by month
-        status_counts_by_month = data.groupby(['Month', 'Status']).size().unstack(fill_value=0)
-
-        # Plot the data as a bar chart
-        fig, ax = plt.subplots()
-        status_counts_by_month.plot(kind='bar', ax=ax)
-        ax.set_ylabel('Count')
-        ax.set_xlabel('Month')
-        ax.set_title('Status Distribution by Month')
-        ax.legend(title='Status')
-
-        # Set yaxis whole number
-        ax.yaxis.set_major_locator(MaxNLocator(integer=True))
-
-        st.subheader('Status Distribution by Month')
-        st.pyplot(fig)
-    else:
-        st.write("Data is empty or required columns are missing for the bar chart.")
+    status_counts = load_status_counts(["data_image"], vehicle_identification_number, sequence_number, selected_colour, type)
+    show_status_chart(status_counts["data_image"])
 
 # Creating two columns on the main page
 with col1:
@@ -187,6 +107,8 @@ with col1:
 # Detect image and display at column 2 after Detect Image is pressed
 if detect_button:
     res = model.predict(uploaded_image, conf = confidence)
+    if auto_save:
+        save_results("data_image", [source_img.name if source_img else DEMO_IMAGE], res, model.names, vehicle)
     boxes = res[0].boxes
     res_plotted = res[0].plot()[:, :, ::-1]
     with col2:
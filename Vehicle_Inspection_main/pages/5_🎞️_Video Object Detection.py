@@ -1,24 +1,27 @@
+import os
 import cv2
+import shutil
 import tempfile
-import pandas as pd
 import streamlit as st
-from ultralytics import YOLO
-from datetime import datetime
-import matplotlib.pyplot as plt
-from matplotlib.ticker import MaxNLocator
 
-import mysql.connector
-from mysql.connector import Error
+from inspection import database
+from inspection.database import DatabaseError
+from inspection.dashboard import show_paginated_table, load_status_counts, show_status_chart, auto_save_inputs
+from inspection.model_registry import get_model
+from inspection.tracking import IoUTracker
+from inspection.result_writer import save_parts
+from inspection.video_pipeline import VideoStats, FrameSkipper, run_video, process_video, DEFAULT_MOTION_THRESHOLD
 
 # Specified Model Path
 model_path = "weights/best.pt"
 
-# Loading of Trained YOLOv9 Model
+# Loading of Trained YOLOv9 Model (shared by every page and session in this process)
 try:
-    model = YOLO(model_path)
+    model = get_model(model_path)
 except Exception as ex:
     st.error(f"Unable to load YOLO model. Check Model Path: {model_path}")
     st.error(ex)
+    st.stop()  # Nothing on the page works without the model
 
 # Page Layout Setting
 st.set_page_config(
@@ -33,84 +36,28 @@ def draw_boxes(frame, boxes, threshold):
     # You need to implement this function
     return frame
 
-def detect_objects(image):
-    # Detection implementation using YOLO model
-    detections = model(image, conf = confidence)
-    # Format detections if necessary
-    return detections
-
-# Function to fetch data from MySQL database
-def fetch_data(vin, sequence_number, colour, type):
-    db_config = {
-        'host': 'localhost',    # dont change
-        'user': 'root',         # change user
-        'password': '',         # put password
-        'database': 'data1'     # database name
-    }
-    try:
-        db_conn = mysql.connector.connect(**db_config)
-        if db_conn.is_connected():
-            # Change query "data_video" to your table name
-            query = "SELECT No, Date, Type, `Vin No.`, `Seq No.`, Colour, TIME, `Straight Bracket`, `No Washer`, Status FROM data_video"
-            conditions = []
-            params = []
-            if type:
-                conditions.append("Type = %s")
-                params.append(type)
-            if vin:
-                conditions.append("`Vin No.` = %s")
-                params.append(vin)
-            if sequence_number:
-                conditions.append("`Seq No.` = %s")
-                params.append(sequence_number)
-            if colour and colour != 'All':
-                conditions.append("Colour = %s")
-                params.append(colour)
-            if conditions:
-                query += ' WHERE ' + ' AND '.join(conditions)
-            cursor = db_conn.cursor()
-            cursor.execute(query, params)
-            df = pd.DataFrame(cursor.fetchall(), columns=[i[0] for i in cursor.description])
-            cursor.close()
-            db_conn.close()
-            return df
-    except Error as e:
-        st.error(f"Error connecting to the database: {e}")
-        return pd.DataFrame()
-
 # Function to insert data to MySQL database
 def insert_data(type, vin, seq_no, colour, bracket, washer, status):
-    db_config = {
-        'host': 'localhost',    # dont change
-        'user': 'root',         # change user
-        'password': '',         # put password
-        'database': 'data1'     # database name
-    }
     try:
-        # with mysql.connector.connect(**db_config) as db_conn:
-        db_conn = mysql.connector.connect(**db_config)
-        if db_conn.is_connected():
-            query = """
-                    INSERT INTO data_video (Type, `Vin No.`, `Seq No.`, Colour, `Straight Bracket`, `No Washer`, Status, `Date`)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                    """
-            values = (type, vin, seq_no, colour, bracket, washer, status, datetime.now())
-            cursor = db_conn.cursor()
-            cursor.execute(query, values)
-            db_conn.commit()
-            st.success("Data inserted successfully!")
-            cursor.close()
-            db_conn.close()
-    except Error as e:
+        database.insert_data("data_video", type, vin, seq_no, colour, bracket, washer, status)
+        st.success("Data inserted successfully!")
+    except DatabaseError as e:
         st.error(f"Error connecting to the database: {e}")
 
 # Create Side Bar
 with st.sidebar:
     st.header("Upload and Configurations")
+    st.caption(model.describe())  # Model load time and memory from the shared registry
     source_vid = st.file_uploader("Upload a Video...", type=["mp4", "mov", 'avi', 'asf', 'm4v'])
     DEMO_VIDEO = 'videos/demo.mp4'
     tffile = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False)
     confidence = float(st.slider("Set Confidence Level", 25, 100, 40)) / 100  # Model Confidence Option
+    batch_size = st.select_slider("Set Offline Batch Size", [1, 2, 4, 8, 16, 32], 8)  # Frames per forward pass
+    frame_stride = st.slider("Detect Every N-th Frame", 1, 10, 1)  # Frames in between reuse the last detections
+    adaptive_skip = st.checkbox("Adaptive Frame Skipping")  # Only re-detect when the picture changes
+    motion_threshold = st.slider("Change Threshold (grey levels)", 1.0, 30.0, DEFAULT_MOTION_THRESHOLD, 0.5,
+                                 disabled=not adaptive_skip)
+    track_parts = st.checkbox("Track Parts (one verdict per bracket/washer)")  # Persistent IDs across frames
 
     # Upload Demo/Uploaded Video
     if not source_vid:
@@ -136,6 +83,8 @@ with st.sidebar:
     colour = ['All', 'Red', 'Blue', 'Silver', 'White', 'Black']
     selected_colour = st.selectbox('Vehicle Colour', colour)
 
+    auto_save, vehicle = auto_save_inputs()
+
     st.subheader("Insert Data into Database")
     with st.form(key='insert form'):
         type_input = st.text_input('Type (Insert)')
@@ -154,44 +103,19 @@ with st.sidebar:
 st.title("Video Object Detection")
 st.write("Set confidence level and upload your video. Finally, click detect image.")
 
-# Fetch data based on inputs
-data = fetch_data(vehicle_identification_number, sequence_number, selected_colour, type)
-
 # Create column 1 for data and column 2 for pie chart
 column1, column2 = st.columns([0.7, 0.35])
 
 # Display the fetched data
 with column1:
     st.subheader('Queried Data')
-    if not data.empty:
-        st.dataframe(data)
-    else:
-        st.write("No data available based on the input parameters.")
+    show_paginated_table("data_video", vehicle_identification_number, sequence_number, selected_colour, type,
+                         key="data_video")
 
 # Pie chart section for 'Status' distribution
 with column2:
-    if not data.empty and 'Status' in data.columns and 'Date' in data.columns:
-        # Parse the date column to extract months
-        data['Month'] = pd.to_datetime(data['Date']).dt.strftime('%Y-%m')
-
-        # Aggregate the data to count statuses by month
-        status_counts_by_month = data.groupby(['Month', 'Status']).size().unstack(fill_value=0)
-
-        # Plot the data as a bar chart
-        fig, ax = plt.subplots()
-        status_counts_by_month.plot(kind='bar', ax=ax)
-        ax.set_ylabel('Count')
-        ax.set_xlabel('Month')
-        ax.set_title('Status Distribution by Month')
-        ax.legend(title='Status')
-
-        # Set yaxis whole number
-        ax.yaxis.set_major_locator(MaxNLocator(integer=True))
-
-        st.subheader('Status Distribution by Month')
-        st.pyplot(fig)
-    else:
-        st.write("Data is empty or required columns are missing for the bar chart.")
+    status_counts = load_status_counts(["data_video"], vehicle_identification_number, sequence_number, selected_colour, type)
+    show_status_chart(status_counts["data_video"])
 
 st.markdown("---")
 
@@ -200,6 +124,7 @@ placeholder = st.columns(2)
 
 with placeholder[0]:
     detect_button = st.button('Detect Video')
+    offline_button = st.button('Process Video Offline')  # Annotated MP4 + detections, no live preview
     if not source_vid:
         demo_text = st.text("Demo Input Video")
     else:
@@ -226,12 +151,88 @@ else:
     if input_text:
         col1.video(tffile.name)
 
-# Upload video to column 1 to fix the display size
+
+# Function to create the frame skipper of one run from the sidebar settings (None detects every frame)
+def new_skipper():
+    if frame_stride == 1 and not adaptive_skip:
+        return None
+    return FrameSkipper(frame_stride, adaptive_skip, motion_threshold)
+
+
+# Function to create the part tracker of one run (None shows plain per-frame detections)
+def new_tracker():
+    return IoUTracker() if track_parts else None
+
+
+# Detect the video frame by frame; frames are decoded on a grabber thread while the model runs
 if detect_button:
-    while True:
-        ret, img = vid.read()
-        if ret:
-            detections = detect_objects(img)
-            res_plotted = detections[0].plot()
-            output_frame = cv2.cvtColor(res_plotted, cv2.COLOR_BGR2RGB)
-            col2.image(res_plotted, channels="BGR", use_column_width=True)
\ No newline at end of file
+    video_stats = VideoStats()
+    tracker = new_tracker()
+    for index, frame, result, res_plotted in run_video(model, vid, confidence, stats=video_stats,
+                                                       skipper=new_skipper(), tracker=tracker):
+        col2.image(res_plotted, channels="BGR", use_column_width=True)
+    vid.release()
+    st.caption(video_stats.describe())
+    st.session_state["video_parts"] = tracker.finish() if tracker else None
+    st.session_state["video_parts_saved"] = False
+
+# Process the whole video offline in batches into an annotated MP4 and per-frame detections
+if offline_button:
+    tffile.flush()
+    # One output directory per session, emptied for every run: the download buttons only ever
+    # need the files of the last run
+    output_dir = st.session_state.get("video_output_dir")
+    if output_dir is None:
+        output_dir = st.session_state["video_output_dir"] = tempfile.mkdtemp(prefix="video_detection_")
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.makedirs(output_dir)
+    st.session_state.pop("video_outputs", None)
+    progress_bar = st.progress(0.0, text="Processing video...")
+
+    def show_progress(done, total):
+        progress_bar.progress(min(done / total, 1.0) if total else 0.0, text=f"Processed {done}/{total} frames")
+
+    offline_stats = VideoStats()
+    tracker = new_tracker()
+    try:
+        st.session_state["video_outputs"] = process_video(model, tffile.name, output_dir, confidence, batch_size,
+                                                          progress=show_progress, stats=offline_stats,
+                                                          skipper=new_skipper(), tracker=tracker)
+        st.session_state["video_outputs_stats"] = offline_stats.describe()
+        st.session_state["video_parts"] = tracker.parts() if tracker else None
+        st.session_state["video_parts_saved"] = False
+    except RuntimeError as e:
+        st.error(f"Unable to process the video: {e}")
+
+# The offline results stay available across the reruns triggered by the download buttons
+if "video_outputs" in st.session_state and not detect_button:
+    outputs = st.session_state["video_outputs"]
+    col2.video(outputs["video"])
+    st.caption(st.session_state["video_outputs_stats"])
+    download_columns = st.columns(3)
+    for download_column, (label, kind, mime) in zip(download_columns, [
+        ("Download Annotated Video", "video", "video/mp4"),
+        ("Download Detections (JSON)", "json", "application/json"),
+        ("Download Detections (CSV)", "csv", "text/csv"),
+    ]):
+        with open(outputs[kind], "rb") as f:
+            download_column.download_button(label=label, data=f.read(), file_name=os.path.basename(outputs[kind]),
+                                            mime=mime)
+
+# One consolidated verdict per tracked bracket/washer of the last run, saved as one row per part
+# (automatically right after the run, or with the button when automatic saving is off)
+if st.session_state.get("video_parts") is not None:
+    parts = st.session_state["video_parts"]
+    st.subheader(f"Tracked Parts ({len(parts)})")
+    if parts:
+        st.dataframe(parts)
+        # Like automatic saving, the button needs the VIN entered under "Vehicle of the saved detections"
+        if not st.session_state["video_parts_saved"] and (
+                auto_save or st.button('Save Parts to Database', disabled=not vehicle[1],
+                                       help="Enter the Vehicle Identification Number (Detections) first")):
+            save_parts("data_video", source_vid.name if source_vid else DEMO_VIDEO, parts, vehicle)
+            st.session_state["video_parts_saved"] = True
+        if st.session_state["video_parts_saved"]:
+            st.success(f"{len(parts)} parts saved to the database (one row per part)")
+    else:
+        st.write("No part was detected in enough frames to be tracked.")
\ No newline at end of file
@@ -1,23 +1,25 @@
-import cv2
-import pandas as pd
+import time
 import streamlit as st
-from ultralytics import YOLO
-from datetime import datetime
-import matplotlib.pyplot as plt
-from matplotlib.ticker import MaxNLocator
 
-import mysql.connector
-from mysql.connector import Error
+from inspection import database
+from inspection.database import DatabaseError
+from inspection.dashboard import show_paginated_table, load_status_counts, show_status_chart, auto_save_inputs
+from inspection.model_registry import get_model
+from inspection.tracking import IoUTracker, draw_tracks
+from inspection.live_cameras import MultiCameraScheduler, get_camera_manager, parse_sources
+from inspection.stream_server import STREAM_PORT, get_stream_server, stream_url
+from inspection.result_writer import LiveSaver, save_parts
 
 # Specified Model Path
 model_path = "weights/best.pt"
 
-# Loading of Trained YOLOv9 Model
+# Loading of Trained YOLOv9 Model (shared by every page and session in this process)
 try:
-    model = YOLO(model_path)
+    model = get_model(model_path)
 except Exception as ex:
     st.error(f"Unable to load YOLO model. Check Model Path: {model_path}")
     st.error(ex)
+    st.stop()  # Nothing on the page works without the model
 
 # Page Layout Setting
 st.set_page_config(
@@ -32,90 +34,50 @@ def draw_boxes(frame, boxes, threshold):
     # Implementation to draw bounding boxes on the image
     return frame
 
-# Function for WebCam and SiteCam1 to detect
+# Function for WebCam to detect
 def detect_objects(image):
     # Detection implementation using YOLO model
     detections = model(image, conf = confidence)
     # Format detections if necessary
     return detections
 
-# Function for SiteCam2 to detect
-def detect_objects2(image):
-    # Detection implementation using YOLO model
-    detections2 = model(image, conf = confidence)
-    # Format detections if necessary
-    return detections2
-
-# Function to fetch data from MySQL database
-def fetch_data(vin, sequence_number, colour, type):
-    db_config = {
-        'host': 'localhost',    # dont change
-        'user': 'root',         # change user
-        'password': '',         # put password
-        'database': 'data1'     # database name
-    }
-    try:
-        db_conn = mysql.connector.connect(**db_config)
-        if db_conn.is_connected():
-            # Change query "data_live" to your table name
-            query = "SELECT No, Date, Type, `Vin No.`, `Seq No.`, Colour, TIME, `Straight Bracket`, `No Washer`, Status FROM data_live"
-            conditions = []
-            params = []
-            if type:
-                conditions.append("Type = %s")
-                params.append(type)
-            if vin:
-                conditions.append("`Vin No.` = %s")
-                params.append(vin)
-            if sequence_number:
-                conditions.append("`Seq No.` = %s")
-                params.append(sequence_number)
-            if colour and colour != 'All':
-                conditions.append("Colour = %s")
-                params.append(colour)
-            if conditions:
-                query += ' WHERE ' + ' AND '.join(conditions)
-            cursor = db_conn.cursor()
-            cursor.execute(query, params)
-            df = pd.DataFrame(cursor.fetchall(), columns=[i[0] for i in cursor.description])
-            cursor.close()
-            db_conn.close()
-            return df
-    except Error as e:
-        st.error(f"Error connecting to the database: {e}")
-        return pd.DataFrame()
+# Function to embed the MJPEG stream of a channel; the browser pulls frames straight from the stream server
+# (this app's own, or the headless runner's when remote)
+def show_stream(display, channel, remote=False):
+    url = stream_url(stream_host, channel) if remote else stream_server.url(stream_host, channel)
+    display.markdown(f'<img src="{url}" style="width: 100%">', unsafe_allow_html=True)
 
 # Function to insert data to MySQL database
 def insert_data(type, vin, seq_no, colour, bracket, washer, status):
-    db_config = {
-        'host': 'localhost',    # dont change
-        'user': 'root',         # change user
-        'password': '',         # put password
-        'database': 'data1'     # database name
-    }
     try:
-        # with mysql.connector.connect(**db_config) as db_conn:
-        db_conn = mysql.connector.connect(**db_config)
-        if db_conn.is_connected():
-            # Change the name in the query below ("data_live"
-            query = """
-                    INSERT INTO data_live (Type, `Vin No.`, `Seq No.`, Colour, `Straight Bracket`, `No Washer`, Status, `Date`)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                    """
-            values = (type, vin, seq_no, colour, bracket, washer, status, datetime.now())
-            cursor = db_conn.cursor()
-            cursor.execute(query, values)
-            db_conn.commit()
-            st.success("Data inserted successfully!")
-            cursor.close()
-            db_conn.close()
-    except Error as e:
+        database.insert_data("data_live", type, vin, seq_no, colour, bracket, washer, status)
+        st.success("Data inserted successfully!")
+    except DatabaseError as e:
         st.error(f"Error connecting to the database: {e}")
 
+# Camera streams are opened once per process and shared by every rerun and browser session
+cameras = get_camera_manager()
+
 # Create Side Bar
 with st.sidebar:
     st.header("Stream Configurations")
+    st.caption(model.describe())  # Model load time and memory from the shared registry
     confidence = float(st.slider("Set Confidence Level", 25, 100, 40)) / 100  # Model Confidence Option
+    # Push display: a background detector serves the annotated frames as MJPEG, shared by every viewer.
+    # Opt-in, the stream server only listens on this machine unless INSPECTION_STREAM_HOST is set
+    push_display = st.checkbox("Push Display (MJPEG stream)", value=False,
+                               help="Browsers on other machines need INSPECTION_STREAM_HOST=0.0.0.0")
+    # Persistent IDs across frames; the WebCam tracks parts in the page, so not with Push Display
+    track_parts = st.checkbox("Track Parts (one verdict per bracket/washer)", disabled=push_display,
+                              help="WebCam only, with Push Display turned off") and not push_display
+    # SiteCam streams, one URL per line (Site Cam 1 was http://192.168.1.137:8081, SiteCam 2 http://192.168.1.125:8081)
+    sitecam_sources = parse_sources(st.text_area("SiteCam Stream URLs (one per line)",
+                                                 "http://192.168.1.158:8081\nhttp://192.168.1.152:8081"))
+    st.caption(cameras.describe())  # Shared streams, their state and reconnects
+    # Viewer only: the SiteCams are detected and saved by `python -m inspection.runner <urls> --serve`
+    runner_view = st.checkbox("View Headless Runner Streams")
+    stream_host = st.text_input("Stream Host (as seen from the browser)", "localhost",
+                                disabled=not (push_display or runner_view))
 
     # Sidebar for user inputs to query the database
     st.header("Data Parameters")
@@ -126,6 +88,8 @@ with st.sidebar:
     colour = ['All', 'Red', 'Blue', 'Silver', 'White', 'Black']
     selected_colour = st.selectbox('Vehicle Colour', colour)
 
+    auto_save, vehicle = auto_save_inputs()
+
     st.subheader("Insert Data into Database")
     with st.form(key='insert form'):
         type_input = st.text_input('Type (Insert)')
@@ -143,42 +107,31 @@ with st.sidebar:
 # Main Page
 st.title("Live Object Detection")
 
-# Fetch data based on inputs
-data = fetch_data(vehicle_identification_number, sequence_number, selected_colour, type)
+# The stream server takes STREAM_PORT on first use; when it cannot, the detections are drawn in the page
+stream_server = None
+if push_display:
+    try:
+        stream_server = get_stream_server()
+    except OSError as e:
+        st.error(f"Unable to start the stream server on port {STREAM_PORT}, showing detections in the page: {e}")
 
 column1, column2 = st.columns([0.7,0.35])
 # Display the fetched data
 with column1:
     st.subheader('Queried Data')
-    if not data.empty:
-        st.dataframe(data)
-    else:
-        st.write("No data available based on the input parameters.")
+    show_paginated_table("data_live", vehicle_identification_number, sequence_number, selected_colour, type,
+                         key="data_live")
 
 # Pie chart section for 'Status' distribution
 with column2:
-    if not data.empty and 'Status' in data.columns and 'Date' in data.columns:
-        # Parse the date column to extract months
-        data['Month'] = pd.to_datetime(data['Date']).dt.strftime('%Y-%m')
-
-        # Aggregate the data to count statuses by month
-        status_counts_by_month = data.groupby(['Month', 'Status']).size().unstack(fill_value=0)
-
-        # Plot the data as a bar chart
-        fig, ax = plt.subplots()
-        status_counts_by_month.plot(kind='bar', ax=ax)
-        ax.set_ylabel('Count')
-        ax.set_xlabel('Month')
-        ax.set_title('Status Distribution by Month')
-        ax.legend(title='Status')
-
-        # Set yaxis whole number
-        ax.yaxis.set_major_locator(MaxNLocator(integer=True))
-
-        st.subheader('Status Distribution by Month')
-        st.pyplot(fig)
-    else:
-        st.write("Data is empty or required columns are missing for the bar chart.")
+    status_counts = load_status_counts(["data_live"], vehicle_identification_number, sequence_number, selected_colour, type)
+    show_status_chart(status_counts["data_live"])
+
+# Detections of the live streams are saved at most once a second per camera (or once per tracked part)
+live_saver = None
+if auto_save:
+    live_saver = LiveSaver("data_live")
+    live_saver.vehicle = vehicle
 
 # Create two tabs for Webcam and SiteCam
 tab1, tab2 = st.tabs(["WebCam", "SiteCam"])
@@ -189,46 +142,97 @@ with tab1:
     with column1:
         st.header("WebCam Stream")
         webcam_switch = st.toggle("Start/Stop Detection")
-        webcam = cv2.VideoCapture(0)
         display_webcam = st.empty()
+        display_parts = st.empty()
         if webcam_switch:
             st.write("Camera On")
             webcam_OnOff = True
         else:
             st.write("Camera Off")
             webcam_OnOff = False
+        tracker = IoUTracker() if track_parts else None
+        frame_index = 0
+        parts_shown = 0
+        last_frame = 0
+        if webcam_OnOff:
+            webcam = cameras.get(0, "webcam")
+        if webcam_OnOff and stream_server:
+            # Detection runs on the stream server's detector thread; this script returns straight away
+            detector = stream_server.ensure_detector(model, [webcam], confidence, live_saver)
+            show_stream(display_webcam, detector.channel(webcam))
+            st.caption(stream_server.describe())
+            webcam_OnOff = False
         while webcam_OnOff:
-            ret, img = webcam.read()
-            if ret:
+            frame = webcam.latest(last_frame)
+            if frame is None:
+                time.sleep(0.005)  # No new frame from the capture thread yet
+            else:
+                last_frame, img, _ = frame
                 detections = detect_objects(img)
-                res_plotted = detections[0].plot()
-                output_frame = cv2.cvtColor(res_plotted, cv2.COLOR_BGR2RGB)
+                if tracker:
+                    tracker.update_from_result(frame_index, detections[0])
+                    res_plotted = draw_tracks(img.copy(), tracker.boxes_at(frame_index))
+                    # Parts that left the view get their final verdict; save and refresh the table only then
+                    if len(tracker.finished) != parts_shown:
+                        if auto_save:
+                            save_parts("data_live", webcam.name,
+                                       [track.summary() for track in tracker.finished[parts_shown:]], vehicle)
+                        parts_shown = len(tracker.finished)
+                        display_parts.dataframe(tracker.parts())
+                    frame_index += 1
+                else:
+                    res_plotted = detections[0].plot()
+                    if live_saver:
+                        live_saver.offer(webcam.name, detections[0], model.names)
                 display_webcam.image(res_plotted, channels="BGR", use_column_width=True)
 
-# Tab 2 for SiteCam 1 and SiteCam 2
+# Tab 2 for the SiteCams: one capture thread per camera, latest frames batched into one inference
 with tab2:
-    placeholder = st.columns(2)
     st.header("SiteCam Stream")
     sitecam_switch = st.toggle("Start/Stop Detection All SiteCam")
-    sitecam_1 = cv2.VideoCapture("http://192.168.1.158:8081") # Site Cam 1http://192.168.1.137:8081
-    sitecam_2 = cv2.VideoCapture("http://192.168.1.152:8081")  # SiteCam 2 http://192.168.1.125:8081
-    col1 = placeholder[0].empty()
-    col2 = placeholder[1].empty()
+    placeholder = st.columns(max(1, min(len(sitecam_sources), 3)))
+    displays = []
+    for number, source in enumerate(sitecam_sources):
+        with placeholder[number % len(placeholder)]:
+            st.caption(f"SiteCam {number + 1}: {source}")
+            displays.append((st.empty(), st.empty()))
+    scheduler_stats = st.empty()
     if sitecam_switch:
         st.write("SiteCam On")
         sitecam_OnOff = True
     else:
         st.write("SiteCam Off")
         sitecam_OnOff = False
-    while sitecam_OnOff:
-        ret1, img1 = sitecam_1.read()
-        ret2, img2 = sitecam_2.read()
-        if ret1 | ret2:
-            detections = detect_objects(img1)
-            detections2 = detect_objects2(img2)
-            res_plotted1 = detections[0].plot()
-            res_plotted2 = detections2[0].plot()
-            output_frame1 = cv2.cvtColor(res_plotted1, cv2.COLOR_BGR2RGB)
-            output_frame2 = cv2.cvtColor(res_plotted2, cv2.COLOR_BGR2RGB)
-            col1.image(res_plotted1, channels="BGR", use_column_width=True)
-            col2.image(res_plotted2, channels="BGR", use_column_width=True)
\ No newline at end of file
+    if sitecam_OnOff and sitecam_sources and runner_view:
+        # The runner names its cameras camera1, camera2, ... in the order of its command line
+        for number, (display_image, display_stats) in enumerate(displays):
+            show_stream(display_image, f"camera{number + 1}", remote=True)
+            display_stats.caption("Detected and saved by the headless runner")
+        sitecam_OnOff = False
+
+    if sitecam_OnOff and sitecam_sources:
+        sitecams = [cameras.get(source, f"sitecam{number + 1}") for number, source in enumerate(sitecam_sources)]
+        display_of = {camera: display for camera, display in zip(sitecams, displays)}
+        if stream_server:
+            detector = stream_server.ensure_detector(model, sitecams, confidence, live_saver)
+            for camera in sitecams:
+                show_stream(display_of[camera][0], detector.channel(camera))
+                display_of[camera][1].caption(camera.describe())
+            scheduler_stats.caption(stream_server.describe())
+            sitecam_OnOff = False
+
+    if sitecam_OnOff and sitecam_sources:
+        scheduler = MultiCameraScheduler(model, sitecams, confidence)
+        last_report = 0.0
+        # The streams stay open after the loop ends; the camera manager releases them once idle
+        for camera, img, result in scheduler:
+            display_image, display_stats = display_of[camera]
+            display_image.image(result.plot(), channels="BGR", use_column_width=True)
+            if live_saver:
+                live_saver.offer(camera.name, result, model.names)
+            # Refresh the per-camera figures once a second rather than every frame
+            if time.monotonic() - last_report > 1:
+                last_report = time.monotonic()
+                for sitecam, (_, sitecam_stats) in display_of.items():
+                    sitecam_stats.caption(sitecam.describe())
+                scheduler_stats.caption(scheduler.describe())
\ No newline at end of file
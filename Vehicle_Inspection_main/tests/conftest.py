@@ -0,0 +1,54 @@
+import os
+import sys
+
+import pytest
+
+# The app is run from Vehicle_Inspection_main, so the tests import the inspection package from there too
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+
+# Fixture: a migrated SQLite database as the process-wide pool, the way INSPECTION_SQLITE_PATH sets it
+@pytest.fixture
+def sqlite_database(tmp_path, monkeypatch):
+    from inspection import database, migrations
+
+    path = str(tmp_path / "inspection.db")
+    monkeypatch.setattr(database, "SQLITE_PATH", path)
+    database.set_pool(None)
+    database.cache.clear()
+    migrations.migrate(database.get_pool())
+    yield path
+    database.set_pool(None)
+    database.cache.clear()
+
+
+# Fixture: starts the camera stand-in (tools/camera_standin.py) on a local port from a background
+# thread; start(port=0, ...) returns the server, every server is stopped after the test
+@pytest.fixture
+def camera_standin():
+    import threading
+    from http.server import ThreadingHTTPServer
+
+    import cv2
+    import numpy as np
+    from tools.camera_standin import make_handler
+
+    frames = [cv2.imencode(".jpg", np.full((48, 64, 3), value, dtype=np.uint8))[1].tobytes()
+              for value in range(0, 250, 25)]
+    servers = []
+
+    def start(port=0, fps=30, drop_after=0, delay=0.0, handler=None):
+        server = ThreadingHTTPServer(("127.0.0.1", port), handler or make_handler(frames, fps, drop_after, delay))
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    start.frames = frames
+    yield start
+    # Stopping a server the test stopped already returns straight away
+    for server in servers:
+        server.shutdown()
+        server.server_close()
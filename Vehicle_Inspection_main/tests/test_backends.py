@@ -0,0 +1,122 @@
+import os
+import shutil
+
+import pytest
+
+from inspection import backends
+from inspection.backends import exported_path, resolve_weights
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PARITY_WEIGHTS = os.path.join(APP_DIR, "weights", "best.pt")
+PARITY_IMAGE = os.path.join(APP_DIR, "images", "demo.jpg")
+# Defaults of benchmarks.backend_benchmark
+PARITY_MIN_IOU = 0.9
+PARITY_MAX_CONF_DIFF = 0.02
+
+
+@pytest.fixture
+def weights(tmp_path):
+    path = tmp_path / "best.pt"
+    path.write_bytes(b"weights")
+    return str(path)
+
+
+# Replaces the ultralytics export: records the call and writes the export where ultralytics would
+@pytest.fixture
+def exports(monkeypatch):
+    calls = []
+
+    def export_model(model_path, backend, imgsz=backends.DEFAULT_IMGSZ):
+        calls.append((model_path, backend, imgsz))
+        path = exported_path(model_path, backend)
+        if backend == "openvino":
+            os.makedirs(path, exist_ok=True)
+        else:
+            with open(path, "wb") as f:
+                f.write(b"export")
+        return path
+
+    monkeypatch.setattr(backends, "export_model", export_model)
+    return calls
+
+
+def test_exported_paths():
+    assert exported_path("weights/best.pt", "torch") == "weights/best.pt"
+    assert exported_path("weights/best.pt", "onnx") == "weights/best.onnx"
+    assert exported_path("weights/best.pt", "openvino") == "weights/best_openvino_model"
+    assert exported_path("weights/best.pt", "onnx-int8") == "weights/best_int8.onnx"
+    assert exported_path("weights/best.pt", "openvino-int8") == "weights/best_int8_openvino_model"
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        resolve_weights("weights/best.pt", "tensorrt")
+
+
+def test_torch_loads_the_weights(weights, exports):
+    assert resolve_weights(weights, "torch") == weights
+    assert exports == []
+
+
+@pytest.mark.parametrize("backend", ["onnx", "openvino"])
+def test_missing_export_is_built_once(weights, exports, backend):
+    path = resolve_weights(weights, backend, imgsz=320)
+    assert path == exported_path(weights, backend)
+    assert os.path.exists(path)
+    assert exports == [(weights, backend, 320)]
+    assert resolve_weights(weights, backend, imgsz=320) == path
+    assert len(exports) == 1
+
+
+def test_stale_export_is_rebuilt(weights, exports):
+    path = resolve_weights(weights, "onnx")
+    # Retrained weights are newer than the export made from the old ones
+    os.utime(path, (1000, 1000))
+    assert resolve_weights(weights, "onnx") == path
+    assert len(exports) == 2
+
+
+@pytest.mark.parametrize("backend", ["onnx-int8", "openvino-int8"])
+def test_int8_is_never_built_implicitly(weights, exports, backend):
+    with pytest.raises(FileNotFoundError, match="inspection.quantization"):
+        resolve_weights(weights, backend)
+    assert exports == []
+
+
+def test_installed_int8_model_is_used_as_is(weights, exports):
+    path = exported_path(weights, "onnx-int8")
+    with open(path, "wb") as f:
+        f.write(b"int8")
+    # Even when older than the weights: only the accuracy gate may replace it
+    os.utime(path, (1000, 1000))
+    assert resolve_weights(weights, "onnx-int8") == path
+    assert exports == []
+
+
+def test_export_model_refuses_int8():
+    with pytest.raises(ValueError, match="inspection.quantization"):
+        backends.export_model("weights/best.pt", "onnx-int8")
+
+
+# The exports must find what PyTorch finds on the demo image: every box with the same class, an IoU
+# and a confidence within the tolerances of the backend benchmark, and the same verdict
+@pytest.mark.parametrize("backend, runtime", [("onnx", "onnxruntime"), ("openvino", "openvino")])
+def test_export_matches_torch(tmp_path, backend, runtime):
+    pytest.importorskip("ultralytics")
+    pytest.importorskip(runtime)
+    if not os.path.exists(PARITY_WEIGHTS):
+        pytest.skip(f"No trained weights at {PARITY_WEIGHTS}")
+    import cv2
+    from ultralytics import YOLO
+    from benchmarks.backend_benchmark import compare, detections
+
+    # Exported next to a copy of the weights, so the exports the app serves are left alone
+    weights = str(tmp_path / "best.pt")
+    shutil.copyfile(PARITY_WEIGHTS, weights)
+    image = cv2.imread(PARITY_IMAGE)
+    reference = YOLO(weights, task="detect").predict(image, conf=0.4, device="cpu", verbose=False)[0]
+    candidate = YOLO(resolve_weights(weights, backend), task="detect").predict(image, conf=0.4, device="cpu",
+                                                                              verbose=False)[0]
+    expected = detections(reference)
+    assert expected
+    assert compare(expected, detections(candidate), reference.names, PARITY_MIN_IOU, PARITY_MAX_CONF_DIFF) == []
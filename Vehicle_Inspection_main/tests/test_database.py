@@ -0,0 +1,81 @@
+from datetime import datetime
+
+from inspection import database
+
+
+def detection(vin, status, date, colour="Red", type="Sedan"):
+    return (type, vin, "001", colour, "1", "0", status, date, "test", 0, 0, 0.9)
+
+
+def test_insert_and_fetch(sqlite_database):
+    database.insert_data("data_image", "Sedan", "VIN1", "001", "Red", "Straight", "No Friction", "OK")
+    database.insert_data("data_image", "SUV", "VIN2", "002", "Blue", "Crooked", "Friction", "NOT OK")
+
+    df = database.fetch_data("data_image", "VIN2", "", "All", "")
+    assert list(df["Vin No."]) == ["VIN2"]
+    assert list(df["Status"]) == ["NOT OK"]
+    assert len(database.fetch_data("data_image", "", "", "All", "")) == 2
+    assert database.fetch_data("data_video", "", "", "All", "").empty
+
+
+def test_insert_invalidates_cached_results(sqlite_database):
+    assert database.count_rows("data_live", "", "", "All", "") == 0
+    database.insert_detections("data_live", [detection("VIN1", "OK", datetime(2024, 1, 5))])
+    assert database.count_rows("data_live", "", "", "All", "") == 1
+
+
+def test_fetch_page_walks_newest_first(sqlite_database):
+    database.insert_detections("data_bulk_image", [detection(f"VIN{i}", "OK", datetime(2024, 1, 1))
+                                                   for i in range(5)])
+    assert database.count_rows("data_bulk_image", "", "", "All", "") == 5
+    first = database.fetch_page("data_bulk_image", "", "", "All", "", page_size=2)
+    second = database.fetch_page("data_bulk_image", "", "", "All", "", page_size=2,
+                                 after_no=int(first["No"].iloc[-1]))
+    assert list(first["Vin No."]) == ["VIN4", "VIN3"]
+    assert list(second["Vin No."]) == ["VIN2", "VIN1"]
+
+
+def test_status_counts_by_month(sqlite_database):
+    database.insert_detections("data_capture", [
+        detection("VIN1", "OK", datetime(2024, 1, 5)),
+        detection("VIN2", "OK", datetime(2024, 1, 20)),
+        detection("VIN3", "NOT OK", datetime(2024, 1, 21)),
+        detection("VIN4", "NOT OK", datetime(2024, 2, 2)),
+    ])
+    counts = database.status_counts_by_month("data_capture", "", "", "All", "")
+    assert counts.loc["2024-01", "OK"] == 2
+    assert counts.loc["2024-01", "NOT OK"] == 1
+    assert counts.loc["2024-02", "OK"] == 0
+    assert counts.loc["2024-02", "NOT OK"] == 1
+
+
+class FakeCursor:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeMySQLConnection:
+    def __init__(self):
+        self.prepared = []
+
+    def cursor(self, prepared=False):
+        cursor = FakeCursor()
+        self.prepared.append(cursor)
+        return cursor
+
+
+def test_mysql_prepares_each_statement_once_per_connection(monkeypatch):
+    monkeypatch.setattr(database, "PREPARED_PER_CONNECTION", 2)
+    pool = database.ConnectionPool(FakeMySQLConnection, "mysql")
+    conn = FakeMySQLConnection()
+    first = pool.cursor(conn, "SELECT 1")
+    assert pool.cursor(conn, "SELECT 1") is first
+    assert pool.cursor(FakeMySQLConnection(), "SELECT 1") is not first
+    pool.cursor(conn, "SELECT 2")
+    pool.cursor(conn, "SELECT 3")
+    # The least recently used statement is closed beyond PREPARED_PER_CONNECTION
+    assert first.closed
+    assert len(conn.prepared) == 3
@@ -0,0 +1,115 @@
+import time
+
+import pytest
+
+from inspection import live_cameras
+from inspection.live_cameras import CameraManager, CameraStream, MultiCameraScheduler
+
+
+def wait_until(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+@pytest.fixture
+def standin(camera_standin):
+    return f"http://127.0.0.1:{camera_standin().server_port}/"
+
+
+@pytest.fixture(autouse=True)
+def fast_reconnects(monkeypatch):
+    monkeypatch.setattr(live_cameras, "RECONNECT_DELAY", 0.05)
+    monkeypatch.setattr(live_cameras, "MAX_RECONNECT_DELAY", 0.2)
+
+
+# Stands in for the YOLO model: records the batch sizes and returns one result per frame
+class FakeModel:
+    def __init__(self):
+        self.batches = []
+
+    def predict(self, frames, conf, imgsz, verbose):
+        self.batches.append(len(frames))
+        return [float(frame.mean()) for frame in frames]
+
+
+def test_latest_frame_wins(standin):
+    camera = CameraStream("sitecam1", standin).start()
+    try:
+        assert wait_until(lambda: camera.latest() is not None)
+        # Nobody reads for a while: older frames are replaced, not queued
+        time.sleep(0.5)
+        sequence, frame, _ = camera.latest()
+        assert frame.shape == (48, 64, 3)
+        assert sequence > 1
+        assert camera.stats.dropped > 0
+        assert camera.latest(sequence) is None
+        assert wait_until(lambda: camera.latest(sequence) is not None)
+        assert camera.state == "streaming"
+    finally:
+        camera.stop()
+
+
+def test_reconnects_after_the_standin_stops(camera_standin):
+    server = camera_standin(drop_after=0.5)
+    port = server.server_port
+    camera = CameraStream("sitecam1", f"http://127.0.0.1:{port}/").start()
+    try:
+        assert wait_until(lambda: camera.latest() is not None)
+        # The stand-in goes away: the open stream ends and reconnects are refused
+        server.shutdown()
+        server.server_close()
+        assert wait_until(lambda: camera.state.startswith("reconnecting"))
+        assert camera.stats.read_failures >= 1
+        connects = camera.stats.connects
+        sequence = camera.latest()[0]
+
+        camera_standin(port)
+        assert wait_until(lambda: camera.stats.connects > connects)
+        assert wait_until(lambda: camera.latest(sequence) is not None)
+    finally:
+        camera.stop()
+
+
+def test_clean_shutdown(standin):
+    manager = CameraManager(idle_timeout=60)
+    camera = manager.get(standin, "sitecam1")
+    assert manager.get(standin) is camera
+    assert wait_until(lambda: camera.latest() is not None)
+    manager.close_all()
+    assert camera.stopped
+    camera._thread.join(timeout=5)
+    assert not camera._thread.is_alive()
+    assert camera.state == "stopped"
+    assert manager.streams() == []
+
+
+def test_idle_streams_are_released(standin):
+    manager = CameraManager(idle_timeout=0.2)
+    camera = manager.get(standin, "sitecam1")
+    assert wait_until(lambda: camera.stopped, timeout=5)
+    assert manager.streams() == []
+
+
+def test_scheduler_batches_the_cameras_with_new_frames(standin):
+    cameras = [CameraStream("sitecam1", standin).start(), CameraStream("sitecam2", standin).start()]
+    model = FakeModel()
+    scheduler = MultiCameraScheduler(model, cameras, conf=0.4)
+    try:
+        assert wait_until(lambda: all(camera.latest() is not None for camera in cameras))
+        results = scheduler.step()
+        assert [camera for camera, _, _ in results] == cameras
+        assert model.batches == [2]
+        assert all(isinstance(result, float) for _, _, result in results)
+        assert all(camera.stats.latency.count == 1 for camera in cameras)
+        # Once the cameras stop, their last frames are detected at most once more
+        for camera in cameras:
+            camera.stop()
+        scheduler.step()
+        assert scheduler.step() == []
+    finally:
+        for camera in cameras:
+            camera.stop()
@@ -0,0 +1,65 @@
+from inspection import database, migrations
+
+
+def index_names(pool):
+    _, rows = pool.query("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'data_%'")
+    return {name for name, in rows}
+
+
+def test_migrate_to_latest(tmp_path):
+    pool = database.sqlite_pool(str(tmp_path / "inspection.db"))
+    assert migrations.migrate(pool) == [version for version, _, _ in migrations.MIGRATIONS]
+    assert migrations.current_version(pool) == migrations.MIGRATIONS[-1][0]
+    assert len(index_names(pool)) == len(database.TABLES) * len(migrations.INDEXES)
+    assert migrations.migrate(pool) == []
+
+
+def test_indexes_after_a_partial_failure(tmp_path):
+    pool = database.sqlite_pool(str(tmp_path / "inspection.db"))
+    migrations.migrate(pool, target=1)
+    # The first indexes were created before the migration failed and was not recorded
+    for statement in migrations.create_indexes(pool)[:3]:
+        pool.execute(statement)
+    assert migrations.migrate(pool, target=2) == [2]
+    assert len(index_names(pool)) == len(database.TABLES) * len(migrations.INDEXES)
+
+
+class FakeMySQLPool:
+    dialect = "mysql"
+
+    def query(self, statement, params=()):
+        return ["TABLE_NAME", "INDEX_NAME"], [("data_image", "PRIMARY"), ("data_image", "idx_vin"),
+                                              ("DATA_VIDEO", "IDX_SEQ")]
+
+
+def test_mysql_skips_existing_indexes():
+    statements = migrations.create_indexes(FakeMySQLPool())
+    assert len(statements) == len(database.TABLES) * len(migrations.INDEXES) - 2
+    assert "CREATE INDEX idx_vin ON data_image (`Vin No.`)" not in statements
+    assert "CREATE INDEX idx_seq ON data_video (`Seq No.`)" not in statements
+    assert "CREATE INDEX idx_seq ON data_image (`Seq No.`)" in statements
+
+
+def test_columns_after_a_partial_failure(tmp_path):
+    pool = database.sqlite_pool(str(tmp_path / "inspection.db"))
+    migrations.migrate(pool, target=2)
+    for statement in migrations.add_detection_columns(pool)[:5]:
+        pool.execute(statement)
+    assert len(migrations.add_detection_columns(pool)) == len(database.TABLES) * len(migrations.DETECTION_COLUMNS) - 5
+    assert migrations.migrate(pool) == [3]
+    assert migrations.add_detection_columns(pool) == []
+
+
+class FakeMySQLColumnsPool:
+    dialect = "mysql"
+
+    def query(self, statement, params=()):
+        return ["TABLE_NAME", "COLUMN_NAME"], [("data_image", "Source"), ("DATA_IMAGE", "crooked bracket"),
+                                               ("data_image", "No")]
+
+
+def test_mysql_skips_existing_columns():
+    statements = migrations.add_detection_columns(FakeMySQLColumnsPool())
+    assert len(statements) == len(database.TABLES) * len(migrations.DETECTION_COLUMNS) - 2
+    assert "ALTER TABLE data_image ADD COLUMN Source VARCHAR(100) NULL" not in statements
+    assert "ALTER TABLE data_image ADD COLUMN `Washer Friction` INT NULL" in statements
@@ -0,0 +1,39 @@
+import time
+
+from inspection.query_cache import QueryCache
+
+
+def test_put_and_get():
+    cache = QueryCache()
+    cache.put(("data_image", "count", ()), 3, cache.generation("data_image"))
+    assert cache.get(("data_image", "count", ())) == (True, 3)
+    assert cache.get(("data_video", "count", ())) == (False, None)
+
+
+def test_invalidate_drops_only_that_table():
+    cache = QueryCache()
+    cache.put(("data_image", "count", ()), 3, cache.generation("data_image"))
+    cache.put(("data_video", "count", ()), 4, cache.generation("data_video"))
+    cache.invalidate_table("data_image")
+    assert cache.get(("data_image", "count", ()))[0] is False
+    assert cache.get(("data_video", "count", ())) == (True, 4)
+
+
+def test_result_of_a_query_that_raced_a_write_is_not_cached():
+    cache = QueryCache()
+    generation = cache.generation("data_image")
+    # The write commits and invalidates while the query that read the old rows is still running
+    cache.invalidate_table("data_image")
+    cache.put(("data_image", "count", ()), 3, generation)
+    assert cache.get(("data_image", "count", ()))[0] is False
+    cache.put(("data_image", "count", ()), 4, cache.generation("data_image"))
+    assert cache.get(("data_image", "count", ())) == (True, 4)
+
+
+def test_expired_and_evicted_entries():
+    cache = QueryCache(max_entries=2, ttl=0.05)
+    for number in range(3):
+        cache.put(("data_image", number), number, 0)
+    assert cache.get(("data_image", 0))[0] is False
+    time.sleep(0.06)
+    assert cache.get(("data_image", 2))[0] is False
@@ -0,0 +1,93 @@
+import os
+import json
+
+import pytest
+
+from inspection import database, migrations
+from inspection.result_writer import ResultWriter
+
+
+def detection(vin):
+    return ("Sedan", vin, "001", "Red", "1", "0", "OK", "2024-01-05 10:00:00", "test", 0, 0, 0.9)
+
+
+def rows(table_name):
+    return sorted(database.fetch_data(table_name, "", "", "All", "")["Vin No."])
+
+
+# Every submitted row is handled straight away (batch_size=1); the long flush interval keeps the
+# writer waiting for the next row, so each submit + flush is one step of the writer
+@pytest.fixture
+def writer(sqlite_database, tmp_path):
+    writer = ResultWriter(str(tmp_path / "spool"), batch_size=1, flush_interval=60)
+    yield writer
+    writer.close()
+
+
+def database_down(tmp_path):
+    database.set_pool(database.sqlite_pool(str(tmp_path / "missing" / "inspection.db")))
+
+
+# Function to bring the fixture database back and end the writer's back-off, as if it had waited
+def database_back(writer):
+    database.set_pool(None)
+    writer._retry_at = 0.0
+
+
+def submit(writer, table_name, vin):
+    writer.submit(table_name, detection(vin))
+    writer.flush()
+
+
+def test_rows_are_spooled_while_the_database_is_down(writer, tmp_path):
+    database_down(tmp_path)
+    submit(writer, "data_image", "VIN1")
+    submit(writer, "data_image", "VIN2")
+    assert (writer.written, writer.spooled, writer.failures) == (0, 2, 1)
+    with open(writer.spool_path) as f:
+        assert len(f.readlines()) == 2
+
+
+def test_spool_is_replayed_exactly_once(writer, tmp_path):
+    database_down(tmp_path)
+    submit(writer, "data_image", "VIN1")
+    submit(writer, "data_image", "VIN2")
+
+    database_back(writer)
+    submit(writer, "data_image", "VIN3")
+    assert rows("data_image") == ["VIN1", "VIN2", "VIN3"]
+    assert writer.replayed == 2
+    assert not os.path.exists(writer.spool_path)
+    assert not os.path.exists(writer.spool_path + ".replay")
+
+    submit(writer, "data_image", "VIN4")
+    assert rows("data_image") == ["VIN1", "VIN2", "VIN3", "VIN4"]
+    assert writer.replayed == 2
+
+
+def test_partial_replay_keeps_only_the_remainder(writer, tmp_path):
+    database_down(tmp_path)
+    for number in range(2):
+        submit(writer, "data_image", f"IMG{number}")
+        submit(writer, "data_video", f"VID{number}")
+    assert writer.spooled == 4
+
+    # data_image is written back, data_video fails because its table is gone
+    database_back(writer)
+    database.get_pool().execute("DROP TABLE data_video")
+    submit(writer, "data_image", "IMG2")
+    assert rows("data_image") == ["IMG0", "IMG1", "IMG2"]
+    with open(writer.spool_path + ".replay") as f:
+        remaining = [json.loads(line) for line in f]
+    assert [(entry["table"], entry["row"][1]) for entry in remaining] == [("data_video", "VID0"),
+                                                                         ("data_video", "VID1")]
+
+    pool = database.get_pool()
+    for statement in migrations.create_tables(pool) + migrations.add_detection_columns(pool):
+        pool.execute(statement)
+    writer._retry_at = 0.0
+    submit(writer, "data_image", "IMG3")
+    assert rows("data_video") == ["VID0", "VID1"]
+    assert rows("data_image") == ["IMG0", "IMG1", "IMG2", "IMG3"]
+    assert writer.replayed == 4
+    assert not os.path.exists(writer.spool_path + ".replay")
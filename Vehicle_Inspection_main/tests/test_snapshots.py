@@ -0,0 +1,60 @@
+import time
+
+from tools.camera_standin import make_handler
+from inspection import snapshots
+from inspection.snapshots import fetch_snapshot, fetch_snapshots
+
+
+def snapshot_address(server):
+    return f"127.0.0.1:{server.server_port}"
+
+
+def test_fetch_snapshot(camera_standin):
+    snapshot = fetch_snapshot(snapshots.snapshot_url(snapshot_address(camera_standin())))
+    assert snapshot.ok
+    assert snapshot.error is None
+    assert snapshot.image.size == (64, 48)
+
+
+def test_snapshots_reuse_the_keep_alive_connection(camera_standin):
+    connections = []
+
+    class CountingHandler(make_handler(camera_standin.frames, 30, 0)):
+        def setup(self):
+            connections.append(self.client_address)
+            super().setup()
+
+    url = snapshots.snapshot_url(snapshot_address(camera_standin(handler=CountingHandler)))
+    for _ in range(3):
+        assert fetch_snapshot(url).ok
+    assert len(connections) == 1
+
+
+def test_cameras_are_fetched_in_parallel(camera_standin):
+    urls = [snapshots.snapshot_url(snapshot_address(camera_standin(delay=0.5))) for _ in range(4)]
+    start = time.perf_counter()
+    results = fetch_snapshots(urls)
+    assert time.perf_counter() - start < 1.5
+    assert [snapshot.url for snapshot in results] == urls
+    assert all(snapshot.ok for snapshot in results)
+
+
+def test_timeout(camera_standin):
+    snapshot = fetch_snapshot(snapshots.snapshot_url(snapshot_address(camera_standin(delay=1.0))), timeout=0.2)
+    assert not snapshot.ok
+    assert "timed out" in snapshot.error
+
+
+def test_errors_are_reported_per_camera(camera_standin):
+    server = camera_standin()
+    refused = camera_standin()
+    refused.shutdown()
+    refused.server_close()
+    results = fetch_snapshots([
+        snapshots.snapshot_url(snapshot_address(server)),
+        f"http://{snapshot_address(server)}/picture/2/missing/",
+        snapshots.snapshot_url(snapshot_address(refused)),
+    ], timeout=2)
+    assert results[0].ok
+    assert "HTTP error" in results[1].error
+    assert "Failed to connect" in results[2].error
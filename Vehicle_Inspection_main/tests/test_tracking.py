@@ -0,0 +1,48 @@
+from inspection.tracking import DEFECT_MIN_FRAMES, IoUTracker, Track, iou
+from inspection.verdict import CROOKED_BRACKET, NOT_OK, OK, STRAIGHT_BRACKET
+
+BOX = (10, 10, 50, 50)
+
+
+def track_of(classes, confidence=0.9):
+    track = Track(1, 0, BOX, classes[0], confidence)
+    for frame_index, class_name in enumerate(classes[1:], 1):
+        track.update(frame_index, BOX, class_name, confidence)
+    return track
+
+
+def test_iou():
+    assert iou(BOX, BOX) == 1.0
+    assert iou(BOX, (60, 60, 80, 80)) == 0.0
+    assert round(iou((0, 0, 10, 10), (5, 0, 15, 10)), 4) == round(50 / 150, 4)
+
+
+def test_plurality_when_no_defect_was_confirmed():
+    track = track_of([STRAIGHT_BRACKET] * 10 + [CROOKED_BRACKET] * (DEFECT_MIN_FRAMES - 1))
+    assert track.class_name == STRAIGHT_BRACKET
+    assert track.status == OK
+
+
+def test_minority_defect_seen_in_enough_frames_makes_the_part_defective():
+    track = track_of([STRAIGHT_BRACKET] * 20 + [CROOKED_BRACKET] * DEFECT_MIN_FRAMES)
+    assert track.class_name == CROOKED_BRACKET
+    assert track.status == NOT_OK
+    assert track.summary()["confidence"] == 0.9
+
+
+def test_low_confidence_defects_do_not_count():
+    track = track_of([STRAIGHT_BRACKET] * 20)
+    for frame_index in range(20, 20 + DEFECT_MIN_FRAMES * 2):
+        track.update(frame_index, BOX, CROOKED_BRACKET, 0.2)
+    assert track.class_name == STRAIGHT_BRACKET
+
+
+def test_tracker_keeps_one_part_across_flickering_classes():
+    tracker = IoUTracker()
+    for frame_index in range(12):
+        class_name = CROOKED_BRACKET if frame_index % 4 == 0 else STRAIGHT_BRACKET
+        tracker.update(frame_index, [((10 + frame_index, 10, 50 + frame_index, 50), class_name, 0.8)])
+    parts = tracker.finish()
+    assert len(parts) == 1
+    assert parts[0]["class_name"] == CROOKED_BRACKET
+    assert parts[0]["detections"] == 12
@@ -0,0 +1,110 @@
+import time
+import argparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import cv2
+
+# Local stand-in for the Raspberry Pi cameras (motionEye MJPEG stream on port 8081 and the
+# /picture/1/current/ snapshot), to run the live and capture pages without the line hardware:
+#
+#   python -m tools.camera_standin --port 8081 --video videos/demo.mp4
+#   python -m tools.camera_standin --port 8082 --drop-after 20     (stream cut every 20s)
+#
+# then use http://localhost:8081 as a SiteCam stream URL, or localhost:8081 as a capture camera IP.
+
+BOUNDARY = "frame"
+
+
+# Function to decode a video once into a list of JPEG frames that the server loops over
+def load_frames(video_path, width, quality):
+    capture = cv2.VideoCapture(video_path)
+    frames = []
+    while True:
+        ret, frame = capture.read()
+        if not ret:
+            break
+        if width and frame.shape[1] > width:
+            frame = cv2.resize(frame, (width, frame.shape[0] * width // frame.shape[1]), interpolation=cv2.INTER_AREA)
+        frames.append(cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes())
+    capture.release()
+    if not frames:
+        raise SystemExit(f"No frames could be read from {video_path}")
+    return frames
+
+
+def make_handler(frames, fps, drop_after, delay=0.0):
+    started = time.monotonic()
+
+    class CameraHandler(BaseHTTPRequestHandler):
+        # HTTP/1.1 so snapshot clients can keep the connection alive like with motionEye
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            if self.path in ("/", "/stream"):
+                self.send_stream()
+            elif self.path.rstrip("/") == "/picture/1/current":
+                self.send_snapshot()
+            else:
+                self.send_error(404)
+
+        # The frame the stream is showing right now, as a single JPEG
+        def send_snapshot(self):
+            time.sleep(delay)
+            jpeg = frames[int((time.monotonic() - started) * fps) % len(frames)]
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(jpeg)))
+            self.end_headers()
+            self.wfile.write(jpeg)
+
+        # multipart/x-mixed-replace stream, one JPEG part per frame at the given FPS
+        def send_stream(self):
+            self.send_response(200)
+            self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            started = time.monotonic()
+            index = 0
+            try:
+                while not drop_after or time.monotonic() - started < drop_after:
+                    jpeg = frames[index % len(frames)]
+                    self.wfile.write(f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                                     f"Content-Length: {len(jpeg)}\r\n\r\n".encode() + jpeg + b"\r\n")
+                    index += 1
+                    time.sleep(1 / fps)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def log_message(self, format, *args):
+            pass
+
+    return CameraHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a video as an MJPEG camera stream")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--video", default="videos/demo.mp4")
+    parser.add_argument("--fps", type=float, default=10)
+    parser.add_argument("--width", type=int, default=640, help="downscale frames wider than this (0 keeps them)")
+    parser.add_argument("--quality", type=int, default=80)
+    parser.add_argument("--drop-after", type=float, default=0,
+                        help="close every stream after this many seconds, to exercise reconnects")
+    parser.add_argument("--delay", type=float, default=0, help="seconds added to every snapshot request")
+    args = parser.parse_args()
+
+    frames = load_frames(args.video, args.width, args.quality)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(frames, args.fps, args.drop_after, args.delay))
+    server.daemon_threads = True
+    print(f"Serving {len(frames)} frames of {args.video} at http://{args.host}:{args.port}/ ({args.fps} FPS)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()